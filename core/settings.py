@@ -80,6 +80,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_celery_beat',
     'documents',
     'users',
@@ -155,6 +156,55 @@ CELERY_BROKER_URL = os.environ.get('CELERY_BROKER', 'redis://redis:6379/0')  # A
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Periodic tasks run by celery beat (synced into django-celery-beat's database scheduler).
+CELERY_BEAT_SCHEDULE = {
+    'check-and-update-publication-status': {
+        'task': 'documents.tasks.check_and_update_publication_status',
+        'schedule': 60 * 60 * 24,
+    },
+    'refresh-dashboard-chart': {
+        'task': 'documents.tasks.refresh_dashboard_chart_task',
+        'schedule': 60 * 30,
+    },
+    'flush-activity-log': {
+        'task': 'users.tasks.flush_activity_log',
+        'schedule': 10,
+    },
+    'refresh-open-brand-matches': {
+        'task': 'documents.tasks.refresh_open_brand_matches',
+        'schedule': 60 * 60 * 24,
+    },
+    'rollup-view-counts': {
+        'task': 'users.tasks.rollup_view_counts_task',
+        'schedule': 60 * 5,
+    },
+    'purge-expired-exports': {
+        'task': 'documents.tasks.purge_expired_exports_task',
+        'schedule': 60 * 60,
+    },
+    'archive-activity-log': {
+        'task': 'users.tasks.archive_activity_log_task',
+        'schedule': 60 * 60 * 24,
+    },
+}
+
+# User activity logging: events are queued in Redis and written in batches by the flush task.
+# Set ACTIVITY_LOG_ASYNC to False to write every event in the request instead.
+ACTIVITY_LOG_ASYNC = True
+ACTIVITY_LOG_BATCH_SIZE = 500
+ACTIVITY_LOG_FLUSH_INTERVAL = 10
+
+# Document views are counted per day in Redis and rolled up into DailyViewCount. Row-level
+# VIEW logging: 'all', 'authenticated', 'sampled' (authenticated users plus a sample of the
+# anonymous views, at ACTIVITY_LOG_VIEW_SAMPLE_RATE) or 'none'.
+ACTIVITY_LOG_VIEWS = os.environ.get('ACTIVITY_LOG_VIEWS', 'authenticated')
+ACTIVITY_LOG_VIEW_SAMPLE_RATE = float(os.environ.get('ACTIVITY_LOG_VIEW_SAMPLE_RATE', 0.01))
+
+# Activity log rows older than the retention period are moved, a month per file, to gzip
+# archives in ACTIVITY_LOG_ARCHIVE_DIR (outside MEDIA_ROOT so they are never served).
+ACTIVITY_LOG_RETENTION_DAYS = int(os.environ.get('ACTIVITY_LOG_RETENTION_DAYS', 365))
+ACTIVITY_LOG_ARCHIVE_DIR = os.environ.get('ACTIVITY_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archives', 'activity_log'))
+
 # Password validation settings to enhance security for user passwords.
 # These settings control the password complexity and validation checks.
 AUTH_PASSWORD_VALIDATORS = [
@@ -213,6 +263,26 @@ MEDIA_URL = '/media/'
 # MEDIA_ROOT is the actual filesystem path where the files are stored
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Downloads are handed over to the front proxy when set: 'x-accel-redirect' (nginx, with an
+# internal location mapping DOWNLOAD_ACCEL_PREFIX to MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd).
+# Left empty, the files are streamed by Django with Range support.
+DOWNLOAD_ACCEL = os.environ.get('DOWNLOAD_ACCEL', '')
+DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+
+# Public address of the site, used for the links sent outside of a request (emails)
+SITE_URL = os.environ.get('SITE_URL', 'https://localhost:9430')
+
+# Bulk exports: archives built at the same time, unfinished exports a user may have queued,
+# and hours a finished archive stays available before it is deleted.
+EXPORT_MAX_CONCURRENT = int(os.environ.get('EXPORT_MAX_CONCURRENT', 2))
+EXPORT_MAX_ACTIVE_PER_USER = 1
+EXPORT_EXPIRY_HOURS = 24
+
+# Bulletins (all the publications of an e_number issue in one PDF): up to BULLETIN_INLINE_LIMIT
+# publications are rendered in the request, larger ones by the workers in parts of BULLETIN_PART_SIZE.
+BULLETIN_INLINE_LIMIT = 50
+BULLETIN_PART_SIZE = 200
+
 # low-level logging settings for the entire Django project.
 LOGGING = {
     'version': 1,
@@ -31,3 +31,11 @@ class DocumentsConfig(AppConfig):
 
         # Override the __str__ method
         Permission.__str__ = custom_permission_str
+
+        # Connect the cache invalidation and search index signals
+        import documents.signals
+
+        # Create the PostgreSQL-only full-text indexes after migrations
+        from django.db.models.signals import post_migrate
+        from documents.search import ensure_search_indexes
+        post_migrate.connect(ensure_search_indexes, sender=self)
@@ -0,0 +1,199 @@
+# Imports of the required python modules and libraries
+######################################################
+import logging
+import tempfile
+import zipfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .downloads import CHUNK_SIZE
+from .exports import get_export_settings
+from .models import Publication, ExportJob, ExportStatus
+from .qr import publication_qr_data
+
+logger = logging.getLogger('documents')
+
+
+def get_bulletin_settings():
+    """Returns (publications rendered in the request, publications per part of a background bulletin) from the settings."""
+    return (
+        getattr(settings, 'BULLETIN_INLINE_LIMIT', 50),
+        getattr(settings, 'BULLETIN_PART_SIZE', 200),
+    )
+
+
+# Function that prepares the data printed on a publication PDF
+def publication_record(publication):
+    # The downscaled copy made by the image pipeline, the upload until it is built from the current image
+    pdf_copy = publication.img_pdf if publication.has_derived_images and publication.img_pdf else None
+    return {
+        'pub_id': publication.id,
+        'pub_year': publication.year,
+        'pub_date': publication.created_at.strftime("%Y-%m-%d"),
+        'pub_no': publication.number,
+        'dec_no': publication.decree.number if publication.decree else "N/A",
+        'applicant': publication.applicant if publication.applicant else "N/A",
+        'owner': publication.owner if publication.owner else "N/A",
+        'country': publication.country.ar_name if publication.country else "N/A",
+        'address': publication.address if publication.address else "N/A",
+        'date_applied': publication.date_applied.strftime("%Y-%m-%d") if publication.date_applied else "N/A",
+        'number_applied': publication.number_applied if publication.number_applied else "N/A",
+        'ar_brand': publication.ar_brand if publication.ar_brand else "N/A",
+        'en_brand': publication.en_brand if publication.en_brand else "N/A",
+        'category': publication.category if publication.category else "N/A",
+        'pub_img': (pdf_copy or publication.img_file).url if publication.img_file else "N/A",
+        'pub_img_size': (publication.img_width, publication.img_height) if pdf_copy else None,
+        'e_number': publication.e_number if publication.e_number else "N/A",
+        'status': publication.status if publication.status else "N/A",
+        'notes': publication.notes or "N/A",
+    }
+
+
+def clean_bulletin_params(query_dict):
+    """
+    Keeps the bulletin parameters of a query string: e_number, or a date_from/date_to
+    range (YYYY-MM-DD), and final. Raises ValueError when one of them is malformed.
+    """
+    params = {key: query_dict.get(key, '').strip() for key in ('e_number', 'date_from', 'date_to')}
+    params = {key: value for key, value in params.items() if value}
+    if 'e_number' in params:
+        if not params['e_number'].isdigit() or int(params['e_number']) > 2147483647:
+            raise ValueError("Invalid e_number")
+        params['e_number'] = str(int(params['e_number']))
+    for key in ('date_from', 'date_to'):
+        # parse_date() returns None for a malformed date and raises ValueError for an impossible one
+        if key in params and parse_date(params[key]) is None:
+            raise ValueError(f"Invalid {key}")
+    params['final'] = query_dict.get('final') in ('1', 'true', 'on')
+    return params
+
+
+def bulletin_queryset(params):
+    """
+    The publications of a bulletin, in their publication order: those of an
+    e_number issue, or those published between date_from and date_to.
+    """
+    qs = Publication.objects.filter(deleted_at__isnull=True)
+    if params.get('e_number'):
+        qs = qs.filter(e_number=params['e_number'])
+    elif params.get('date_from') or params.get('date_to'):
+        date_from, date_to = parse_date(params.get('date_from', '')), parse_date(params.get('date_to', ''))
+        if date_from:
+            qs = qs.filter(created_at__date__gte=date_from)
+        if date_to:
+            qs = qs.filter(created_at__date__lte=date_to)
+    else:
+        return qs.none()
+    return qs.select_related('decree', 'country', 'category').order_by('year', 'number', 'pk')
+
+
+def bulletin_name(params):
+    if params.get('e_number'):
+        label = f"issue_{params['e_number']}"
+    else:
+        label = f"{params.get('date_from', 'start')}_{params.get('date_to', 'end')}"
+    return f"bulletin_{'final' if params.get('final') else 'initial'}_{label}"
+
+
+# Function that renders a set of publications as the pages of one PDF
+def render_bulletin(publications, final=False):
+    """
+    Renders the publications as one multi-page PDF. The canvas, the fonts and the
+    logo are set up once for the whole bulletin instead of once per publication.
+    """
+    from .genpdf import pub_batch_pdf
+    pages = (
+        (publication_record(publication), None if final else publication_qr_data(publication.pk))
+        for publication in publications
+    )
+    return pub_batch_pdf(pages, final=final)
+
+
+# Bulletins rendered in the background
+######################################
+def bulletin_part_name(job_id, index):
+    return f"bulletins/{job_id}/part_{index:03d}.pdf"
+
+
+def split_bulletin(job):
+    """
+    Counts the publications of a bulletin job and splits their ids in parts of
+    BULLETIN_PART_SIZE, each rendered by its own task on the worker pool.
+    """
+    _, part_size = get_bulletin_settings()
+    ids = list(bulletin_queryset(job.params).values_list('pk', flat=True))
+    job.status = ExportStatus.RUNNING
+    job.total = len(ids)
+    job.processed = 0
+    job.save(update_fields=['status', 'total', 'processed'])
+    return [ids[start:start + part_size] for start in range(0, len(ids), part_size)]
+
+
+def render_bulletin_part(job_id, index, ids):
+    """
+    Renders one part of a bulletin job to storage and adds its publications to the
+    job's progress. Returns True when it was the last part to finish.
+    """
+    job = ExportJob.objects.get(pk=job_id)
+    publications = Publication.objects.filter(pk__in=ids).select_related('decree', 'country', 'category')
+    publications = sorted(publications, key=lambda publication: ids.index(publication.pk))
+
+    name = bulletin_part_name(job_id, index)
+    if default_storage.exists(name):
+        # Left by an earlier attempt of this part
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(render_bulletin(publications, job.params.get('final'))))
+
+    ExportJob.objects.filter(pk=job_id).update(processed=F('processed') + len(ids))
+    return ExportJob.objects.filter(pk=job_id, processed__gte=F('total')).exists()
+
+
+# Function that joins the rendered parts of a bulletin into the job's archive
+def assemble_bulletin(job):
+    """
+    Stores the rendered parts as one ZIP archive on the job, then deletes them.
+    Runs once, in whichever part task finishes last.
+    """
+    if not cache.add(f"bulletin_assemble:{job.pk}", True, timeout=60 * 30):
+        return False
+    part_count = -(-job.total // get_bulletin_settings()[1])
+    base_name = bulletin_name(job.params)
+
+    with tempfile.NamedTemporaryFile(suffix='.zip') as archive_file:
+        with zipfile.ZipFile(archive_file, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for index in range(part_count):
+                with default_storage.open(bulletin_part_name(job.pk, index), 'rb') as source, \
+                        archive.open(f"{base_name}_part_{index + 1:03d}.pdf", 'w', force_zip64=True) as target:
+                    while data := source.read(CHUNK_SIZE):
+                        target.write(data)
+
+        archive_file.seek(0)
+        _, _, expiry_hours = get_export_settings()
+        job.file.save(f"{base_name}.zip", File(archive_file), save=False)
+        job.status = ExportStatus.DONE
+        job.processed = job.total
+        job.finished_at = timezone.now()
+        job.expires_at = job.finished_at + timedelta(hours=expiry_hours)
+        job.save(update_fields=['file', 'status', 'processed', 'finished_at', 'expires_at'])
+
+    for index in range(part_count):
+        default_storage.delete(bulletin_part_name(job.pk, index))
+    return True
+
+
+def schedule_bulletin(job):
+    """Queues the background rendering of a bulletin job."""
+    from .tasks import build_bulletin_task
+    try:
+        build_bulletin_task.delay(job.pk)
+    except Exception as e:
+        job.status = ExportStatus.FAILED
+        job.error = str(e)
+        job.save(update_fields=['status', 'error'])
+        logger.error(f"Could not queue bulletin {job.pk}: {e}")
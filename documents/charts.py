@@ -0,0 +1,113 @@
+# Imports of the required python modules and libraries
+######################################################
+import hashlib
+import json
+import logging
+import time
+from django.core.cache import cache
+from .models import Decree, Publication, Objection
+from .stats import yearly_counts
+
+logger = logging.getLogger('documents')
+
+# Models and year window shown on the homepage chart
+DASHBOARD_CHART_MODELS = [Publication, Decree, Objection]
+DASHBOARD_CHART_START_YEAR = 2012
+DASHBOARD_CHART_END_YEAR = 2025
+
+# Bump the version whenever the payload shape changes, so old entries are ignored
+CHART_VERSION = 2
+
+# Seconds the chart data is considered fresh, after that it is served stale while a refresh runs
+CHART_FRESH_FOR = 60 * 60
+
+# Seconds a data change waits before refreshing, so bursts of saves cause a single refresh
+CHART_REFRESH_DELAY = 30
+CHART_REFRESH_LOCK_TIMEOUT = 5 * 60
+
+
+# Function that builds the versioned cache key of a chart
+def get_chart_cache_key(models, start_year, end_year):
+    model_names = "_".join([model.__name__ for model in models])
+    return f"chart:v{CHART_VERSION}:{start_year}_{end_year}_{model_names}"
+
+
+# Function that builds the homepage chart payload
+def build_chart_data(models, start_year, end_year):
+    """
+    Builds the compact chart payload served to the browser: the per-model/per-year
+    counts plus an ETag and Last-Modified stamp for conditional requests.
+
+    :param models: List of Django models to include in the chart.
+    :param start_year: Start year for filtering.
+    :param end_year: End year for filtering.
+    """
+    counts = yearly_counts(models, start_year, end_year)
+    payload = json.dumps(counts, ensure_ascii=False, separators=(',', ':'))
+    return {
+        'data': counts,
+        'etag': hashlib.md5(payload.encode('utf-8')).hexdigest(),
+        'generated_at': time.time(),
+    }
+
+
+# Function that computes the homepage chart data and stores it under its versioned key
+def refresh_dashboard_chart(models=None, start_year=DASHBOARD_CHART_START_YEAR, end_year=DASHBOARD_CHART_END_YEAR):
+    """
+    Computes the chart data and stores it without expiry. Called from the Celery
+    task only, never from a request.
+    """
+    models = models or DASHBOARD_CHART_MODELS
+    cache_key = get_chart_cache_key(models, start_year, end_year)
+    chart = build_chart_data(models, start_year, end_year)
+
+    # Keep the previous Last-Modified stamp when nothing changed, so browsers keep revalidating to 304
+    cached_chart = cache.get(cache_key)
+    if cached_chart and cached_chart['etag'] == chart['etag']:
+        chart['last_modified'] = cached_chart['last_modified']
+    else:
+        chart['last_modified'] = chart['generated_at']
+
+    cache.set(cache_key, chart, timeout=None)
+    cache.delete(f"{cache_key}:refreshing")
+    return chart
+
+
+# Function that queues a background refresh of the homepage chart
+def schedule_chart_refresh(countdown=0):
+    """
+    Queues the refresh task unless one is already pending. The lock key keeps a
+    burst of stale reads or data changes from queueing more than one refresh.
+    """
+    cache_key = get_chart_cache_key(DASHBOARD_CHART_MODELS, DASHBOARD_CHART_START_YEAR, DASHBOARD_CHART_END_YEAR)
+    if not cache.add(f"{cache_key}:refreshing", True, timeout=CHART_REFRESH_LOCK_TIMEOUT):
+        return False
+
+    from .tasks import refresh_dashboard_chart_task
+    try:
+        refresh_dashboard_chart_task.apply_async(countdown=countdown)
+    except Exception as e:
+        cache.delete(f"{cache_key}:refreshing")
+        logger.error(f"Could not queue the dashboard chart refresh: {e}")
+        return False
+    return True
+
+
+# Function that returns the homepage chart data from the cache only
+def get_dashboard_chart():
+    """
+    Returns the pre-computed homepage chart entry ({'data', 'etag', 'last_modified', ..}).
+    A stale entry is still served while a refresh is queued in the background; if
+    nothing was computed yet None is returned and the first refresh is queued.
+    """
+    cache_key = get_chart_cache_key(DASHBOARD_CHART_MODELS, DASHBOARD_CHART_START_YEAR, DASHBOARD_CHART_END_YEAR)
+    cached_chart = cache.get(cache_key)
+
+    if cached_chart is None:
+        schedule_chart_refresh()
+        return None
+
+    if time.time() - cached_chart['generated_at'] > CHART_FRESH_FOR:
+        schedule_chart_refresh()
+
+    return cached_chart
@@ -0,0 +1,174 @@
+# Imports of the required python modules and libraries
+######################################################
+import mimetypes
+import re
+import zipfile
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+# Size of the blocks read from disk while streaming a file
+CHUNK_SIZE = 64 * 1024
+
+# Single byte range of a Range header: "bytes=500-999", "bytes=500-" or "bytes=-500"
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    Returns the (first, last) byte positions of a single range Range header,
+    None when there is no usable header (multiple ranges are served whole), and
+    False when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return False
+    return first, last
+
+
+def iter_file_range(file, first, length, chunk_size=CHUNK_SIZE):
+    """Yields `length` bytes of an open file starting at `first`, then closes it."""
+    try:
+        file.seek(first)
+        while length > 0:
+            data = file.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def accel_response(field_file, content_type):
+    """
+    Hands the file over to the front proxy when DOWNLOAD_ACCEL is configured
+    ('x-accel-redirect' for nginx, 'x-sendfile' for Apache/lighttpd), None otherwise.
+    The proxy then serves the bytes, Range requests included, without a worker.
+    """
+    mode = getattr(settings, 'DOWNLOAD_ACCEL', '')
+    if mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(f"{settings.DOWNLOAD_ACCEL_PREFIX.rstrip('/')}/{field_file.name}")
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = field_file.path
+        return response
+    return None
+
+
+# Function that serves a stored file without loading it into memory
+def serve_file(request, field_file, filename, content_type=None, as_attachment=True):
+    """
+    Returns a response serving a FileField file under `filename`.
+
+    With DOWNLOAD_ACCEL set the file is sent by the front proxy. Otherwise it is
+    streamed from storage in CHUNK_SIZE blocks, and single byte Range requests
+    (used by the pdf.js viewer) get a 206 partial response.
+
+    :param field_file: The FieldFile to serve (e.g. decree.pdf_file).
+    :param filename: Name offered to the browser.
+    :param content_type: Guessed from the stored file name when not given.
+    """
+    if content_type is None:
+        content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+
+    response = accel_response(field_file, content_type)
+    if response is None:
+        size = field_file.size
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            first, last = byte_range
+            length = last - first + 1
+            response = StreamingHttpResponse(
+                iter_file_range(field_file.open('rb'), first, length), status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {first}-{last}/{size}'
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(field_file.open('rb'), content_type=content_type)
+            response.block_size = CHUNK_SIZE
+            response['Content-Length'] = str(size)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
+
+
+# Streaming ZIP archives
+########################
+class ZipStreamBuffer:
+    """
+    Write-only file object for zipfile. It has no seek(), so zipfile writes the
+    archive sequentially (sizes in data descriptors) and the written bytes can be
+    drained and sent as they come.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    Yields a ZIP archive of (archive name, FieldFile) entries a chunk at a time, so
+    memory stays at about one chunk whatever the size of the files. Entries are
+    stored uncompressed: the PDFs and images are already compressed.
+    """
+    buffer = ZipStreamBuffer()
+    date_time = timezone.localtime().timetuple()[:6]
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, field_file in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = field_file.size
+            with field_file.open('rb') as source, archive.open(info, 'w') as target:
+                while data := source.read(chunk_size):
+                    target.write(data)
+                    yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+# Function that serves several stored files as one ZIP download
+def serve_zip(entries, filename):
+    """Returns a streaming response of the ZIP archive of (archive name, FieldFile) entries."""
+    response = StreamingHttpResponse(
+        (chunk for chunk in stream_zip(entries) if chunk), content_type='application/zip',
+    )
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
@@ -0,0 +1,229 @@
+# Imports of the required python modules and libraries
+######################################################
+import codecs
+import csv
+import logging
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.mail import send_mail
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .downloads import CHUNK_SIZE
+from .models import Decree, DecreeStatus, Publication, PublicationStatus, ExportJob, ExportStatus
+
+logger = logging.getLogger('documents')
+
+# List parameters that only concern the display of the list, not its content
+IGNORED_PARAMS = {'cursor', 'page', 'per_page', 'sort', 'csrfmiddlewaretoken'}
+
+# Records between two progress updates of a running export
+PROGRESS_STEP = 25
+
+
+def get_export_settings():
+    """Returns (concurrent exports, active exports per user, hours an export is kept) from the settings."""
+    return (
+        getattr(settings, 'EXPORT_MAX_CONCURRENT', 2),
+        getattr(settings, 'EXPORT_MAX_ACTIVE_PER_USER', 1),
+        getattr(settings, 'EXPORT_EXPIRY_HOURS', 24),
+    )
+
+
+# Exported sections
+###################
+def decree_files(decree):
+    """(archive name, FieldFile) pairs of a decree, named as in download_decree."""
+    date_str = decree.date.strftime('%Y-%m-%d') if decree.date else 'unknown_date'
+    identifier = decree.number if decree.number else 'unknown'
+    files = []
+    if decree.pdf_file and decree.pdf_file.name:
+        files.append((f"decree_{identifier}_{date_str}.pdf", decree.pdf_file))
+    if decree.attach and decree.attach.name:
+        attach_ext = decree.attach.name.split('.')[-1]
+        files.append((f"decree_attachment_{identifier}_{date_str}.{attach_ext}", decree.attach))
+    return files
+
+
+def publication_files(publication):
+    """(archive name, FieldFile) pairs of a publication, named as in download_publication."""
+    date_str = publication.created_at.strftime('%Y-%m-%d') if publication.created_at else 'unknown_date'
+    identifier = publication.number if publication.number else 'unknown'
+    files = []
+    if publication.img_file and publication.img_file.name:
+        files.append((f"publication_{identifier}_{date_str}.jpg", publication.img_file))
+    if publication.attach and publication.attach.name:
+        attach_ext = publication.attach.name.split('.')[-1]
+        files.append((f"publication_attachment_{identifier}_{date_str}.{attach_ext}", publication.attach))
+    return files
+
+
+# {model_name: (model, status choices, files function, manifest columns as (header, accessor))}
+EXPORT_SOURCES = {
+    'decree': (Decree, DecreeStatus, decree_files, [
+        ("رقم القرار", lambda d: d.number),
+        ("التاريخ", lambda d: d.date),
+        ("الحالة", lambda d: d.get_status_display()),
+        ("مقدم الطلب", lambda d: d.applicant),
+        ("الشركة", lambda d: d.company),
+        ("البلد", lambda d: d.country),
+        ("العلامة بالعربية", lambda d: d.ar_brand),
+        ("العلامة بالانجليزية", lambda d: d.en_brand),
+        ("الفئة", lambda d: d.category),
+    ]),
+    'publication': (Publication, PublicationStatus, publication_files, [
+        ("رقم الاشهار", lambda p: p.number),
+        ("السنة", lambda p: p.year),
+        ("رقم القرار", lambda p: p.decree_number),
+        ("رقم النشرية", lambda p: p.e_number),
+        ("الحالة", lambda p: p.get_status_display()),
+        ("مقدم الطلب", lambda p: p.applicant),
+        ("المالك", lambda p: p.owner),
+        ("البلد", lambda p: p.country),
+        ("العلامة بالعربية", lambda p: p.ar_brand),
+        ("العلامة بالانجليزية", lambda p: p.en_brand),
+        ("الفئة", lambda p: p.category),
+    ]),
+}
+
+
+def clean_export_params(query_dict):
+    """Keeps the filter parameters of a list's query string as {key: [values]}, repeated parameters included."""
+    return {key: values for key, values in query_dict.lists() if key not in IGNORED_PARAMS}
+
+
+def export_query_dict(params):
+    """Rebuilds the QueryDict the list view filtered with, also from the single values of jobs stored earlier."""
+    query_dict = QueryDict(mutable=True)
+    for key, values in params.items():
+        query_dict.setlist(key, values if isinstance(values, list) else [values])
+    return query_dict
+
+
+def export_queryset(model_name, params, user):
+    """
+    Rebuilds the queryset of the decree/publication list for the given filter
+    parameters, with the same visibility rules and status tab as the list views.
+    """
+    model, status_choices, _, _ = EXPORT_SOURCES[model_name]
+    params = export_query_dict(params)
+    qs = model.objects.filter(deleted_at__isnull=True)
+    if model is Decree and not user.has_perm('documents.view_decree'):
+        qs = qs.filter(is_placeholder=False)
+
+    status = params.get('status')
+    if status and status.isdigit() and int(status) in status_choices.values:
+        qs = qs.filter(status=int(status))
+
+    filter_class = import_string(model.get_filter_class())
+    return filter_class(params, queryset=qs).qs.select_related('country', 'category').order_by('pk')
+
+
+# Concurrency limit
+###################
+def acquire_export_slot(job_id):
+    """Takes one of the EXPORT_MAX_CONCURRENT export slots, returns its cache key or None when all are taken."""
+    max_concurrent, _, _ = get_export_settings()
+    for slot in range(max_concurrent):
+        key = f"export_slot:{slot}"
+        # Slots expire on their own in case a worker dies mid-export
+        if cache.add(key, job_id, timeout=60 * 60 * 2):
+            return key
+    return None
+
+
+# Function that builds the archive of an export job
+def build_export(job):
+    """
+    Writes the files of every record matched by the job's filter, and a CSV
+    manifest, into a ZIP stored on the job. Files are copied a chunk at a time and
+    records are read in chunks, so memory does not grow with the export size.
+    """
+    _, _, files_function, columns = EXPORT_SOURCES[job.model_name]
+    queryset = export_queryset(job.model_name, job.params, job.user)
+
+    job.status = ExportStatus.RUNNING
+    job.total = queryset.count()
+    job.processed = 0
+    job.save(update_fields=['status', 'total', 'processed'])
+
+    with tempfile.NamedTemporaryFile(suffix='.zip') as archive_file, \
+            tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+', newline='', encoding='utf-8') as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow([header for header, _ in columns] + ["الملفات"])
+
+        with zipfile.ZipFile(archive_file, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for processed, record in enumerate(queryset.iterator(chunk_size=500), 1):
+                stored = []
+                for name, field_file in files_function(record):
+                    try:
+                        with field_file.open('rb') as source, archive.open(name, 'w', force_zip64=True) as target:
+                            shutil.copyfileobj(source, target, CHUNK_SIZE)
+                        stored.append(name)
+                    except FileNotFoundError:
+                        stored.append(f"{name} (غير موجود)")
+                writer.writerow([accessor(record) for _, accessor in columns] + [' | '.join(stored)])
+
+                if processed % PROGRESS_STEP == 0:
+                    ExportJob.objects.filter(pk=job.pk).update(processed=processed)
+
+            # The manifest goes last, with a BOM so spreadsheet programs read the Arabic text
+            manifest.seek(0)
+            with archive.open('manifest.csv', 'w') as target:
+                target.write(codecs.BOM_UTF8)
+                while data := manifest.read(CHUNK_SIZE):
+                    target.write(data.encode('utf-8'))
+
+        archive_file.seek(0)
+        _, _, expiry_hours = get_export_settings()
+        job.file.save(f"{job.model_name}_export_{timezone.localdate():%Y-%m-%d}.zip", File(archive_file), save=False)
+        job.status = ExportStatus.DONE
+        job.processed = job.total
+        job.finished_at = timezone.now()
+        job.expires_at = job.finished_at + timedelta(hours=expiry_hours)
+        job.save(update_fields=['file', 'status', 'processed', 'finished_at', 'expires_at'])
+
+
+def notify_export_ready(job):
+    """Emails the user the download link of a finished export."""
+    if not job.user.email:
+        return
+    link = f"{settings.SITE_URL.rstrip('/')}{reverse('download_export', args=[job.pk])}"
+    send_mail(
+        subject="ملف التصدير جاهز",
+        message=f"ملف تصدير {job.get_model_name_display()} جاهز للتحميل حتى {timezone.localtime(job.expires_at):%Y-%m-%d %H:%M}:\n{link}",
+        from_email=None,
+        recipient_list=[job.user.email],
+        fail_silently=True,
+    )
+
+
+def purge_expired_exports():
+    """Deletes the archives of the exports past their expiry, returns the number purged."""
+    expired = ExportJob.objects.filter(status=ExportStatus.DONE, expires_at__lt=timezone.now())
+    purged = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.status = ExportStatus.EXPIRED
+        job.save(update_fields=['file', 'status'])
+        purged += 1
+    return purged
+
+
+def schedule_export(job):
+    """Queues the background build of an export job."""
+    from .tasks import build_export_task
+    try:
+        build_export_task.delay(job.pk)
+    except Exception as e:
+        job.status = ExportStatus.FAILED
+        job.error = str(e)
+        job.save(update_fields=['status', 'error'])
+        logger.error(f"Could not queue export {job.pk}: {e}")
@@ -6,6 +6,7 @@ from django.db.models import Q
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Row, Column, Submit, Field, HTML, Div
 from .models import Decree, Publication, FormPlus, Objection, Country, Government, ComType, DocType, DecreeCategory
+from .search import keyword_search, normalized_match
 
 
 # Function to rename first choice in selection menu
@@ -234,10 +235,17 @@ class DecreeFilter(django_filters.FilterSet):
             Field('status', type='hidden', value=1)
         )
 
+    def filter_brand(self, queryset, name, value):
+        # Match the normalized Arabic brand (spelling variants included) or the English brand
+        return queryset.filter(
+            normalized_match(value, ['ar_brand_norm']) | Q(en_brand__icontains=value)
+        )
+
     def filter_keyword(self, queryset, name, value):
         """
         Filter the queryset by matching the keyword in number, applicant, company,
-        and, if applicable, the year extracted from the date field.
+        brands and country, and, if applicable, the year extracted from the date field.
+        Uses the full-text index on PostgreSQL and plain icontains lookups elsewhere.
         """
         q = (
             Q(number__icontains=value) |
@@ -245,16 +253,9 @@ class DecreeFilter(django_filters.FilterSet):
             Q(applicant__icontains=value) |
             Q(company__icontains=value) |
             Q(ar_brand__icontains=value) |
-            Q(en_brand__icontains=value) |
-            Q(country__name__icontains=value)
+            Q(en_brand__icontains=value)
         )
-        if value.isdigit():
-            try:
-                year = int(value)
-                q |= Q(date__year=year)
-            except ValueError:
-                pass
-        return queryset.filter(q)
+        return keyword_search(queryset, value, q, 'date')
 
 class PublicationFilter(django_filters.FilterSet):
 
@@ -342,15 +343,16 @@ class PublicationFilter(django_filters.FilterSet):
         )
 
     def filter_brand(self, queryset, name, value):
-        # Use Q objects to filter on multiple fields
+        # Match the normalized Arabic brand (spelling variants included) or the English brand
         return queryset.filter(
-            Q(ar_brand__icontains=value) | Q(en_brand__icontains=value)
+            normalized_match(value, ['ar_brand_norm']) | Q(en_brand__icontains=value)
         )
         
     def filter_keyword(self, queryset, name, value):
         """
-        Filter the queryset by matching the keyword in number, applicant, or company,
-        and if the value is numeric, also match the publication submission year.
+        Filter the queryset by matching the keyword in number, applicant, owner, brands
+        or country, and if the value is numeric, also match the publication submission year.
+        Uses the full-text index on PostgreSQL and plain icontains lookups elsewhere.
         """
         q = (
             Q(number__icontains=value) |
@@ -358,17 +360,9 @@ class PublicationFilter(django_filters.FilterSet):
             Q(applicant__icontains=value) |
             Q(owner__icontains=value) |
             Q(ar_brand__icontains=value) |
-            Q(en_brand__icontains=value) |
-            Q(country__name__icontains=value)
+            Q(en_brand__icontains=value)
         )
-
-        if value.isdigit():
-            try:
-                year = int(value)
-                q |= Q(date_applied__year=year)
-            except ValueError:
-                pass
-        return queryset.filter(q)
+        return keyword_search(queryset, value, q, 'date_applied')
 
 class ObjectionPubPickFilter(django_filters.FilterSet):
 
@@ -453,15 +447,16 @@ class ObjectionPubPickFilter(django_filters.FilterSet):
         )
 
     def filter_brand(self, queryset, name, value):
-        # Use Q objects to filter on multiple fields
+        # Match the normalized Arabic brand (spelling variants included) or the English brand
         return queryset.filter(
-            Q(ar_brand__icontains=value) | Q(en_brand__icontains=value)
+            normalized_match(value, ['ar_brand_norm']) | Q(en_brand__icontains=value)
         )
         
     def filter_keyword(self, queryset, name, value):
         """
-        Filter the queryset by matching the keyword in number, applicant, or company,
-        and if the value is numeric, also match the publication submission year.
+        Filter the queryset by matching the keyword in number, applicant, owner, brands
+        or country, and if the value is numeric, also match the publication submission year.
+        Uses the full-text index on PostgreSQL and plain icontains lookups elsewhere.
         """
         q = (
             Q(number__icontains=value) |
@@ -469,17 +464,9 @@ class ObjectionPubPickFilter(django_filters.FilterSet):
             Q(applicant__icontains=value) |
             Q(owner__icontains=value) |
             Q(ar_brand__icontains=value) |
-            Q(en_brand__icontains=value) |
-            Q(country__name__icontains=value)
+            Q(en_brand__icontains=value)
         )
-
-        if value.isdigit():
-            try:
-                year = int(value)
-                q |= Q(date_applied__year=year)
-            except ValueError:
-                pass
-        return queryset.filter(q)
+        return keyword_search(queryset, value, q, 'date_applied')
 
 class ObjectionFilter(django_filters.FilterSet):
     
@@ -1,61 +1,160 @@
 #############################################################################
 # Pdf Generation Libraries
 #############################################################################
-import reportlab
+# This module is imported on the first PDF rendered, not with the views, so
+# processes that never render a PDF do not load ReportLab or the fonts.
 from django.contrib.staticfiles import finders
 import io
+import logging
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import Table, TableStyle
+from reportlab import rl_config
 import arabic_reshaper
 from bidi.algorithm import get_display
-from decimal import Decimal
+from functools import lru_cache
 import os
 from django.conf import settings
 from PIL import Image
+from .pdftemplates import FormTemplate
+from .qr import draw_qr
+
+logger = logging.getLogger('documents')
 
 #############################################################################
 # PDF Generation Fonts
 #############################################################################
-font_path = finders.find('fonts/Amiri-Regular.ttf')
-pdfmetrics.registerFont(TTFont('Amiri', font_path))
-font_path = finders.find('fonts/Amiri-Bold.ttf')
-pdfmetrics.registerFont(TTFont('Amiri-bold', font_path))
-font_path = finders.find('fonts/Amiri-Italic.ttf')
-pdfmetrics.registerFont(TTFont('Amiri-italic', font_path))
+# {ReportLab font name: static file}
+PDF_FONTS = {
+    'Amiri': 'fonts/Amiri-Regular.ttf',
+    'Amiri-bold': 'fonts/Amiri-Bold.ttf',
+    'Amiri-italic': 'fonts/Amiri-Italic.ttf',
+}
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """Parses and registers the Amiri fonts, once per process on the first PDF rendered."""
+    for font_name, font_file in PDF_FONTS.items():
+        pdfmetrics.registerFont(TTFont(font_name, finders.find(font_file)))
 
-#############################################################################
 
+def new_canvas(pdf_buffer):
+    register_fonts()
+    # The documented rl_settings switch for binary streams: without it, every
+    # image (the logo of each document) is re-encoded as ASCII85 text
+    rl_config.useA85 = 0
+    return canvas.Canvas(pdf_buffer, pagesize=A4)
+
+#############################################################################
+# Arabic Text Shaping
+#############################################################################
+# One configured reshaper for every label of every PDF
+arabic_text_reshaper = arabic_reshaper.ArabicReshaper()
+
+# Fixed labels printed on the generated PDFs, shaped once by get_shaped_labels()
+STATIC_LABELS = (
+    # Publication pages
+    "حكومة الوحدة الوطنية",
+    "ديوان وزارة الاقتصاد والتجارة",
+    "اشهار علامة تجارية",
+    "شهادة تسجيل علامة تجارية",
+    "الرقم المسلسل للطلب كما قيد بسجل العلامات التجارية :",
+    "تاريخ الطلـــــب :",
+    "طالب التسجيل :",
+    "محل الاقامــــة :",
+    "الـــجــنــســيــــة :",
+    "الجهة التي يوجد بها المحل التجاري او مشروع الاستغلال :",
+    "العلامات التجارية المراد تسجيلها عن البضائع والمنتجات التابعة للفئة :",
+    "عدد النشريــــــة :",
+    "تاريخ النشريــــة :",
+    "مكتب العلامات التجارية",
+    "(QR)",
+    # Objection form
+    "اخطار بالمعارضة في تسجيل علامة تجارية",
+    "بيــانــات مقدم المعارضــة",
+    "رقم طلب التسجيل كما هو مقيد بمكتب العلامات التجارية :",
+    "اسم طالب التسجيـــل :",
+    "رقم النشرية الالكترونية التي اشهر فيها قبول تسجيل العلامة المعترض عليها :",
+    "تاريخ النشـــر :",
+    "اسم المعارض في تسجيل العلامة ولقبه :",
+    "مهنتـــه :",
+    "جنسيتـــه :",
+    "محل اقامتـــه :",
+    "اسم الشركة (اذا كان المعارض شركة) :",
+    "عنوانهـــا :",
+    "الغرض من الشركة :",
+    "عنوان مقرها الرئيسـي :",
+    "عنوان البريد الرئيسي لاستلام المكاتبات المتعلقة بالمعارضة :",
+    "تاريخ تقديم المعارضـــة :",
+    "إذا رأى المعارض عدم الإكتفاء بهذا البيان فله ان يرفق بمعارضته مذكرة من نسختين ببيان الأسباب والوقائع المتعلقة بهذه المعارضة، وإذا كانت",
+    "المعارضة بسبب مطابقة العلامة المقبولة للتسجيل او مشايهتها لعلامة اخرى سبق تسجيلها، فأذكر ارقام تسجيل تلك العلامة وكذلك رقمها المرجعي",
+    "في النشرة الإلكترونية التي أشهرت فيها.",
+    "السيد رئيس مكتب تسجيل العلامات التجارية",
+    "أنا الموقع أذناه ................................................................. بصفتي .............................................................",
+    "أعارض في تسجيل العلامة التجارية المشار اليها أعلاه للأسباب الآتية: .............................................................................",
+    "وأتحمل كل مسؤولية تنتج عن هذا الإعتراض.",
+    "التوقيع: .......................................",
+    "بيــانــات للاستخدام الرسمي ( يعبئها مكتب العلامات )",
+    "رقم المعارضـــة: ....................................................... الـــسنة: ........................................................",
+    "تاريخ استلام المعارضة بالمكتب: ................................................. رقم الإيصال المالي: ................................",
+    "توقيع الموظف المختص وختم المكتب: .......................",
+    "استمارة رقم (4)",
+)
+
+# Number of distinct record values (names, addresses, dates) kept shaped
+SHAPED_VALUES_CACHE_SIZE = 4096
+
+
+def shape_arabic_text(text):
+    """Reshapes the Arabic letters of a text and reorders it for left to right drawing."""
+    return get_display(arabic_text_reshaper.reshape(text))
+
+
+@lru_cache(maxsize=None)
+def get_shaped_labels():
+    return {label: shape_arabic_text(label) for label in STATIC_LABELS}
+
+
+@lru_cache(maxsize=SHAPED_VALUES_CACHE_SIZE)
+def shape_record_value(text):
+    return shape_arabic_text(text)
+
+
+# Function that returns a text ready to be drawn, from the precomputed labels or the values cache
 def process_arabic_text(text):
-    reshaped_text = arabic_reshaper.reshape(text)
-    bidi_text = get_display(reshaped_text)
-    return bidi_text
+    shaped = get_shaped_labels().get(text)
+    if shaped is None:
+        shaped = shape_record_value(text)
+    return shaped
 
 
-def pub_pdf(pub_id, pub_record, pub_qr):
-    pdf_buffer = io.BytesIO()
-    c = canvas.Canvas(pdf_buffer, pagesize=A4)
+@lru_cache(maxsize=None)
+def get_logo_path():
+    return finders.find('img/pub_pdf_logo.jpg')
+
+
+#############################################################################
+# Static layers of the forms
+#############################################################################
+def draw_pub_layer(c, final=False):
+    """The fixed part of a publication page: header, captions and footer."""
     width, height = A4
     c.setLineWidth(0)  # Ensures no border width
 
     # Paper header
-    c.drawImage(finders.find('img/pub_pdf_logo.jpg'), width / 2.3, height - 100, width=80, height=80)
+    c.drawImage(get_logo_path(), width / 2.3, height - 100, width=80, height=80)
     c.setFont("Amiri-bold", 20)
     c.drawCentredString(width / 2, height - 125, process_arabic_text("حكومة الوحدة الوطنية"))
     c.drawCentredString(width / 2, height - 150, process_arabic_text("ديوان وزارة الاقتصاد والتجارة"))
     c.setFont("Amiri-bold", 14)
-    c.drawCentredString(width / 2, height - 175, process_arabic_text("اشهار علامة تجارية"))
+    title = "شهادة تسجيل علامة تجارية" if final else "اشهار علامة تجارية"
+    c.drawCentredString(width / 2, height - 175, process_arabic_text(title))
 
     c.line(30, height - 195, width - 30, height - 195)
 
-    # Date and trans_id
-    c.setFont("Amiri", 14)
-    c.drawCentredString(width / 2, height - 225, process_arabic_text(f"طلب مقدم لتسجيل علامة تجارية رقم: ({pub_record['number_applied']})"))
-
     c.setFont("Amiri-bold", 15)
     c.drawRightString(565, height - 275, process_arabic_text("الرقم المسلسل للطلب كما قيد بسجل العلامات التجارية :"))
     c.drawRightString(565, height - 315, process_arabic_text("تاريخ الطلـــــب :"))
@@ -67,89 +166,100 @@ def pub_pdf(pub_id, pub_record, pub_qr):
     c.drawRightString(565, height - 555, process_arabic_text("عدد النشريــــــة :"))
     c.drawRightString(565, height - 595, process_arabic_text("تاريخ النشريــــة :"))
 
-    c.setFont("Amiri", 12)
-    c.drawRightString(480, height - 317, process_arabic_text(f"{pub_record['date_applied']}"))
-    c.drawRightString(480, height - 356, process_arabic_text(f"{pub_record['applicant']}"))
-    c.drawRightString(480, height - 396, process_arabic_text(f"{pub_record['address']}"))
-    c.drawRightString(480, height - 436, process_arabic_text(f"{pub_record['country']}"))
-    c.drawRightString(270, height - 476, process_arabic_text(f"{pub_record['address']}"))
-    c.drawRightString(480, height - 596, process_arabic_text(f"{pub_record['pub_date']}"))
-    
-    c.setFont("Amiri", 13)
-    c.drawRightString(220, height - 516, process_arabic_text(f"{pub_record['category']}"))
-    c.drawRightString(480, height - 556, process_arabic_text(f"{pub_record['e_number']}"))
-    c.drawRightString(278, height - 276, process_arabic_text(f"{pub_record['number_applied']}"))
-    
-    img_filename = pub_record.get('pub_img', '').replace(settings.MEDIA_URL, '').lstrip('/')
-    img_path = os.path.join(settings.MEDIA_ROOT, img_filename)
-
-    if os.path.exists(img_path):
-        try:
-            with Image.open(img_path) as img:
-                orig_width, orig_height = img.size  # Get original image dimensions
-                
-                max_height = 160  # Set max height
-                aspect_ratio = orig_width / orig_height  # Calculate aspect ratio
-                new_width = max_height * aspect_ratio  # Adjust width to maintain aspect ratio
-                
-                # Set fixed position for TOP-RIGHT corner
-                fixed_right_x = width - 225 # 225 pixels from the right page border
-                fixed_top_y = height - 550  # 550 pixels from the top
-                
-                # Calculate the correct x, y for ReportLab
-                image_x = fixed_right_x - new_width  # Move left by image width
-                image_y = fixed_top_y - max_height  # Move down by image height
-                
-                c.drawInlineImage(img_path, image_x, image_y, width=new_width, height=max_height)
-        except Exception as e:
-            print("Error processing image:", e)  # Debugging
-    else:
-        print("Image not found:", img_path)  # Debugging
-
     # Title
     c.setFont("Amiri-bold", 12)
     c.drawString(60, 80, process_arabic_text("مكتب العلامات التجارية"))
 
-    c.drawImage(ImageReader(pub_qr), width - 170, 50, width=100, height=100)
-    
-    # Save PDF to the BytesIO buffer
-    c.save()
-    pdf_data = pdf_buffer.getvalue()  # Get PDF data from the buffer
-    pdf_buffer.close()  # Close the buffer
-
-    return pdf_data  # Return the PDF data
+    if final:
+        # Footer
+        c.setFillColor(colors.darkslategray)
+        c.drawRightString(width - 70, 80, process_arabic_text("(QR)"))
 
 
-def pub_final_pdf(pub_id, pub_record):
-    pdf_buffer = io.BytesIO()
-    c = canvas.Canvas(pdf_buffer, pagesize=A4)
+def draw_obj_layer(c):
+    """The fixed part of the objection form: header, captions, legal text and the office section."""
     width, height = A4
     c.setLineWidth(0)  # Ensures no border width
 
     # Paper header
-    c.drawImage(finders.find('img/pub_pdf_logo.jpg'), width / 2.3, height - 100, width=80, height=80)
+    c.drawImage(get_logo_path(), width / 1.22, height - 100, width=80, height=80)
     c.setFont("Amiri-bold", 20)
-    c.drawCentredString(width / 2, height - 125, process_arabic_text("حكومة الوحدة الوطنية"))
-    c.drawCentredString(width / 2, height - 150, process_arabic_text("ديوان وزارة الاقتصاد والتجارة"))
+    c.drawCentredString(width / 2, height - 50, process_arabic_text("حكومة الوحدة الوطنية"))
+    c.drawCentredString(width / 2, height - 80, process_arabic_text("ديوان وزارة الاقتصاد والتجارة"))
     c.setFont("Amiri-bold", 14)
-    c.drawCentredString(width / 2, height - 175, process_arabic_text("شهادة تسجيل علامة تجارية"))
+    c.drawCentredString(width / 2, height - 110, process_arabic_text("مكتب العلامات التجارية"))
 
-    c.line(30, height - 195, width - 30, height - 195)
+    c.drawCentredString(width / 2, height - 155, process_arabic_text("اخطار بالمعارضة في تسجيل علامة تجارية"))
+
+    c.setFont("Amiri-bold", 13)
+    c.drawRightString(565, height - 180, process_arabic_text("بيــانــات مقدم المعارضــة"))
+    c.drawRightString(565, height - 210, process_arabic_text("رقم طلب التسجيل كما هو مقيد بمكتب العلامات التجارية :"))
+    c.drawRightString(565, height - 237, process_arabic_text("اسم طالب التسجيـــل :"))
+    c.drawRightString(565, height - 264, process_arabic_text("رقم النشرية الالكترونية التي اشهر فيها قبول تسجيل العلامة المعترض عليها :"))
+    c.drawRightString(565, height - 291, process_arabic_text("تاريخ النشـــر :"))
+    c.drawRightString(565, height - 318, process_arabic_text("اسم المعارض في تسجيل العلامة ولقبه :"))
+    c.drawRightString(565, height - 345, process_arabic_text("مهنتـــه :"))
+    c.drawRightString(270, height - 345, process_arabic_text("جنسيتـــه :"))
+    c.drawRightString(565, height - 372, process_arabic_text("محل اقامتـــه :"))
+    c.drawRightString(565, height - 399, process_arabic_text("اسم الشركة (اذا كان المعارض شركة) :"))
+    c.drawRightString(565, height - 426, process_arabic_text("عنوانهـــا :"))
+    c.drawRightString(270, height - 426, process_arabic_text("الغرض من الشركة :"))
+    c.drawRightString(565, height - 453, process_arabic_text("عنوان مقرها الرئيسـي :"))
+    c.drawRightString(565, height - 480, process_arabic_text("عنوان البريد الرئيسي لاستلام المكاتبات المتعلقة بالمعارضة :"))
+    c.drawRightString(565, height - 507, process_arabic_text("تاريخ تقديم المعارضـــة :"))
+
+    c.line(565, height - 185, width - 140, height - 185)
+    c.line(565, height - 665, width - 245, height - 665)
+    c.setLineWidth(1)
+    c.line(40, height - 130, width - 40, height - 130)
+    c.line(40, height - 523, width - 40, height - 523)
+    c.line(40, height - 640, width - 40, height - 640)
+    
+    c.setFont("Amiri", 11)
+    c.drawRightString(565, height - 772, process_arabic_text("إذا رأى المعارض عدم الإكتفاء بهذا البيان فله ان يرفق بمعارضته مذكرة من نسختين ببيان الأسباب والوقائع المتعلقة بهذه المعارضة، وإذا كانت"))
+    c.drawRightString(565, height - 789, process_arabic_text("المعارضة بسبب مطابقة العلامة المقبولة للتسجيل او مشايهتها لعلامة اخرى سبق تسجيلها، فأذكر ارقام تسجيل تلك العلامة وكذلك رقمها المرجعي"))
+    c.drawRightString(565, height - 806, process_arabic_text("في النشرة الإلكترونية التي أشهرت فيها."))
+
+    c.drawRightString(565, height - 542, process_arabic_text("السيد رئيس مكتب تسجيل العلامات التجارية"))
+    c.drawRightString(565, height - 562, process_arabic_text("أنا الموقع أذناه ................................................................. بصفتي ............................................................."))
+    c.drawRightString(565, height - 582, process_arabic_text("أعارض في تسجيل العلامة التجارية المشار اليها أعلاه للأسباب الآتية: ............................................................................."))
+    c.drawRightString(565, height - 602, process_arabic_text("وأتحمل كل مسؤولية تنتج عن هذا الإعتراض."))
+
+    c.setFont("Amiri-bold", 11)
+    c.drawRightString(565, height - 624, process_arabic_text("التوقيع: ......................................."))
+
+    c.setFont("Amiri-bold", 12)
+    c.drawRightString(565, height - 660, process_arabic_text("بيــانــات للاستخدام الرسمي ( يعبئها مكتب العلامات )"))
+    c.drawRightString(565, height - 688, process_arabic_text("رقم المعارضـــة: ....................................................... الـــسنة: ........................................................"))
+    c.drawRightString(565, height - 716, process_arabic_text("تاريخ استلام المعارضة بالمكتب: ................................................. رقم الإيصال المالي: ................................"))
+    c.drawRightString(565, height - 744, process_arabic_text("توقيع الموظف المختص وختم المكتب: ......................."))
+
+    c.setFillColor(colors.slategray)
+    c.drawString(26, height - 35, process_arabic_text("استمارة رقم (4)"))
+
+
+PUB_INITIAL_TEMPLATE = FormTemplate('pub_initial_layer', draw_pub_layer)
+PUB_FINAL_TEMPLATE = FormTemplate('pub_final_layer', lambda c: draw_pub_layer(c, final=True))
+OBJECTION_TEMPLATE = FormTemplate('objection_layer', draw_obj_layer)
+
+
+#############################################################################
+# Documents
+#############################################################################
+def draw_pub_page(c, pub_record, pub_qr=None, final=False):
+    """
+    Draws one publication page on a canvas: the initial publication notice, with
+    the QR code of pub_qr (see publication_qr_data), or the registration
+    certificate when final is True. The static layer comes from
+    the form's template, only the record's values and QR code are drawn here.
+    """
+    width, height = A4
+    (PUB_FINAL_TEMPLATE if final else PUB_INITIAL_TEMPLATE).draw(c)
 
     # Date and trans_id
+    serial_number = pub_record['pub_no'] if final else pub_record['number_applied']
     c.setFont("Amiri", 14)
-    c.drawCentredString(width / 2, height - 225, process_arabic_text(f"طلب مقدم لتسجيل علامة تجارية رقم: ({pub_record['pub_no']})"))
-
-    c.setFont("Amiri-bold", 15)
-    c.drawRightString(565, height - 275, process_arabic_text("الرقم المسلسل للطلب كما قيد بسجل العلامات التجارية :"))
-    c.drawRightString(565, height - 315, process_arabic_text("تاريخ الطلـــــب :"))
-    c.drawRightString(565, height - 355, process_arabic_text("طالب التسجيل :"))
-    c.drawRightString(565, height - 395, process_arabic_text("محل الاقامــــة :"))
-    c.drawRightString(565, height - 435, process_arabic_text("الـــجــنــســيــــة :"))
-    c.drawRightString(565, height - 475, process_arabic_text("الجهة التي يوجد بها المحل التجاري او مشروع الاستغلال :"))
-    c.drawRightString(565, height - 515, process_arabic_text("العلامات التجارية المراد تسجيلها عن البضائع والمنتجات التابعة للفئة :"))
-    c.drawRightString(565, height - 555, process_arabic_text("عدد النشريــــــة :"))
-    c.drawRightString(565, height - 595, process_arabic_text("تاريخ النشريــــة :"))
+    c.drawCentredString(width / 2, height - 225, process_arabic_text(f"طلب مقدم لتسجيل علامة تجارية رقم: ({serial_number})"))
 
     c.setFont("Amiri", 12)
     c.drawRightString(480, height - 317, process_arabic_text(f"{pub_record['date_applied']}"))
@@ -162,41 +272,53 @@ def pub_final_pdf(pub_id, pub_record):
     c.setFont("Amiri", 13)
     c.drawRightString(220, height - 516, process_arabic_text(f"{pub_record['category']}"))
     c.drawRightString(480, height - 556, process_arabic_text(f"{pub_record['e_number']}"))
-    c.drawRightString(278, height - 276, process_arabic_text(f"{pub_record['pub_no']}"))
+    c.drawRightString(278, height - 276, process_arabic_text(f"{serial_number}"))
     
     img_filename = pub_record.get('pub_img', '').replace(settings.MEDIA_URL, '').lstrip('/')
     img_path = os.path.join(settings.MEDIA_ROOT, img_filename)
 
-    if os.path.exists(img_path):
+    if img_filename in ('', 'N/A'):
+        pass  # Publication without an image
+    elif os.path.isfile(img_path):
         try:
-            with Image.open(img_path) as img:
-                orig_width, orig_height = img.size  # Get original image dimensions
-                
-                max_height = 160  # Set max height
-                aspect_ratio = orig_width / orig_height  # Calculate aspect ratio
-                new_width = max_height * aspect_ratio  # Adjust width to maintain aspect ratio
-                
-                # Set fixed position for TOP-RIGHT corner
-                fixed_right_x = width - 225 # 225 pixels from the right page border
-                fixed_top_y = height - 550  # 550 pixels from the top
-                
-                # Calculate the correct x, y for ReportLab
-                image_x = fixed_right_x - new_width  # Move left by image width
-                image_y = fixed_top_y - max_height  # Move down by image height
+            # Dimensions stored by the image pipeline, read from the upload when it was not processed yet
+            img_size = pub_record.get('pub_img_size')
+            if img_size:
+                orig_width, orig_height = img_size
+            else:
+                with Image.open(img_path) as img:
+                    orig_width, orig_height = img.size  # Get original image dimensions
                 
+            max_height = 160  # Set max height
+            aspect_ratio = orig_width / orig_height  # Calculate aspect ratio
+            new_width = max_height * aspect_ratio  # Adjust width to maintain aspect ratio
+            
+            # Set fixed position for TOP-RIGHT corner
+            fixed_right_x = width - 225 # 225 pixels from the right page border
+            fixed_top_y = height - 550  # 550 pixels from the top
+            
+            # Calculate the correct x, y for ReportLab
+            image_x = fixed_right_x - new_width  # Move left by image width
+            image_y = fixed_top_y - max_height  # Move down by image height
+            
+            if img_size:
+                # The pipeline's JPEG copy is embedded as it is, without decoding it
+                c.drawImage(img_path, image_x, image_y, width=new_width, height=max_height)
+            else:
                 c.drawInlineImage(img_path, image_x, image_y, width=new_width, height=max_height)
         except Exception as e:
-            print("Error processing image:", e)  # Debugging
+            logger.warning(f"Could not draw the image {img_path} of publication {pub_record.get('pub_no')}: {e}")
     else:
-        print("Image not found:", img_path)  # Debugging
+        logger.warning(f"Image {img_path} of publication {pub_record.get('pub_no')} not found")
 
-    # Title
-    c.setFont("Amiri-bold", 12)
-    c.drawString(60, 80, process_arabic_text("مكتب العلامات التجارية"))
+    if not final:
+        draw_qr(c, 'publication', pub_qr, width - 170, 50, 100)
 
-    # Footer
-    c.setFillColor(colors.darkslategray)
-    c.drawRightString(width - 70, 80, process_arabic_text("(QR)"))
+
+def pub_pdf(pub_id, pub_record, pub_qr):
+    pdf_buffer = io.BytesIO()
+    c = new_canvas(pdf_buffer)
+    draw_pub_page(c, pub_record, pub_qr)
 
     # Save PDF to the BytesIO buffer
     c.save()
@@ -206,40 +328,44 @@ def pub_final_pdf(pub_id, pub_record):
     return pdf_data  # Return the PDF data
 
 
-def obj_pdf(obj_id, obj_record, obj_qr):
+def pub_final_pdf(pub_id, pub_record):
     pdf_buffer = io.BytesIO()
-    c = canvas.Canvas(pdf_buffer, pagesize=A4)
-    width, height = A4
-    c.setLineWidth(0)  # Ensures no border width
+    c = new_canvas(pdf_buffer)
+    draw_pub_page(c, pub_record, final=True)
 
-    # Paper header
-    c.drawImage(finders.find('img/pub_pdf_logo.jpg'), width / 1.22, height - 100, width=80, height=80)
-    c.setFont("Amiri-bold", 20)
-    c.drawCentredString(width / 2, height - 50, process_arabic_text("حكومة الوحدة الوطنية"))
-    c.drawCentredString(width / 2, height - 80, process_arabic_text("ديوان وزارة الاقتصاد والتجارة"))
-    c.setFont("Amiri-bold", 14)
-    c.drawCentredString(width / 2, height - 110, process_arabic_text("مكتب العلامات التجارية"))
+    # Save PDF to the BytesIO buffer
+    c.save()
+    pdf_data = pdf_buffer.getvalue()  # Get PDF data from the buffer
+    pdf_buffer.close()  # Close the buffer
 
+    return pdf_data  # Return the PDF data
 
 
-    c.drawCentredString(width / 2, height - 155, process_arabic_text("اخطار بالمعارضة في تسجيل علامة تجارية"))
+def pub_batch_pdf(pages, final=False):
+    """
+    Renders many publications as the pages of a single PDF. The static layer, the
+    fonts and the logo are shared by all the pages, so each is embedded only once.
 
-    c.setFont("Amiri-bold", 13)
-    c.drawRightString(565, height - 180, process_arabic_text("بيــانــات مقدم المعارضــة"))
-    c.drawRightString(565, height - 210, process_arabic_text("رقم طلب التسجيل كما هو مقيد بمكتب العلامات التجارية :"))
-    c.drawRightString(565, height - 237, process_arabic_text("اسم طالب التسجيـــل :"))
-    c.drawRightString(565, height - 264, process_arabic_text("رقم النشرية الالكترونية التي اشهر فيها قبول تسجيل العلامة المعترض عليها :"))
-    c.drawRightString(565, height - 291, process_arabic_text("تاريخ النشـــر :"))
-    c.drawRightString(565, height - 318, process_arabic_text("اسم المعارض في تسجيل العلامة ولقبه :"))
-    c.drawRightString(565, height - 345, process_arabic_text("مهنتـــه :"))
-    c.drawRightString(270, height - 345, process_arabic_text("جنسيتـــه :"))
-    c.drawRightString(565, height - 372, process_arabic_text("محل اقامتـــه :"))
-    c.drawRightString(565, height - 399, process_arabic_text("اسم الشركة (اذا كان المعارض شركة) :"))
-    c.drawRightString(565, height - 426, process_arabic_text("عنوانهـــا :"))
-    c.drawRightString(270, height - 426, process_arabic_text("الغرض من الشركة :"))
-    c.drawRightString(565, height - 453, process_arabic_text("عنوان مقرها الرئيسـي :"))
-    c.drawRightString(565, height - 480, process_arabic_text("عنوان البريد الرئيسي لاستلام المكاتبات المتعلقة بالمعارضة :"))
-    c.drawRightString(565, height - 507, process_arabic_text("تاريخ تقديم المعارضـــة :"))
+    :param pages: Iterable of (pub_record, QR code data) pairs, the QR code is not printed on final pages.
+    """
+    pdf_buffer = io.BytesIO()
+    c = new_canvas(pdf_buffer)
+    for pub_record, pub_qr in pages:
+        draw_pub_page(c, pub_record, pub_qr, final=final)
+        c.showPage()
+
+    c.save()
+    pdf_data = pdf_buffer.getvalue()
+    pdf_buffer.close()
+
+    return pdf_data
+
+
+def obj_pdf(obj_id, obj_record, obj_qr):
+    pdf_buffer = io.BytesIO()
+    c = new_canvas(pdf_buffer)
+    width, height = A4
+    OBJECTION_TEMPLATE.draw(c)
 
     c.setFont("Amiri", 12)
     c.drawRightString(295, height - 210, process_arabic_text(f"{obj_record['number_applied']}"))
@@ -257,35 +383,7 @@ def obj_pdf(obj_id, obj_record, obj_qr):
     c.drawRightString(300, height - 480, process_arabic_text(f"{obj_record['com_mail_address']}"))
     c.drawRightString(450, height - 507, process_arabic_text(f"{obj_record['obj_date']}"))
 
-    c.line(565, height - 185, width - 140, height - 185)
-    c.line(565, height - 665, width - 245, height - 665)
-    c.setLineWidth(1)
-    c.line(40, height - 130, width - 40, height - 130)
-    c.line(40, height - 523, width - 40, height - 523)
-    c.line(40, height - 640, width - 40, height - 640)
-    
-    c.setFont("Amiri", 11)
-    c.drawRightString(565, height - 772, process_arabic_text("إذا رأى المعارض عدم الإكتفاء بهذا البيان فله ان يرفق بمعارضته مذكرة من نسختين ببيان الأسباب والوقائع المتعلقة بهذه المعارضة، وإذا كانت"))
-    c.drawRightString(565, height - 789, process_arabic_text("المعارضة بسبب مطابقة العلامة المقبولة للتسجيل او مشايهتها لعلامة اخرى سبق تسجيلها، فأذكر ارقام تسجيل تلك العلامة وكذلك رقمها المرجعي"))
-    c.drawRightString(565, height - 806, process_arabic_text("في النشرة الإلكترونية التي أشهرت فيها."))
-
-    c.drawRightString(565, height - 542, process_arabic_text("السيد رئيس مكتب تسجيل العلامات التجارية"))
-    c.drawRightString(565, height - 562, process_arabic_text("أنا الموقع أذناه ................................................................. بصفتي ............................................................."))
-    c.drawRightString(565, height - 582, process_arabic_text("أعارض في تسجيل العلامة التجارية المشار اليها أعلاه للأسباب الآتية: ............................................................................."))
-    c.drawRightString(565, height - 602, process_arabic_text("وأتحمل كل مسؤولية تنتج عن هذا الإعتراض."))
-
-    c.setFont("Amiri-bold", 11)
-    c.drawRightString(565, height - 624, process_arabic_text("التوقيع: ......................................."))
-
-    c.setFont("Amiri-bold", 12)
-    c.drawRightString(565, height - 660, process_arabic_text("بيــانــات للاستخدام الرسمي ( يعبئها مكتب العلامات )"))
-    c.drawRightString(565, height - 688, process_arabic_text("رقم المعارضـــة: ....................................................... الـــسنة: ........................................................"))
-    c.drawRightString(565, height - 716, process_arabic_text("تاريخ استلام المعارضة بالمكتب: ................................................. رقم الإيصال المالي: ................................"))
-    c.drawRightString(565, height - 744, process_arabic_text("توقيع الموظف المختص وختم المكتب: ......................."))
-
-    c.drawImage(ImageReader(obj_qr), 35, height - 110, width=60, height=60)
-    c.setFillColor(colors.slategray)
-    c.drawString(26, height - 35, process_arabic_text("استمارة رقم (4)"))
+    draw_qr(c, 'objection', obj_qr, 35, height - 110, 60)
     
     # Save PDF to the BytesIO buffer
     c.save()
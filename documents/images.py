@@ -0,0 +1,121 @@
+# Imports of the required python modules and libraries
+######################################################
+import logging
+from io import BytesIO
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+from .models import Publication
+from .pdfcache import invalidate_publication_pdfs, pregenerated_kinds, schedule_pdf_pregeneration
+
+logger = logging.getLogger('documents')
+
+# Height of the list thumbnails: twice the 80px they are shown at, for high density screens
+THUMBNAIL_HEIGHT = 160
+
+# Height of the copy printed on the PDFs: 160pt at about 300 dpi
+PDF_IMAGE_HEIGHT = 640
+
+# Fields filled by the pipeline, cleared when the publication has no image
+DERIVED_FIELDS = {'img_thumb': '', 'img_pdf': '', 'img_width': None, 'img_height': None, 'img_source': ''}
+
+
+def normalize_image(image):
+    """
+    Applies the EXIF orientation and converts the image to RGB, transparent
+    areas laid on white, so every derived file shows the upload as intended.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def scaled_to_height(image, height):
+    """A copy of the image at most `height` pixels high, keeping its aspect ratio."""
+    if image.height <= height:
+        return image.copy()
+    width = max(1, round(image.width * height / image.height))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode_image(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def thumbnail_format():
+    """WebP when Pillow was built with it, JPEG otherwise: (PIL format, extension)."""
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+# Function that builds the derived images of a publication's uploaded image
+def process_publication_image(publication_id):
+    """
+    Builds the list thumbnail and the PDF copy of a publication's image and stores
+    them with the image's dimensions. Written with update() so updated_at stays the
+    same; the PDFs printed with the previous image copy are dropped and rendered
+    again instead (img_source is part of their ETag). Returns False when there was
+    nothing to do.
+    """
+    publication = Publication.objects.filter(pk=publication_id).only(
+        'img_file', 'img_thumb', 'img_pdf', 'img_source', 'status', 'deleted_at',
+    ).first()
+    if publication is None:
+        return False
+    previous_files = [publication.img_thumb.name, publication.img_pdf.name]
+
+    source_name = publication.img_file.name if publication.img_file else ''
+    if source_name == publication.img_source:
+        return False
+    if not source_name:
+        derived = DERIVED_FIELDS
+    else:
+        with publication.img_file.open('rb') as source, Image.open(source) as original:
+            image = normalize_image(original)
+
+        thumb_format, thumb_extension = thumbnail_format()
+        thumb_data = encode_image(scaled_to_height(image, THUMBNAIL_HEIGHT), thumb_format, quality=80)
+        pdf_data = encode_image(scaled_to_height(image, PDF_IMAGE_HEIGHT), 'JPEG', quality=85, optimize=True)
+
+        derived = {
+            'img_thumb': save_derived_file(publication, 'img_thumb', f"{publication_id}.{thumb_extension}", thumb_data),
+            'img_pdf': save_derived_file(publication, 'img_pdf', f"{publication_id}.jpg", pdf_data),
+            'img_width': image.width,
+            'img_height': image.height,
+            'img_source': source_name,
+        }
+
+    rows = Publication.objects.filter(pk=publication_id)
+    if source_name:
+        # Only stored if the image was not replaced while it was being processed
+        rows = rows.filter(img_file=source_name)
+    stored = rows.update(**derived)
+    obsolete = previous_files if stored else [derived['img_thumb'], derived['img_pdf']]
+    storage = Publication._meta.get_field('img_thumb').storage
+    for name in obsolete:
+        if name:
+            storage.delete(name)
+    if stored:
+        invalidate_publication_pdfs(publication)
+        kinds = pregenerated_kinds(publication)
+        if kinds:
+            schedule_pdf_pregeneration(publication_id, kinds)
+    return bool(stored)
+
+
+def save_derived_file(publication, field_name, filename, data):
+    field = Publication._meta.get_field(field_name)
+    return field.storage.save(field.generate_filename(publication, filename), ContentFile(data))
+
+
+def schedule_image_processing(publication_id):
+    """Queues the processing of a publication's uploaded image."""
+    from .tasks import process_publication_image_task
+    try:
+        process_publication_image_task.delay(publication_id)
+    except Exception as e:
+        logger.error(f"Could not queue the image processing of publication {publication_id}: {e}")
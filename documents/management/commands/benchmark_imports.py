@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from django.core.management.base import BaseCommand
+
+# Measured in a new interpreter, so nothing is already imported
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+import importlib
+for module in {modules!r}:
+    importlib.import_module(module)
+loaded = time.perf_counter()
+{after}
+done = time.perf_counter()
+print((setup - start) * 1000, (loaded - setup) * 1000, (done - loaded) * 1000)
+"""
+
+# Code run after the imports to measure the first PDF's setup (fonts and labels)
+FIRST_RENDER = """
+from documents import genpdf
+genpdf.register_fonts()
+genpdf.get_shaped_labels()
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measures the cold import time of the project (django.setup, URLconf and views) and of the PDF setup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Number of new interpreters per measurement, the fastest is kept')
+
+    def measure(self, modules, after='', repeat=5):
+        script = IMPORT_SCRIPT.format(modules=modules, after=after)
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-c', script], capture_output=True, text=True, check=True, env=os.environ.copy(),
+            ).stdout
+            runs.append([float(value) for value in output.split()[-3:]])
+        return min(runs, key=sum)
+
+    def handle(self, *args, **kwargs):
+        repeat = kwargs['repeat']
+        setup, urls, _ = self.measure(['core.urls'], repeat=repeat)
+        self.stdout.write(f'django.setup():              {setup:8.1f} ms')
+        self.stdout.write(f'URLconf and views:           {urls:8.1f} ms')
+
+        _, _, first_pdf = self.measure(['core.urls'], after=FIRST_RENDER, repeat=repeat)
+        self.stdout.write(f'First PDF (ReportLab, fonts, labels): {first_pdf:8.1f} ms, paid by the processes that render')
+        self.stdout.write(self.style.SUCCESS(f'Cold start up to a served request: {setup + urls:.1f} ms'))
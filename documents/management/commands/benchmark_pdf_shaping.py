@@ -0,0 +1,58 @@
+import io
+import timeit
+from unittest import mock
+from django.core.management.base import BaseCommand
+from reportlab.pdfgen import canvas
+from documents import genpdf
+
+# Values of a typical publication, as returned by publication_record()
+SAMPLE_RECORD = {
+    'pub_id': 1, 'pub_year': 2024, 'pub_date': '2024-01-01', 'pub_no': 15, 'dec_no': 120,
+    'applicant': 'شركة المدار الجديد للاتصالات', 'owner': 'شركة المدار الجديد', 'country': 'ليبيا',
+    'address': 'طرابلس - شارع عمر المختار', 'date_applied': '2023-11-20', 'number_applied': 3344,
+    'ar_brand': 'المدار', 'en_brand': 'Almadar', 'category': 'الفئة 38', 'pub_img': 'N/A',
+    'e_number': 12, 'status': 1, 'notes': 'N/A',
+}
+
+
+class Command(BaseCommand):
+    help = 'Measures the Arabic shaping cost of one publication PDF, without and with the shaping caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help='Number of PDFs shaped per measurement')
+
+    def handle(self, *args, **kwargs):
+        repeat = kwargs['repeat']
+
+        # The texts one publication page shapes, recorded by drawing it once
+        texts = []
+        genpdf.register_fonts()
+        original = genpdf.process_arabic_text
+        def record(text):
+            texts.append(text)
+            return original(text)
+        with mock.patch.object(genpdf, 'process_arabic_text', record):
+            genpdf.draw_pub_page(canvas.Canvas(io.BytesIO()), SAMPLE_RECORD, final=True)
+
+        def shape_uncached():
+            for text in texts:
+                genpdf.shape_arabic_text(text)
+
+        def shape_new_record():
+            # Labels precomputed, record values not seen before
+            genpdf.shape_record_value.cache_clear()
+            for text in texts:
+                genpdf.process_arabic_text(text)
+
+        def shape_cached():
+            for text in texts:
+                genpdf.process_arabic_text(text)
+
+        before = timeit.timeit(shape_uncached, number=repeat) / repeat
+        new_record = timeit.timeit(shape_new_record, number=repeat) / repeat
+        after = timeit.timeit(shape_cached, number=repeat) / repeat
+        self.stdout.write(f'{len(texts)} texts shaped per publication PDF')
+        self.stdout.write(f'Without caches:        {before * 1000:.3f} ms per PDF')
+        self.stdout.write(f'Labels cached:         {new_record * 1000:.3f} ms per PDF')
+        self.stdout.write(f'Labels and values:     {after * 1000:.3f} ms per PDF')
+        self.stdout.write(self.style.SUCCESS(f'Shaping is {before / new_record:.1f}x faster for a new record, {before / after:.0f}x for a repeated one'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from documents.models import Publication
+from documents.images import process_publication_image
+
+class Command(BaseCommand):
+    help = 'Builds the list thumbnails and PDF copies of the publication images that were uploaded before the image pipeline or changed since'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild the images of every publication, not only the missing ones')
+
+    def handle(self, *args, **kwargs):
+        publications = Publication.objects.exclude(img_file='').exclude(img_file__isnull=True)
+        if kwargs['all']:
+            publications.update(img_source='')
+        else:
+            publications = publications.exclude(img_source=F('img_file'))
+
+        processed = failed = 0
+        for publication_id in publications.values_list('pk', flat=True).iterator():
+            try:
+                processed += process_publication_image(publication_id)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Could not process the image of publication {publication_id}: {e}'))
+        self.stdout.write(self.style.SUCCESS(f'Processed the images of {processed} publications ({failed} failed)'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from documents.models import Decree, Publication
+from documents.search import is_postgres, rebuild_search_vectors, rebuild_normalized_fields
+from documents.similarity import rebuild_brand_keys, refresh_brand_matches
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search vectors, normalized search columns and phonetic brand keys of decrees and publications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Only fill in records that have not been indexed yet')
+        parser.add_argument('--matches', action='store_true', help='Also recompute the similar brands list of every publication')
+
+    def handle(self, *args, **kwargs):
+        for model in (Decree, Publication):
+            updated = rebuild_normalized_fields(model, only_missing=kwargs['missing'])
+            self.stdout.write(self.style.SUCCESS(f'Updated the normalized search columns of {updated} {model.__name__} records'))
+            updated = rebuild_brand_keys(model, only_missing=kwargs['missing'])
+            self.stdout.write(self.style.SUCCESS(f'Updated the phonetic brand keys of {updated} {model.__name__} records'))
+
+        if kwargs['matches']:
+            publications = Publication.objects.filter(deleted_at__isnull=True)
+            for publication in publications.iterator():
+                refresh_brand_matches(publication)
+            self.stdout.write(self.style.SUCCESS(f'Recomputed the similar brands of {publications.count()} publications'))
+
+        if not is_postgres():
+            self.stdout.write(self.style.WARNING('Full-text search is only available on PostgreSQL, skipping search vectors'))
+            return
+
+        for model in (Decree, Publication):
+            updated = rebuild_search_vectors(model, only_missing=kwargs['missing'])
+            self.stdout.write(self.style.SUCCESS(f'Updated the search vector of {updated} {model.__name__} records'))
@@ -1,6 +1,7 @@
 # Imports of the required python modules and libraries
 ######################################################
 from django.db import models
+from django.conf import settings
 import uuid
 import os
 import json
@@ -11,6 +12,7 @@ import string
 from django.core.validators import FileExtensionValidator
 from django.db.models import Max
 from django.core.exceptions import ValidationError
+from django.contrib.postgres.search import SearchVectorField
 
 # Status Choices Lists:
 #######################
@@ -26,6 +28,13 @@ class PublicationStatus(models.IntegerChoices):
     FINAL = 3, "نشر نهائي"
     WITHDRAW = 4, "مسحوب"
 
+class ExportStatus(models.IntegerChoices):
+    PENDING = 1, "في الانتظار"
+    RUNNING = 2, "قيد التجهيز"
+    DONE = 3, "جاهز للتحميل"
+    FAILED = 4, "فشل"
+    EXPIRED = 5, "منتهي الصلاحية"
+
 class ObjectionStatus(models.IntegerChoices):
     PENDING = 1, "في انتظار الدفع"
     UNCONFIRM = 2, "في انتظار التأكيد"
@@ -206,6 +215,13 @@ class Decree(models.Model):
     is_canceled = models.BooleanField(default=False, verbose_name="تم الغاءه")
     number_canceled = models.CharField(blank=True, null=True, verbose_name="رقم القرار المسحوب او الملغي")
     is_placeholder = models.BooleanField(default=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    ar_brand_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    applicant_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    company_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    en_brand_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    ar_brand_key = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    en_brand_key = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -215,6 +231,10 @@ class Decree(models.Model):
         verbose_name = "قرار" 
         verbose_name_plural = "قرارات" 
         ordering = ['-is_placeholder','-id']
+        indexes = [
+            # Serves the decree autocomplete: accepted decrees of a year, by number
+            models.Index(fields=['status', 'date', 'number'], name='decree_status_date_number_idx'),
+        ]
         permissions = [
             ("download_doc", " تحميل الملفات "),
         ]
@@ -261,6 +281,25 @@ class Publication(models.Model):
     
     objection_date = models.DateField(blank=True, null=True, verbose_name="تاريخ الاعتراض")
     is_objected = models.BooleanField(default=False, verbose_name="تم الاعتراض عليه")
+    search_vector = SearchVectorField(null=True, editable=False)
+    ar_brand_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    applicant_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    owner_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    en_brand_norm = models.CharField(max_length=255, blank=True, default='', editable=False)
+    ar_brand_key = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    en_brand_key = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    # Pre-rendered initial/final publication PDFs and the ETag of the data they were rendered from (see documents.pdfcache)
+    initial_pdf = models.FileField(upload_to=generate_random_filename, blank=True, editable=False)
+    initial_pdf_etag = models.CharField(max_length=32, blank=True, default='', editable=False)
+    final_pdf = models.FileField(upload_to=generate_random_filename, blank=True, editable=False)
+    final_pdf_etag = models.CharField(max_length=32, blank=True, default='', editable=False)
+    # Images derived from img_file by the image pipeline (see documents.images): list thumbnail, copy sized
+    # for the PDFs, dimensions of the upload once upright, and the img_file they were built from
+    img_thumb = models.ImageField(upload_to=generate_random_filename, blank=True, editable=False)
+    img_pdf = models.ImageField(upload_to=generate_random_filename, blank=True, editable=False)
+    img_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    img_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    img_source = models.CharField(max_length=255, blank=True, default='', editable=False)
     
     created_at = models.DateTimeField(default=default_created_at, verbose_name="تاريخ النشر")
     updated_at = models.DateTimeField(auto_now=True)
@@ -270,6 +309,10 @@ class Publication(models.Model):
         verbose_name = "اشهار" 
         verbose_name_plural = "اشهارات" 
         ordering = ['-id']
+        indexes = [
+            # Serves the publication autocomplete: initial publications of a year, by number
+            models.Index(fields=['status', 'created_at', 'number'], name='pub_status_created_number_idx'),
+        ]
         permissions = [
             ("gen_pub_pdf", " انشاء PDF اشهار مبدئي "),
             ("pub_change_status", " تغيير حالة إشهار من مبدئي الى نهائي "),
@@ -293,6 +336,11 @@ class Publication(models.Model):
     def __str__(self):
         return str(self.number)
 
+    @property
+    def has_derived_images(self):
+        """Whether img_thumb, img_pdf and the dimensions were built from the current img_file."""
+        return bool(self.img_file) and self.img_source == self.img_file.name
+
     @staticmethod
     def get_table_class(context="default"):
         """Returns the appropriate table class based on context."""
@@ -311,6 +359,22 @@ class Publication(models.Model):
     def get_form_class(cls):
         return 'documents.forms.PublicationForm'
 
+class BrandMatch(models.Model):
+    """Precomputed similar brand (decree or publication) of a publication, refreshed in the background."""
+    publication = models.ForeignKey(Publication, on_delete=models.CASCADE, related_name='brand_matches')
+    matched_decree = models.ForeignKey(Decree, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    matched_publication = models.ForeignKey(Publication, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "علامة مشابهة"
+        verbose_name_plural = "علامات مشابهة"
+        ordering = ['-score']
+
+    def __str__(self):
+        return f"{self.publication_id} ~ {self.matched_decree_id or self.matched_publication_id} ({self.score})"
+
 class Objection(models.Model):
     """Model representing a minister decree."""
     number = models.IntegerField(blank=False, null=False, verbose_name="ر.ت")
@@ -427,3 +491,50 @@ class FormPlus(models.Model):
     @classmethod
     def get_form_class(cls):
         return 'documents.forms.FormPlusForm'
+
+class ExportJob(models.Model):
+    """
+    Bulk export built by Celery tasks: the ZIP of the files plus a CSV manifest of a
+    decree or publication list filter, or the rendered PDFs of a bulletin.
+    """
+    MODEL_CHOICES = [
+        ('decree', 'القرارات'),
+        ('publication', 'الاشهارات'),
+        ('bulletin', 'النشريات'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='export_jobs', verbose_name="المستخدم")
+    model_name = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name="القسم")
+    # GET parameters of the filtered list the export was started from
+    params = models.JSONField(default=dict, blank=True)
+    status = models.IntegerField(choices=ExportStatus.choices, default=ExportStatus.PENDING, verbose_name="الحالة")
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to=generate_random_filename, blank=True, verbose_name="الملف")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الطلب")
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="متاح حتى")
+
+    class Meta:
+        verbose_name = "تصدير"
+        verbose_name_plural = "عمليات التصدير"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_model_name_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        """Percentage of the records processed."""
+        if self.status == ExportStatus.DONE:
+            return 100
+        return int(self.processed * 100 / self.total) if self.total else 0
+
+    @property
+    def is_active(self):
+        return self.status in (ExportStatus.PENDING, ExportStatus.RUNNING)
+
+    @property
+    def is_ready(self):
+        return self.status == ExportStatus.DONE and bool(self.file)
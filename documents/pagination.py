@@ -0,0 +1,302 @@
+# Imports of the required python modules and libraries
+######################################################
+import hashlib
+import json
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django_tables2 import RequestConfig
+from django_tables2.rows import BoundRows
+from .search import is_postgres
+
+# Template rendering the previous/next links of keyset paginated tables
+KEYSET_TABLE_TEMPLATE = "partials/keyset_table.html"
+
+# Salt of the cursor signatures, so no other signed value is accepted as a cursor
+CURSOR_SALT = 'documents.pagination.cursor'
+
+
+class CursorSerializer(signing.JSONSerializer):
+    """Serializes the cursor payloads, whose keys may hold dates and decimals."""
+
+    def dumps(self, obj):
+        return json.dumps(obj, cls=DjangoJSONEncoder, separators=(',', ':')).encode('latin-1')
+
+
+# Ordering helpers
+##################
+def resolve_ordering(model, term, depth=0):
+    """
+    Expands an order_by term into concrete (path, descending) pairs. Ordering on a
+    relation is expanded to the related model's Meta.ordering (or pk), the same way
+    Django orders it, so the seek keys match the rows' actual order.
+    """
+    descending = term.startswith('-')
+    path = term.lstrip('-')
+    if path == 'pk':
+        path = model._meta.pk.name
+
+    current, field = model, None
+    parts = path.split('__')
+    for i, part in enumerate(parts):
+        try:
+            field = current._meta.get_field(part)
+        except FieldDoesNotExist:
+            # Annotations (e.g. the search rank) are used as they are
+            return [(path, descending)]
+        if field.is_relation and i < len(parts) - 1:
+            current = field.related_model
+
+    if field is not None and field.is_relation and depth < 3:
+        related = field.related_model
+        resolved = []
+        for related_term in related._meta.ordering or [related._meta.pk.name]:
+            for related_path, related_descending in resolve_ordering(related, related_term, depth + 1):
+                resolved.append((f'{path}__{related_path}', related_descending != descending))
+        return resolved
+    return [(path, descending)]
+
+
+def get_ordering_keys(queryset):
+    """
+    Returns the (path, descending) keys the queryset is ordered by, ending with the
+    primary key so every row has a unique position. None when the ordering holds
+    expressions or annotations (such as the search rank, a float that does not
+    compare equal once read back from a cursor) that cannot be seeked on.
+    """
+    model = queryset.model
+    terms = list(queryset.query.order_by)
+    if not terms and queryset.query.default_ordering:
+        terms = list(model._meta.ordering)
+    if any(not isinstance(term, str) for term in terms):
+        return None
+
+    keys = []
+    for term in terms:
+        keys.extend(resolve_ordering(model, term))
+    if any(path in queryset.query.annotations for path, _ in keys):
+        return None
+    pk_name = model._meta.pk.name
+    if not any(path in (pk_name, 'pk') for path, _ in keys):
+        keys.append((pk_name, False))
+    return keys
+
+
+def get_key_field(model, path):
+    """The model field at the end of an ordering key path."""
+    field = None
+    for part in path.split('__'):
+        field = model._meta.get_field(part)
+        if field.is_relation:
+            model = field.related_model
+    return field
+
+
+def seek_filter(names, descending, values):
+    """
+    Q object selecting the rows positioned after the given key values, for an
+    ordering with NULLs last on ascending keys and first on descending ones.
+    """
+    q = Q()
+    for i, (name, desc, value) in enumerate(zip(names, descending, values)):
+        if value is None:
+            # NULLs come last on ascending keys: nothing sorts after them
+            if not desc:
+                continue
+            after = Q(**{f'{name}__isnull': False})
+        elif desc:
+            after = Q(**{f'{name}__lt': value})
+        else:
+            after = Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+
+        for previous_name, previous_value in zip(names[:i], values[:i]):
+            if previous_value is None:
+                after &= Q(**{f'{previous_name}__isnull': True})
+            else:
+                after &= Q(**{previous_name: previous_value})
+        q |= after
+    return q
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's row estimate of a queryset on PostgreSQL (no table scan),
+    or its exact count elsewhere.
+    """
+    queryset = queryset.order_by()
+    if not is_postgres(queryset):
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+# Keyset paginator
+##################
+class KeysetPage:
+    """A page of a KeysetPaginator, addressed by cursors instead of page numbers."""
+
+    number = 1
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    django-tables2 paginator that seeks on the ordering keys of the table's queryset
+    instead of using OFFSET, and skips the COUNT(*) unless an estimate is asked for.
+
+    Pages are addressed by an opaque `cursor` holding the ordering keys of the first
+    or last row shown. A cursor built for another ordering (the user clicked a sort
+    header) is ignored and the first page is shown, as is a cursor that was altered:
+    cursors are signed with the SECRET_KEY. Orderings on expressions and
+    annotations fall back to an offset held in the cursor.
+    """
+
+    def __init__(self, object_list, per_page, cursor=None, show_count=False, **kwargs):
+        self.rows = object_list
+        self.per_page = int(per_page)
+        self.cursor = cursor
+        self.show_count = show_count
+        self.queryset = object_list.data.data
+        self.keys = get_ordering_keys(self.queryset)
+        self.key_fields = [get_key_field(self.queryset.model, path) for path, _ in self.keys or []]
+        self.signature = hashlib.md5(repr(self.keys).encode('utf-8')).hexdigest()[:8]
+        self._count = None
+
+    @property
+    def count(self):
+        """Estimated number of rows, only computed when the view asks for it."""
+        if not self.show_count:
+            return None
+        if self._count is None:
+            self._count = estimate_count(self.queryset)
+        return self._count
+
+    @property
+    def num_pages(self):
+        # The page count is unknown without a full count, templates only use it to decide whether to paginate
+        return 2
+
+    def encode_cursor(self, payload):
+        payload['s'] = self.signature
+        return signing.dumps(payload, salt=CURSOR_SALT, serializer=CursorSerializer)
+
+    def decode_cursor(self):
+        """
+        Returns the payload of the request cursor with its values cast to the key
+        fields, None when missing, altered, malformed or built for another ordering.
+        """
+        if not self.cursor:
+            return None
+        try:
+            payload = signing.loads(self.cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+        except (signing.BadSignature, ValueError, TypeError):
+            return None
+        if not isinstance(payload, dict) or payload.get('s') != self.signature:
+            return None
+        if self.keys is None:
+            offset = payload.get('o', 0)
+            if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+                return None
+            return {'o': offset}
+
+        values = payload.get('k')
+        if payload.get('d') not in ('n', 'p') or not isinstance(values, list) or len(values) != len(self.key_fields):
+            return None
+        try:
+            values = [None if value is None else field.to_python(value) for field, value in zip(self.key_fields, values)]
+        except (ValidationError, ValueError, TypeError):
+            return None
+        return {'d': payload['d'], 'k': values}
+
+    def page(self, number=1):
+        payload = self.decode_cursor()
+        if self.keys is None:
+            return self.offset_page(payload)
+
+        names = [f'keyset_{i}' for i in range(len(self.keys))]
+        descending = [desc for _, desc in self.keys]
+        backwards = bool(payload and payload.get('d') == 'p')
+        if backwards:
+            descending = [not desc for desc in descending]
+
+        queryset = self.queryset.annotate(**{name: F(path) for name, (path, _) in zip(names, self.keys)})
+        queryset = queryset.order_by(*[
+            F(name).desc(nulls_first=True) if desc else F(name).asc(nulls_last=True)
+            for name, desc in zip(names, descending)
+        ])
+        if payload:
+            queryset = queryset.filter(seek_filter(names, descending, payload['k']))
+
+        # One extra row tells whether there is a page beyond this one
+        records = list(queryset[:self.per_page + 1])
+        has_more = len(records) > self.per_page
+        records = records[:self.per_page]
+        if backwards:
+            records.reverse()
+
+        def cursor_for(record, direction):
+            return self.encode_cursor({'d': direction, 'k': [getattr(record, name) for name in names]})
+
+        next_cursor = previous_cursor = None
+        if records:
+            if has_more or backwards:
+                next_cursor = cursor_for(records[-1], 'n')
+            if payload and (has_more or not backwards):
+                previous_cursor = cursor_for(records[0], 'p')
+        return KeysetPage(self.bound_rows(records), self, next_cursor, previous_cursor)
+
+    def offset_page(self, payload):
+        offset = payload['o'] if payload else 0
+        records = list(self.queryset[offset:offset + self.per_page + 1])
+        next_cursor = self.encode_cursor({'o': offset + self.per_page}) if len(records) > self.per_page else None
+        previous_cursor = self.encode_cursor({'o': max(offset - self.per_page, 0)}) if offset else None
+        return KeysetPage(self.bound_rows(records[:self.per_page]), self, next_cursor, previous_cursor)
+
+    def bound_rows(self, records):
+        return BoundRows(data=records, table=self.rows.table, pinned_data=self.rows.pinned_data)
+
+
+# Function that configures sorting and pagination of a table from the request
+def paginate_table(request, table, per_page=20, keyset=False, show_count=True):
+    """
+    Applies the request's sort and page parameters to a django-tables2 table.
+
+    :param keyset: Use cursor (keyset) pagination instead of page numbers, for the
+                   big document tables where OFFSET and COUNT(*) get slow.
+    :param show_count: With keyset pagination, display the (estimated) number of results.
+    """
+    if not keyset:
+        RequestConfig(request, paginate={'per_page': per_page}).configure(table)
+        return table
+
+    RequestConfig(request, paginate={
+        'paginator_class': KeysetPaginator,
+        'per_page': per_page,
+        'cursor': request.GET.get('cursor'),
+        'show_count': show_count,
+    }).configure(table)
+    table.template_name = KEYSET_TABLE_TEMPLATE
+    return table
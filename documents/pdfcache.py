@@ -0,0 +1,133 @@
+# Imports of the required python modules and libraries
+######################################################
+import hashlib
+import logging
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from .models import Publication, PublicationStatus, Objection
+
+logger = logging.getLogger('documents')
+
+# Bump the version whenever the layout in genpdf changes, so cached PDFs are rendered again
+PDF_TEMPLATE_VERSION = 2
+
+# Seconds a generated PDF stays in the cache
+PDF_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Generated documents and the fields their ETag is computed from: {kind: (model, stamp fields)}.
+# img_source is set by the image pipeline without touching updated_at, and tells which image copy is printed.
+PDF_KINDS = {
+    'pub_initial': (Publication, ('updated_at', 'decree__updated_at', 'img_source')),
+    'pub_final': (Publication, ('updated_at', 'decree__updated_at', 'img_source')),
+    'objection': (Objection, ('updated_at', 'pub__updated_at')),
+}
+
+
+def get_pdf_cache_key(kind, object_id):
+    return f"pdf:v{PDF_TEMPLATE_VERSION}:{kind}:{object_id}"
+
+
+# Function that computes the ETag of a generated PDF without rendering it
+def get_pdf_etag(kind, object_id):
+    """
+    Returns the ETag of a generated PDF from the update stamps of the records
+    printed on it and the template version, None when the record does not exist.
+    """
+    model, stamp_fields = PDF_KINDS[kind]
+    stamps = model.objects.filter(pk=object_id).values_list(*stamp_fields).first()
+    if stamps is None:
+        return None
+    raw = f"{kind}:{object_id}:{':'.join(str(stamp) for stamp in stamps)}:{PDF_TEMPLATE_VERSION}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+# Function that returns a generated PDF from the cache, rendering it on a miss
+def get_cached_pdf(kind, object_id, render):
+    """
+    Returns the bytes of a generated PDF. The cached copy is used while its ETag
+    matches the records; otherwise render() is called and its result cached.
+
+    :param kind: One of PDF_KINDS.
+    :param render: Callable returning the PDF bytes.
+    """
+    etag = get_pdf_etag(kind, object_id)
+    cache_key = get_pdf_cache_key(kind, object_id)
+    cached = cache.get(cache_key)
+    if cached and cached[0] == etag:
+        return cached[1]
+
+    pdf_data = render()
+    cache.set(cache_key, (etag, pdf_data), timeout=PDF_CACHE_TIMEOUT)
+    return pdf_data
+
+
+# Pre-rendered publication PDFs
+###############################
+# Publication fields holding the pre-rendered PDFs: {kind: (file field, etag field)}
+PREGENERATED_FIELDS = {
+    'pub_initial': ('initial_pdf', 'initial_pdf_etag'),
+    'pub_final': ('final_pdf', 'final_pdf_etag'),
+}
+
+
+def get_pregenerated_pdf(kind, publication_id):
+    """
+    Returns the pre-rendered PDF file of a publication, None when it was not
+    rendered yet or the publication changed since.
+    """
+    file_field, etag_field = PREGENERATED_FIELDS[kind]
+    publication = Publication.objects.filter(pk=publication_id).only(file_field, etag_field).first()
+    if publication is None or not getattr(publication, file_field):
+        return None
+    if getattr(publication, etag_field) != get_pdf_etag(kind, publication_id):
+        return None
+    return getattr(publication, file_field)
+
+
+def store_pregenerated_pdf(kind, publication_id, etag, pdf_data):
+    """
+    Saves a rendered PDF on the publication with the ETag of the data it was rendered
+    from, and deletes the previous file. Written with update() so the publication's
+    updated_at, and so the ETag, stay the same.
+    """
+    file_field, etag_field = PREGENERATED_FIELDS[kind]
+    publication = Publication.objects.only(file_field).get(pk=publication_id)
+    field = Publication._meta.get_field(file_field)
+    previous_name = getattr(publication, file_field).name
+
+    name = field.storage.save(field.generate_filename(publication, f"{publication_id}.pdf"), ContentFile(pdf_data))
+    Publication.objects.filter(pk=publication_id).update(**{file_field: name, etag_field: etag})
+    if previous_name:
+        field.storage.delete(previous_name)
+
+
+def pregenerated_kinds(publication):
+    """The PDFs worth rendering ahead for a publication in its current status."""
+    if publication.deleted_at:
+        return []
+    if publication.status == PublicationStatus.INITIAL:
+        return ['pub_initial']
+    if publication.status == PublicationStatus.FINAL:
+        return ['pub_final']
+    return []
+
+
+def schedule_pdf_pregeneration(publication_id, kinds):
+    """Queues the background rendering of a publication's PDFs."""
+    from .tasks import pregenerate_publication_pdfs_task
+    try:
+        pregenerate_publication_pdfs_task.delay(publication_id, kinds)
+    except Exception as e:
+        logger.error(f"Could not queue the PDF rendering of publication {publication_id}: {e}")
+
+
+def invalidate_publication_pdfs(publication):
+    """Drops the cached PDFs of a publication and of the objections printed with its data."""
+    keys = [get_pdf_cache_key('pub_initial', publication.pk), get_pdf_cache_key('pub_final', publication.pk)]
+    objection_ids = Objection.objects.filter(pub=publication).values_list('pk', flat=True)
+    keys.extend(get_pdf_cache_key('objection', objection_id) for objection_id in objection_ids)
+    cache.delete_many(keys)
+
+
+def invalidate_objection_pdf(objection):
+    cache.delete(get_pdf_cache_key('objection', objection.pk))
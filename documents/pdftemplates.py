@@ -0,0 +1,30 @@
+#############################################################################
+# Template-overlay rendering for the fixed-layout PDF forms
+#############################################################################
+# Every generated form is a static layer (header, logo, captions, lines, legal
+# text) with the record's values and QR code on top. The static layer of each
+# form is drawn once per document as a form XObject and placed on every page
+# with a single "Do" operator, so a bulletin of N pages carries it once. The
+# images of the static layer (the logo) are drawn with canvas.drawImage inside
+# the form, so ReportLab embeds them once per document too.
+
+
+class FormTemplate:
+    """
+    Static layer of a form. draw(c) places it on the current page, defining it in
+    the document first if this is the first page that uses it.
+
+    :param name: Name of the form XObject, unique per layer.
+    :param draw_layer: Callable drawing the static layer on a canvas.
+    """
+
+    def __init__(self, name, draw_layer):
+        self.name = name
+        self.draw_layer = draw_layer
+
+    def draw(self, c):
+        if not c.hasForm(self.name):
+            c.beginForm(self.name)
+            self.draw_layer(c)
+            c.endForm()
+        c.doForm(self.name)
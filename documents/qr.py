@@ -0,0 +1,107 @@
+# Imports of the required python modules and libraries
+######################################################
+import base64
+import hashlib
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+# Bump when the QR parameters change, so the cached codes are generated again
+QR_CACHE_VERSION = 1
+
+# QR codes only depend on their data, so they are kept for long
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def get_qr_cache_key(kind, data):
+    digest = hashlib.md5(data.encode('utf-8')).hexdigest()
+    return f"qr:v{QR_CACHE_VERSION}:{kind}:{digest}"
+
+
+# Data encoded in the QR codes
+##############################
+def objection_qr_data(sequence):
+    """The 13 digit tracking code of an objection."""
+    sequence = str(sequence)
+    # Ensure the input is exactly 13 digits
+    if not sequence.isdigit() or len(sequence) != 13:
+        raise ValueError("Invalid sequence")
+    return sequence
+
+
+def publication_qr_data(pub_id):
+    """The public address of a publication's page, on the SITE_URL host."""
+    return f"{settings.SITE_URL.rstrip('/')}{reverse('view_publication', args=[pub_id])}"
+
+
+# Function that builds the modules of a QR code, cached per data
+def get_qr_matrix(kind, data):
+    """
+    Returns the QR code of `data` as rows of '1' (dark) and '0' (light) modules,
+    quiet zone included, from the cache or freshly encoded.
+    """
+    cache_key = f"{get_qr_cache_key(kind, data)}:matrix"
+    matrix = cache.get(cache_key)
+    if matrix is None:
+        # Imported here, qrcode is only loaded by the processes that draw a QR code
+        import qrcode
+        qr = qrcode.QRCode()
+        qr.add_data(data)
+        qr.make(fit=True)
+        matrix = [''.join('1' if module else '0' for module in row) for row in qr.get_matrix()]
+        cache.set(cache_key, matrix, timeout=QR_CACHE_TIMEOUT)
+    return matrix
+
+
+# Function that returns the PNG image of a QR code, cached per data
+def get_qr_png(kind, data):
+    """Returns the PNG bytes of the QR code of `data`, from the cache or freshly encoded."""
+    cache_key = f"{get_qr_cache_key(kind, data)}:png"
+    png = cache.get(cache_key)
+    if png is None:
+        import qrcode
+        buffer = BytesIO()
+        qrcode.make(data).save(buffer, format="PNG")
+        png = buffer.getvalue()
+        cache.set(cache_key, png, timeout=QR_CACHE_TIMEOUT)
+    return png
+
+
+def draw_qr(c, kind, data, x, y, size):
+    """
+    Draws the QR code of `data` on a ReportLab canvas as vector squares, in a
+    size x size box whose lower left corner is (x, y). Dark modules of a row are
+    merged into runs, so a code takes a few hundred rectangles and no image.
+    """
+    matrix = get_qr_matrix(kind, data)
+    module = size / len(matrix)
+    path = c.beginPath()
+    for row_index, row in enumerate(matrix):
+        row_y = y + size - (row_index + 1) * module
+        column = 0
+        while column < len(row):
+            if row[column] == '1':
+                start = column
+                while column < len(row) and row[column] == '1':
+                    column += 1
+                path.rect(x + start * module, row_y, (column - start) * module, module)
+            else:
+                column += 1
+    c.saveState()
+    c.setFillColorRGB(0, 0, 0)
+    c.drawPath(path, stroke=0, fill=1)
+    c.restoreState()
+
+
+# Function for generating a QR code for a 13 digit sequence
+def generate_obj_qr(sequence):
+    return BytesIO(get_qr_png('objection', objection_qr_data(sequence)))
+
+# Function for generating a QR code for a publication url
+def generate_pub_qr(pub_id):
+    return BytesIO(get_qr_png('publication', publication_qr_data(pub_id)))
+
+# Function for converting a buffer to base64 for PDF rendering
+def buffer_to_base64(buffer):
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
@@ -0,0 +1,227 @@
+# Imports of the required python modules and libraries
+######################################################
+import re
+from django.db import connection, connections
+from django.db.models import F, Q
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from .models import Decree, Publication, Country
+
+
+# Search vectors definitions
+############################
+# Arabic brands are stemmed with the arabic configuration, English brands with the english one,
+# names and numbers go through 'simple' so they are matched as typed.
+def decree_search_vector():
+    return (
+        SearchVector('ar_brand', config='arabic', weight='A') +
+        SearchVector('en_brand', config='english', weight='A') +
+        SearchVector('applicant', 'company', config='simple', weight='B') +
+        SearchVector('number', 'number_applied', config='simple', weight='C')
+    )
+
+def publication_search_vector():
+    return (
+        SearchVector('ar_brand', config='arabic', weight='A') +
+        SearchVector('en_brand', config='english', weight='A') +
+        SearchVector('applicant', 'owner', config='simple', weight='B') +
+        SearchVector('number', 'decree_number', config='simple', weight='C')
+    )
+
+SEARCH_VECTORS = {
+    Decree: decree_search_vector,
+    Publication: publication_search_vector,
+}
+
+
+# Arabic normalization
+######################
+# Diacritics (tashkeel), superscript alef and tatweel are dropped, letter variants are folded
+ARABIC_DIACRITICS = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+
+def normalize_arabic(text):
+    """
+    Returns a search-friendly form of a name or brand: diacritics and tatweel removed,
+    alef/taa marbuta/alef maqsura variants folded, lowercased, whitespace collapsed.
+    """
+    if not text:
+        return ''
+    text = ARABIC_DIACRITICS.sub('', text).translate(ARABIC_FOLDING).lower()
+    return ' '.join(text.split())
+
+# Normalized shadow columns kept for each model: {shadow field: source field}
+NORMALIZED_FIELDS = {
+    Decree: {'ar_brand_norm': 'ar_brand', 'en_brand_norm': 'en_brand', 'applicant_norm': 'applicant', 'company_norm': 'company'},
+    Publication: {'ar_brand_norm': 'ar_brand', 'en_brand_norm': 'en_brand', 'applicant_norm': 'applicant', 'owner_norm': 'owner'},
+}
+
+def set_normalized_fields(instance):
+    """Fills the normalized shadow columns of a Decree/Publication from their source fields."""
+    for norm_field, source_field in NORMALIZED_FIELDS[type(instance)].items():
+        setattr(instance, norm_field, normalize_arabic(getattr(instance, source_field)))
+
+def normalized_match(value, norm_fields):
+    """Q object matching the normalized keyword inside any of the given shadow columns (trigram indexed)."""
+    norm_value = normalize_arabic(value)
+    q = Q()
+    if norm_value:
+        for norm_field in norm_fields:
+            q |= Q(**{f'{norm_field}__contains': norm_value})
+    return q
+
+
+# Helper Functions:
+###################
+def is_postgres(queryset=None):
+    """Returns True when the queryset (or the default connection) runs on PostgreSQL."""
+    conn = connections[queryset.db] if queryset is not None else connection
+    return conn.vendor == 'postgresql'
+
+
+def build_search_query(value):
+    """
+    Builds a prefix tsquery out of the typed keyword, matching every word as a prefix
+    under the simple, arabic and english configurations. Returns None if nothing
+    searchable is left once punctuation is stripped.
+    """
+    terms = re.findall(r'\w+', value)
+    if not terms:
+        return None
+    raw = ' & '.join(f"{term}:*" for term in terms)
+    return (
+        SearchQuery(raw, config='simple', search_type='raw') |
+        SearchQuery(raw, config='arabic', search_type='raw') |
+        SearchQuery(raw, config='english', search_type='raw')
+    )
+
+
+def number_prefix_q(field, prefix, max_digits=7):
+    """
+    Q object matching the integers of a column whose digits start with the prefix.
+    The prefix is turned into ranges (12 -> 12, 120..129, 1200..1299, ..) so the
+    b-tree index on the column is used instead of casting every row to text.
+    Non-numeric prefixes fall back to a plain startswith.
+    """
+    if not prefix.isdigit() or prefix[0] == '0':
+        return Q(**{f'{field}__startswith': prefix})
+    value = int(prefix)
+    q = Q(**{field: value})
+    for extra_digits in range(1, max_digits - len(prefix) + 1):
+        scale = 10 ** extra_digits
+        q |= Q(**{f'{field}__range': (value * scale, (value + 1) * scale - 1)})
+    return q
+
+
+def country_match(value):
+    """Q object matching records whose country name contains the keyword (resolved on the small country table first)."""
+    country_ids = Country.objects.filter(Q(ar_name__icontains=value) | Q(en_name__icontains=value)).values('id')
+    return Q(country__in=country_ids)
+
+
+# Full-text keyword search
+##########################
+def keyword_search(queryset, value, fallback_q, year_field):
+    """
+    Filters a Decree/Publication queryset by a keyword.
+
+    On PostgreSQL the keyword is matched against the GIN indexed search_vector and
+    the results are ranked; elsewhere (SQLite tests) the given icontains predicates
+    are used instead. In both cases the normalized Arabic shadow columns are matched
+    too, so spelling variants of a brand or name are found in the same query.
+
+    :param queryset: The queryset to filter.
+    :param value: The keyword typed by the user.
+    :param fallback_q: Q object used when full-text search is not available.
+    :param year_field: Date field matched when the keyword is a year.
+    """
+    norm_q = normalized_match(value, NORMALIZED_FIELDS[queryset.model])
+    search_query = build_search_query(value) if is_postgres(queryset) else None
+    if search_query is None:
+        q = fallback_q | norm_q | country_match(value)
+    else:
+        q = Q(search_vector=search_query) | norm_q | country_match(value)
+
+    if value.isdigit():
+        q |= Q(**{f'{year_field}__year': int(value)})
+
+    queryset = queryset.filter(q)
+    if search_query is not None:
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        queryset = queryset.annotate(rank=SearchRank(F('search_vector'), search_query)).order_by('-rank', *ordering)
+    return queryset
+
+
+# Search index maintenance
+##########################
+def update_search_vector(instance):
+    """Refreshes the search_vector of a single saved Decree/Publication."""
+    if not is_postgres():
+        return
+    model = type(instance)
+    model.objects.filter(pk=instance.pk).update(search_vector=SEARCH_VECTORS[model]())
+
+
+def rebuild_search_vectors(model, only_missing=False):
+    """Recomputes the search_vector of every record of a model, returns the number of rows updated."""
+    if not is_postgres():
+        return 0
+    queryset = model.objects.all()
+    if only_missing:
+        queryset = queryset.filter(search_vector__isnull=True)
+    return queryset.update(search_vector=SEARCH_VECTORS[model]())
+
+
+def rebuild_normalized_fields(model, only_missing=False, batch_size=1000):
+    """Recomputes the normalized shadow columns of every record of a model, returns the number of rows updated."""
+    norm_fields = list(NORMALIZED_FIELDS[model])
+    source_fields = list(NORMALIZED_FIELDS[model].values())
+    queryset = model.objects.only('pk', *source_fields, *norm_fields)
+    if only_missing:
+        missing = Q()
+        for norm_field, source_field in NORMALIZED_FIELDS[model].items():
+            missing |= Q(**{norm_field: ''}) & Q(**{f'{source_field}__gt': ''})
+        queryset = queryset.filter(missing)
+
+    batch = []
+    updated = 0
+    for instance in queryset.iterator(chunk_size=batch_size):
+        set_normalized_fields(instance)
+        batch.append(instance)
+        if len(batch) >= batch_size:
+            updated += model.objects.bulk_update(batch, norm_fields)
+            batch = []
+    if batch:
+        updated += model.objects.bulk_update(batch, norm_fields)
+    return updated
+
+
+# GIN indexes are PostgreSQL only, so they are created here (after migrate) rather than in Meta.indexes,
+# keeping the models migratable on SQLite.
+SEARCH_INDEXES = [
+    ("documents_decree_search_gin", "documents_decree", "USING gin (search_vector)"),
+    ("documents_publication_search_gin", "documents_publication", "USING gin (search_vector)"),
+    ("documents_decree_ar_brand_trgm", "documents_decree", "USING gin (ar_brand_norm gin_trgm_ops)"),
+    ("documents_decree_en_brand_trgm", "documents_decree", "USING gin (en_brand_norm gin_trgm_ops)"),
+    ("documents_decree_applicant_trgm", "documents_decree", "USING gin (applicant_norm gin_trgm_ops)"),
+    ("documents_decree_company_trgm", "documents_decree", "USING gin (company_norm gin_trgm_ops)"),
+    ("documents_publication_ar_brand_trgm", "documents_publication", "USING gin (ar_brand_norm gin_trgm_ops)"),
+    ("documents_publication_en_brand_trgm", "documents_publication", "USING gin (en_brand_norm gin_trgm_ops)"),
+    ("documents_publication_applicant_trgm", "documents_publication", "USING gin (applicant_norm gin_trgm_ops)"),
+    ("documents_publication_owner_trgm", "documents_publication", "USING gin (owner_norm gin_trgm_ops)"),
+]
+
+def ensure_search_indexes(sender=None, using='default', **kwargs):
+    """post_migrate handler creating the pg_trgm extension and the full-text/trigram GIN indexes on PostgreSQL."""
+    conn = connections[using]
+    if conn.vendor != 'postgresql':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, table, definition in SEARCH_INDEXES:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}")
@@ -0,0 +1,80 @@
+# Imports of the required python modules and libraries
+######################################################
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Decree, Publication, Objection
+from .stats import invalidate_dashboard_stats
+from .charts import schedule_chart_refresh, CHART_REFRESH_DELAY
+from .search import update_search_vector, set_normalized_fields
+from .similarity import set_brand_keys, schedule_brand_matches
+from .pdfcache import invalidate_publication_pdfs, invalidate_objection_pdf, pregenerated_kinds, schedule_pdf_pregeneration
+from .images import schedule_image_processing
+
+
+@receiver(post_save, sender=Decree)
+@receiver(post_save, sender=Publication)
+@receiver(post_save, sender=Objection)
+@receiver(post_delete, sender=Decree)
+@receiver(post_delete, sender=Publication)
+@receiver(post_delete, sender=Objection)
+def refresh_dashboard_stats(sender, instance, **kwargs):
+    """
+    Drop the cached homepage counters whenever a document is saved, soft-deleted or
+    deleted, and queue a (debounced) background re-render of the homepage chart.
+    """
+    invalidate_dashboard_stats()
+    transaction.on_commit(lambda: schedule_chart_refresh(countdown=CHART_REFRESH_DELAY))
+
+
+@receiver(pre_save, sender=Decree)
+@receiver(pre_save, sender=Publication)
+def refresh_normalized_fields(sender, instance, **kwargs):
+    """Fill the normalized Arabic shadow columns and the phonetic brand keys used by the filters and the similarity search."""
+    set_normalized_fields(instance)
+    set_brand_keys(instance)
+
+
+@receiver(post_save, sender=Decree)
+@receiver(post_save, sender=Publication)
+def refresh_search_vector(sender, instance, **kwargs):
+    """Keep the full-text search vector of a decree or publication in sync with its fields."""
+    update_search_vector(instance)
+
+
+@receiver(post_save, sender=Publication)
+def refresh_publication_brand_matches(sender, instance, **kwargs):
+    """Rebuild the precomputed similar brands of a publication once it is saved."""
+    if instance.deleted_at:
+        return
+    transaction.on_commit(lambda: schedule_brand_matches(instance.pk))
+
+
+@receiver(post_save, sender=Publication)
+@receiver(post_delete, sender=Publication)
+def drop_publication_pdfs(sender, instance, **kwargs):
+    """Drop the cached generated PDFs showing this publication."""
+    invalidate_publication_pdfs(instance)
+
+
+@receiver(post_save, sender=Publication)
+def pregenerate_publication_pdfs(sender, instance, **kwargs):
+    """Render the initial (or, once final, the final) publication PDF ahead of the download requests."""
+    kinds = pregenerated_kinds(instance)
+    if kinds:
+        transaction.on_commit(lambda: schedule_pdf_pregeneration(instance.pk, kinds))
+
+
+@receiver(post_save, sender=Publication)
+def process_publication_image(sender, instance, **kwargs):
+    """Build the thumbnail and PDF copy of a publication's image when it was uploaded, replaced or removed."""
+    source_name = instance.img_file.name if instance.img_file else ''
+    if source_name != instance.img_source:
+        transaction.on_commit(lambda: schedule_image_processing(instance.pk))
+
+
+@receiver(post_save, sender=Objection)
+@receiver(post_delete, sender=Objection)
+def drop_objection_pdf(sender, instance, **kwargs):
+    """Drop the cached generated PDF of this objection."""
+    invalidate_objection_pdf(instance)
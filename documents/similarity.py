@@ -0,0 +1,311 @@
+# Imports of the required python modules and libraries
+######################################################
+import logging
+import re
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.urls import reverse
+from .models import Decree, Publication, BrandMatch
+from .search import is_postgres, normalize_arabic
+
+logger = logging.getLogger('documents')
+
+# Number of candidates fetched from the database before re-ranking them in python
+CANDIDATE_LIMIT = 100
+
+# Number of similar brands returned (and precomputed per publication)
+DEFAULT_TOP_K = 10
+
+# Minimum combined score for a brand to be reported as similar
+SIMILARITY_THRESHOLD = 0.35
+
+# Phonetic keys shorter than this collide too often to be used for candidate lookup
+MIN_KEY_LENGTH = 2
+
+
+# Phonetic keys
+###############
+# Soundex-style codes for Latin letters; vowels, h, w and y are dropped
+LATIN_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+def latin_phonetic_key(text):
+    """
+    Returns the full-length Soundex-style key of a Latin brand, words joined,
+    so 'Koka Kola', 'Coca-Cola' and 'cocacola' share the same key.
+    """
+    text = re.sub(r'[^a-z]', '', (text or '').lower()).replace('ph', 'f')
+    key = []
+    previous = ''
+    for char in text:
+        code = LATIN_CODES.get(char, '')
+        if code and code != previous:
+            key.append(code)
+        # h and w do not separate two identical codes, vowels do
+        if char not in 'hw':
+            previous = code
+    return ''.join(key)
+
+
+# Arabic letters that are commonly confused in spelling or transliteration are folded together
+ARABIC_PHONETIC = str.maketrans({
+    'ث': 'س', 'ص': 'س',
+    'ط': 'ت',
+    'ذ': 'ز', 'ظ': 'ز',
+    'ض': 'د',
+    'ق': 'ك',
+    'ح': 'ه',
+    'خ': 'غ',
+})
+ARABIC_VOWELS = re.compile(r'[اويء]')
+
+def arabic_phonetic_key(text):
+    """
+    Returns the consonant skeleton of an Arabic brand: normalized, definite article
+    and long vowels dropped, similar sounding letters folded, repeats collapsed,
+    so 'بيبسي', 'ببسي' and 'البيبسى' share the same key.
+    """
+    words = re.sub(r'[^ء-ي ]', '', normalize_arabic(text)).split()
+    words = [word[2:] if word.startswith('ال') and len(word) > 3 else word for word in words]
+    # Vowels are dropped before collapsing repeats: 'بيبسي' and 'ببسي' differ only by the written vowel
+    skeleton = ARABIC_VOWELS.sub('', ''.join(words).translate(ARABIC_PHONETIC))
+    return re.sub(r'(.)\1+', r'\1', skeleton)
+
+# Phonetic shadow columns kept for each brand: {key field: (source field, key function)}
+BRAND_KEY_FIELDS = {
+    'ar_brand_key': ('ar_brand', arabic_phonetic_key),
+    'en_brand_key': ('en_brand', latin_phonetic_key),
+}
+
+def set_brand_keys(instance):
+    """Fills the phonetic key columns of a Decree/Publication from its brands."""
+    for key_field, (source_field, key_function) in BRAND_KEY_FIELDS.items():
+        setattr(instance, key_field, key_function(getattr(instance, source_field)))
+
+
+def rebuild_brand_keys(model, only_missing=False, batch_size=1000):
+    """Recomputes the phonetic key columns of every record of a model, returns the number of rows updated."""
+    key_fields = list(BRAND_KEY_FIELDS)
+    source_fields = [source_field for source_field, _ in BRAND_KEY_FIELDS.values()]
+    queryset = model.objects.only('pk', *source_fields, *key_fields)
+    if only_missing:
+        missing = Q()
+        for key_field, (source_field, _) in BRAND_KEY_FIELDS.items():
+            missing |= Q(**{key_field: ''}) & Q(**{f'{source_field}__gt': ''})
+        queryset = queryset.filter(missing)
+
+    batch = []
+    updated = 0
+    for instance in queryset.iterator(chunk_size=batch_size):
+        set_brand_keys(instance)
+        batch.append(instance)
+        if len(batch) >= batch_size:
+            updated += model.objects.bulk_update(batch, key_fields)
+            batch = []
+    if batch:
+        updated += model.objects.bulk_update(batch, key_fields)
+    return updated
+
+
+# Similarity measures
+#####################
+def trigrams(text):
+    """Trigram set of a text, padded per word the same way pg_trgm does."""
+    grams = set()
+    for word in re.findall(r'\w+', text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a, b):
+    """Shared trigrams over all trigrams, the measure behind pg_trgm's similarity()."""
+    a_grams, b_grams = trigrams(a), trigrams(b)
+    if not a_grams or not b_grams:
+        return 0.0
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, a_char in enumerate(a, 1):
+        current = [i]
+        for j, b_char in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a_char != b_char)))
+        previous = current
+    return previous[-1]
+
+
+def text_score(a, b, a_key, b_key):
+    """
+    Combined similarity of two normalized brands between 0 and 1: trigram overlap,
+    edit distance (spaces ignored) and phonetic key agreement.
+    """
+    if not a or not b:
+        return 0.0
+    a_compact, b_compact = a.replace(' ', ''), b.replace(' ', '')
+    edit_ratio = 1 - edit_distance(a_compact, b_compact) / max(len(a_compact), len(b_compact))
+    phonetic = 1.0 if a_key and a_key == b_key else 0.0
+    return 0.4 * trigram_similarity(a, b) + 0.4 * edit_ratio + 0.2 * phonetic
+
+
+# Candidate lookup
+##################
+# Columns fetched for each candidate, values() avoids building model instances for the rejected ones
+CANDIDATE_FIELDS = ['id', 'number', 'ar_brand', 'en_brand', 'ar_brand_norm', 'en_brand_norm', 'ar_brand_key', 'en_brand_key']
+
+def brand_candidates(model, ar_norm, en_norm, ar_key, en_key, exclude_ids=()):
+    """
+    Returns up to CANDIDATE_LIMIT rows of a model whose brands are close to the given ones.
+
+    On PostgreSQL the trigram GIN indexes answer the `%` (similar) lookups and the
+    candidates come ordered by trigram similarity; elsewhere plain containment is used.
+    The phonetic key columns are matched by equality on their b-tree indexes.
+    """
+    q = Q()
+    similarities = []
+    for norm_field, norm_value in (('ar_brand_norm', ar_norm), ('en_brand_norm', en_norm)):
+        if not norm_value:
+            continue
+        if is_postgres():
+            q |= Q(**{f'{norm_field}__trigram_similar': norm_value})
+            similarities.append(TrigramSimilarity(norm_field, norm_value))
+        else:
+            q |= Q(**{f'{norm_field}__contains': norm_value})
+    for key_field, key_value in (('ar_brand_key', ar_key), ('en_brand_key', en_key)):
+        if len(key_value) >= MIN_KEY_LENGTH:
+            q |= Q(**{key_field: key_value})
+    if not q:
+        return []
+
+    queryset = model.objects.filter(q, deleted_at__isnull=True).exclude(pk__in=exclude_ids)
+    if similarities:
+        similarity = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        queryset = queryset.annotate(similarity=similarity).order_by('-similarity')
+    extra_fields = ['date'] if model is Decree else ['year']
+    return list(queryset.values(*CANDIDATE_FIELDS, *extra_fields)[:CANDIDATE_LIMIT])
+
+
+def match_result(model, row, score):
+    """JSON-friendly description of a similar brand."""
+    if model is Decree:
+        label = f"{row['number']} / {row['date'].year}" if row['date'] else str(row['number'])
+        url = reverse('view_decree', args=[row['id']])
+    else:
+        label = f"{row['number']} / {row['year']}" if row['year'] else str(row['number'])
+        url = reverse('view_publication', args=[row['id']])
+    return {
+        'type': model._meta.model_name,
+        'id': row['id'],
+        'label': label,
+        'ar_brand': row['ar_brand'] or '',
+        'en_brand': row['en_brand'] or '',
+        'score': round(score, 3),
+        'url': url,
+    }
+
+
+# Similarity search
+###################
+def find_similar_brands(ar_brand, en_brand, top_k=DEFAULT_TOP_K, exclude_publication=None, exclude_decree=None):
+    """
+    Returns the top_k decrees and publications whose brands look or sound like the
+    given Arabic/English brands, best first.
+
+    Candidates are fetched through the indexes (at most CANDIDATE_LIMIT per model),
+    then re-ranked in python with text_score, keeping the best of the Arabic and
+    English scores of each record.
+
+    :param ar_brand: Arabic brand to compare against.
+    :param en_brand: English brand to compare against.
+    :param top_k: Number of results to return.
+    :param exclude_publication: Id of a publication left out of the results (the one being examined).
+    :param exclude_decree: Id of a decree left out of the results (the decree of that publication).
+    """
+    ar_norm, en_norm = normalize_arabic(ar_brand), normalize_arabic(en_brand)
+    ar_key, en_key = arabic_phonetic_key(ar_brand), latin_phonetic_key(en_brand)
+
+    scored = []
+    for model, exclude_id in ((Decree, exclude_decree), (Publication, exclude_publication)):
+        exclude_ids = [exclude_id] if exclude_id else []
+        for row in brand_candidates(model, ar_norm, en_norm, ar_key, en_key, exclude_ids):
+            score = max(
+                text_score(ar_norm, row['ar_brand_norm'], ar_key, row['ar_brand_key']),
+                text_score(en_norm, row['en_brand_norm'], en_key, row['en_brand_key']),
+            )
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((score, model, row))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [match_result(model, row, score) for score, model, row in scored[:top_k]]
+
+
+# Precomputed candidate lists
+#############################
+def refresh_brand_matches(publication, top_k=DEFAULT_TOP_K):
+    """Recomputes and stores the similar brands of a publication, returns the number of matches kept."""
+    matches = find_similar_brands(
+        publication.ar_brand, publication.en_brand, top_k=top_k,
+        exclude_publication=publication.pk, exclude_decree=publication.decree_id,
+    )
+    with transaction.atomic():
+        BrandMatch.objects.filter(publication=publication).delete()
+        BrandMatch.objects.bulk_create([
+            BrandMatch(
+                publication=publication,
+                matched_decree_id=match['id'] if match['type'] == 'decree' else None,
+                matched_publication_id=match['id'] if match['type'] == 'publication' else None,
+                score=match['score'],
+            )
+            for match in matches
+        ])
+    return len(matches)
+
+
+def get_brand_matches(publication):
+    """
+    Returns the similar brands of a publication from its precomputed list, or
+    computes them on the spot when the list was not built yet.
+    """
+    matches = list(
+        BrandMatch.objects.filter(publication=publication)
+        .select_related('matched_decree', 'matched_publication')
+    )
+    if not matches:
+        return find_similar_brands(
+            publication.ar_brand, publication.en_brand,
+            exclude_publication=publication.pk, exclude_decree=publication.decree_id,
+        )
+
+    results = []
+    for match in matches:
+        model = Decree if match.matched_decree_id else Publication
+        matched = match.matched_decree or match.matched_publication
+        # Records soft-deleted since the list was built are left out
+        if matched.deleted_at:
+            continue
+        row = {field: getattr(matched, field, None) for field in ['id', 'number', 'ar_brand', 'en_brand', 'date', 'year']}
+        results.append(match_result(model, row, match.score))
+    return results
+
+
+def schedule_brand_matches(publication_id):
+    """Queues the background refresh of a publication's similar brands."""
+    from .tasks import refresh_brand_matches_task
+    try:
+        refresh_brand_matches_task.delay(publication_id)
+    except Exception as e:
+        logger.error(f"Could not queue the brand matches refresh of publication {publication_id}: {e}")
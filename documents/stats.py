@@ -0,0 +1,130 @@
+# Imports of the required python modules and libraries
+######################################################
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractYear
+from .models import Decree, DecreeStatus, Publication, PublicationStatus, Objection, ObjectionStatus
+
+# Cache key and lifetime of the homepage dashboard counters
+DASHBOARD_STATS_KEY = "dashboard_stats"
+DASHBOARD_STATS_TIMEOUT = 60 * 60 * 24
+
+
+# Function that computes every homepage counter using one aggregate query per model
+def compute_dashboard_stats():
+    """
+    Counts the status buckets of Decree, Publication and Objection with conditional
+    aggregation, so the whole dashboard costs three queries instead of eleven.
+    """
+    stats = Decree.objects.filter(deleted_at__isnull=True).aggregate(
+        decree_accept=Count('id', filter=Q(status=DecreeStatus.ACCEPT)),
+        decree_reject=Count('id', filter=Q(status=DecreeStatus.REJECT)),
+        decree_total=Count('id'),
+    )
+    stats.update(Publication.objects.filter(deleted_at__isnull=True).aggregate(
+        pub_initial=Count('id', filter=Q(status=PublicationStatus.INITIAL)),
+        pub_conflict=Count('id', filter=Q(status=PublicationStatus.CONFLICT)),
+        pub_final=Count('id', filter=Q(status=PublicationStatus.FINAL)),
+    ))
+    stats.update(Objection.objects.filter(deleted_at__isnull=True).aggregate(
+        obj_pending=Count('id', filter=Q(status__in=[ObjectionStatus.PENDING, ObjectionStatus.UNCONFIRM])),
+        obj_paid=Count('id', filter=Q(status=ObjectionStatus.PAID)),
+        obj_accept=Count('id', filter=Q(status=ObjectionStatus.ACCEPT)),
+    ))
+    return stats
+
+
+# Function that returns the cached dashboard counters, computing them on a miss
+def get_dashboard_stats():
+    """
+    Returns the homepage counters from the cache. The entry is dropped by the
+    model signals whenever a document is saved or deleted.
+    """
+    stats = cache.get(DASHBOARD_STATS_KEY)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_KEY, stats, timeout=DASHBOARD_STATS_TIMEOUT)
+    return stats
+
+
+# Function that drops the cached dashboard counters
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_KEY)
+
+
+# Time-bucketed counting engine
+#####################################################################
+# Function that picks the field a model is bucketed by when counting per year
+def get_year_field(model):
+    """
+    Returns the field used to assign a model's records to a year, in the same
+    order of preference the homepage chart always used: an explicit 'year'
+    column, then 'created_at', then 'date'.
+    """
+    for field_name in ('year', 'created_at', 'date'):
+        if hasattr(model, field_name):
+            return field_name
+    return None
+
+
+# Function that counts a model's records per year with a single GROUP BY query
+def count_per_year(model, start_year=None, end_year=None, queryset=None):
+    """
+    Returns a {year: count} dict for the (non-deleted) records of a model.
+
+    :param model: Django model to count.
+    :param start_year: Optional first year of the window (inclusive).
+    :param end_year: Optional last year of the window (inclusive).
+    :param queryset: Optional pre-filtered queryset of the model to count instead.
+    """
+    year_field = get_year_field(model)
+    if year_field is None:
+        return {}
+
+    if queryset is None:
+        queryset = model.objects.filter(deleted_at__isnull=True)
+
+    # Integer 'year' columns are used as-is, date fields go through EXTRACT(YEAR)
+    if year_field == 'year':
+        bucket = F('year')
+    else:
+        bucket = ExtractYear(year_field)
+
+    queryset = queryset.annotate(bucket=bucket)
+    if start_year is not None:
+        queryset = queryset.filter(bucket__gte=start_year)
+    if end_year is not None:
+        queryset = queryset.filter(bucket__lte=end_year)
+
+    rows = queryset.values('bucket').annotate(count=Count('id')).order_by()
+    return {row['bucket']: row['count'] for row in rows if row['bucket'] is not None}
+
+
+# Function that builds the per-model/per-year counts for a window of years
+def yearly_counts(models, start_year, end_year):
+    """
+    Returns a compact structure with one count per model per year:
+
+        {'years': [2012, ...], 'series': [{'model': 'Publication', 'name': 'اشهار', 'counts': [..]}, ..]}
+
+    Each model costs a single grouped query whatever the size of the window.
+    """
+    years = list(range(start_year, end_year + 1))
+    series = []
+    for model in models:
+        if get_year_field(model) is None:
+            continue
+        counts = count_per_year(model, start_year, end_year)
+        series.append({
+            'model': model.__name__,
+            'name': str(model._meta.verbose_name),
+            'counts': [counts.get(year, 0) for year in years],
+        })
+    return {'years': years, 'series': series}
+
+
+# Function that counts a queryset's records per status with a single GROUP BY query
+def count_per_status(queryset):
+    """Returns a {status: count} dict for the given queryset."""
+    rows = queryset.values('status').annotate(count=Count('id')).order_by()
+    return {row['status']: row['count'] for row in rows}
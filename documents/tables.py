@@ -3,13 +3,42 @@
 import os
 from django.utils.safestring import mark_safe
 import django_tables2 as tables
+from django.db.models import QuerySet
 from .models import Decree, Publication, Objection, FormPlus, Country, Government, ComType, DocType, DecreeCategory
 from django.urls import reverse
 
 
+# Queryset optimization
+#######################
+class OptimizedTable(tables.Table):
+    """
+    Base table applying its own queryset needs to the data it is given, so every
+    view rendering it gets a fixed number of queries per page:
+
+    - related_fields: relations followed by the columns, loaded with select_related.
+    - projection: model fields read by the columns and action partials, loaded with only().
+      Leave it None to load every field.
+    """
+    related_fields = ()
+    projection = None
+
+    def __init__(self, data=None, *args, **kwargs):
+        if isinstance(data, QuerySet):
+            data = self.optimize_queryset(data)
+        super().__init__(data, *args, **kwargs)
+
+    @classmethod
+    def optimize_queryset(cls, queryset):
+        if cls.related_fields:
+            queryset = queryset.select_related(*cls.related_fields)
+        if cls.projection is not None:
+            queryset = queryset.only(*cls.projection)
+        return queryset
+
+
 # Section models tables
 #######################
-class GovernmentTable(tables.Table):
+class GovernmentTable(OptimizedTable):
     edit = tables.Column(accessor='id', verbose_name='', empty_values=(), orderable=False)
 
     def __init__(self, *args, model_name=None, user=None, **kwargs):
@@ -35,7 +64,7 @@ class GovernmentTable(tables.Table):
         url = f"{base_url}?model={model_name}&id={value}"
         return mark_safe(f'<a href="{url}" class="btn btn-secondary">تعديل</a>')
 
-class CountryTable(tables.Table):
+class CountryTable(OptimizedTable):
     edit = tables.Column(accessor='id', verbose_name='', empty_values=(), orderable=False)
 
     def __init__(self, *args, model_name=None, user=None, **kwargs):
@@ -61,7 +90,7 @@ class CountryTable(tables.Table):
         url = f"{base_url}?model={model_name}&id={value}"
         return mark_safe(f'<a href="{url}" class="btn btn-secondary">تعديل</a>')
 
-class ComTypeTable(tables.Table):
+class ComTypeTable(OptimizedTable):
     edit = tables.Column(accessor='id', verbose_name='', empty_values=(), orderable=False)
 
     def __init__(self, *args, model_name=None, user=None, **kwargs):
@@ -87,7 +116,7 @@ class ComTypeTable(tables.Table):
         url = f"{base_url}?model={model_name}&id={value}"
         return mark_safe(f'<a href="{url}" class="btn btn-secondary">تعديل</a>')
 
-class DocTypeTable(tables.Table):
+class DocTypeTable(OptimizedTable):
     edit = tables.Column(accessor='id', verbose_name='', empty_values=(), orderable=False)
 
     def __init__(self, *args, model_name=None, user=None, **kwargs):
@@ -113,7 +142,7 @@ class DocTypeTable(tables.Table):
         url = f"{base_url}?model={model_name}&id={value}"
         return mark_safe(f'<a href="{url}" class="btn btn-secondary">تعديل</a>')
 
-class DecreeCategoryTable(tables.Table):
+class DecreeCategoryTable(OptimizedTable):
     edit = tables.Column(accessor='id', verbose_name='', empty_values=(), orderable=False)
 
     def __init__(self, *args, model_name=None, user=None, **kwargs):
@@ -142,7 +171,13 @@ class DecreeCategoryTable(tables.Table):
 
 # Primary models tables
 #######################
-class DecreeTable(tables.Table):
+class DecreeTable(OptimizedTable):
+    related_fields = ('country', 'category')
+    projection = (
+        'id', 'number', 'date', 'status', 'applicant', 'company', 'country', 'ar_brand', 'en_brand',
+        'category', 'is_placeholder', 'pdf_file',
+    )
+
     actions = tables.TemplateColumn(
         template_name='partials/decree_actions.html',
         orderable=False,
@@ -160,7 +195,31 @@ class DecreeTable(tables.Table):
         # Format the date as desired
         return value.strftime('%Y-%m-%d') if value else ''
 
-class PublicationTable(tables.Table):
+# Function that renders the list thumbnail of a publication's image
+def publication_thumbnail(publication, height=80):
+    """
+    The thumbnail made by the image pipeline, or the upload itself until it is
+    built from the current image. The stored dimensions give the width, so the
+    rows do not move as the images load.
+    """
+    if not publication.img_file:
+        return ''
+    current = publication.has_derived_images
+    image = publication.img_thumb if current and publication.img_thumb else publication.img_file
+    size = f'height="{height}"'
+    if current and publication.img_width and publication.img_height:
+        size += f' width="{round(height * publication.img_width / publication.img_height)}"'
+    return mark_safe(f'<img src="{image.url}" {size} loading="lazy" alt="Publication Image" class="img-thumbnail" style="height: {height}px; width: auto;">')
+
+
+class PublicationTable(OptimizedTable):
+    related_fields = ('decree', 'country', 'category')
+    projection = (
+        'id', 'number', 'decree__number', 'decree__date', 'number_applied', 'applicant', 'country', 'address',
+        'date_applied', 'category', 'img_file', 'img_thumb', 'img_width', 'img_height', 'img_source', 'e_number', 'created_at',
+        'status', 'attach',
+    )
+
     # Define a custom column to display the image
     img_file = tables.Column(orderable=False, verbose_name="الصورة")
 
@@ -172,11 +231,8 @@ class PublicationTable(tables.Table):
     )
 
     # Custom method to render the image
-    def render_img_file(self, value):
-        if value:
-            # Generate the URL and return the image HTML
-            return mark_safe(f'<img src="{value.url}" alt="Publication Image" class="img-thumbnail" style="height: 80px; width: auto;">')
-        return ''
+    def render_img_file(self, value, record):
+        return publication_thumbnail(record)
     
     # Custom method to render the Date
     def render_date_applied(self, value):
@@ -193,16 +249,19 @@ class PublicationTable(tables.Table):
         fields = ('number', 'decree', 'number_applied', 'applicant', 'country', 'address', 'date_applied', 'category', 'img_file', 'e_number', 'created_at', 'actions')
         attrs = {'class': 'table table-hover table-responsive align-middle'}
 
-class ObjectionPubPickTable(tables.Table):
+class ObjectionPubPickTable(OptimizedTable):
+    related_fields = ('decree', 'country', 'category')
+    projection = (
+        'id', 'number', 'decree__number', 'decree__date', 'applicant', 'country', 'address',
+        'date_applied', 'category', 'img_file', 'img_thumb', 'img_width', 'img_height', 'img_source', 'e_number', 'created_at',
+    )
+
     # Define a custom column to display the image
     img_file = tables.Column(orderable=False, verbose_name="الصورة")
 
     # Custom method to render the image
-    def render_img_file(self, value):
-        if value:
-            # Assuming 'value' is a file field, you can generate the URL and return the image HTML
-            return mark_safe(f'<img src="{value.url}" alt="Publication Image" class="img-thumbnail" style="height: 80px; width: auto;">')
-        return ''
+    def render_img_file(self, value, record):
+        return publication_thumbnail(record)
 
     class Meta:
         model = Publication
@@ -224,7 +283,13 @@ class ObjectionPubPickTable(tables.Table):
     #     url = reverse("add_pub_objection", kwargs={"document_id": record.id})
     #     return mark_safe(f'<a href="{url}" class="row-link">{value}</a>')
 
-class ObjectionTable(tables.Table):
+class ObjectionTable(OptimizedTable):
+    related_fields = ('pub', 'nationality')
+    projection = (
+        'id', 'number', 'pub__number', 'pub__number_applied', 'name', 'job', 'nationality', 'status',
+        'created_at', 'unique_code', 'receipt_file', 'pdf_file',
+    )
+
     actions = tables.TemplateColumn(
         template_name='partials/objection_actions.html',
         orderable=False,
@@ -242,7 +307,10 @@ class ObjectionTable(tables.Table):
         # Format the date as desired
         return value.strftime('%Y-%m-%d') if value else ''
 
-class FormPlusTable(tables.Table):
+class FormPlusTable(OptimizedTable):
+    related_fields = ('type',)
+    projection = ('id', 'number', 'date', 'title', 'type', 'keywords', 'pdf_file', 'word_file')
+
     actions = tables.TemplateColumn(
         template_name='partials/formplus_actions.html', 
         orderable=False, 
@@ -1,7 +1,14 @@
 from celery import shared_task
+from django.core.cache import cache
 from django.utils.timezone import now
 from datetime import timedelta
-from .models import Publication
+from .models import Publication, PublicationStatus, ExportJob, ExportStatus
+from .stats import invalidate_dashboard_stats
+from .charts import refresh_dashboard_chart, schedule_chart_refresh
+from .similarity import refresh_brand_matches
+from .exports import acquire_export_slot, build_export, notify_export_ready, purge_expired_exports
+from .pdfcache import get_pdf_etag, store_pregenerated_pdf, schedule_pdf_pregeneration
+from .images import process_publication_image
 
 @shared_task
 def check_and_update_publication_status():
@@ -13,10 +20,142 @@ def check_and_update_publication_status():
     """
     threshold_date = now() - timedelta(days=30)
 
-    affected_rows = Publication.objects.filter(
+    publication_ids = list(Publication.objects.filter(
         created_at__lte=threshold_date,  
         status=1,  
         objection__isnull=True
-    ).update(status=3)
+    ).values_list('pk', flat=True))
+    affected_rows = Publication.objects.filter(pk__in=publication_ids).update(status=3)
 
-    return f"Updated {affected_rows} publications."
\ No newline at end of file
+    # Bulk updates bypass the model signals, so drop the cached counters and render the final PDFs here
+    if affected_rows:
+        invalidate_dashboard_stats()
+        schedule_chart_refresh()
+        for publication_id in publication_ids:
+            schedule_pdf_pregeneration(publication_id, ['pub_final'])
+
+    return f"Updated {affected_rows} publications."
+
+@shared_task
+def refresh_dashboard_chart_task():
+    """
+    Recomputes the homepage chart data and stores it under its versioned cache key.
+    Runs on the beat schedule and shortly after any document change.
+    """
+    refresh_dashboard_chart()
+    return "Dashboard chart refreshed."
+
+@shared_task
+def refresh_brand_matches_task(publication_id):
+    """
+    Recomputes the precomputed similar brands of a single publication.
+    Queued whenever a publication is saved.
+    """
+    publication = Publication.objects.filter(pk=publication_id, deleted_at__isnull=True).first()
+    if publication is None:
+        return f"Publication {publication_id} not found."
+    count = refresh_brand_matches(publication)
+    return f"Stored {count} similar brands for publication {publication_id}."
+
+@shared_task
+def refresh_open_brand_matches():
+    """
+    Recomputes the similar brands of every publication still in its objection
+    window, so their lists pick up the marks published after them.
+    """
+    publications = Publication.objects.filter(status=PublicationStatus.INITIAL, deleted_at__isnull=True)
+    for publication in publications.iterator():
+        refresh_brand_matches(publication)
+    return f"Refreshed the similar brands of {publications.count()} publications."
+
+@shared_task(bind=True, max_retries=None)
+def build_export_task(self, export_id):
+    """
+    Builds the ZIP archive of a bulk export and emails its link to the user.
+    Waits (retries) while EXPORT_MAX_CONCURRENT exports are already running.
+    """
+    job = ExportJob.objects.select_related('user').filter(pk=export_id, status=ExportStatus.PENDING).first()
+    if job is None:
+        return f"Export {export_id} not found or already handled."
+    slot = acquire_export_slot(export_id)
+    if slot is None:
+        raise self.retry(countdown=30)
+    try:
+        build_export(job)
+    except Exception as e:
+        ExportJob.objects.filter(pk=export_id).update(status=ExportStatus.FAILED, error=str(e))
+        raise
+    finally:
+        cache.delete(slot)
+    notify_export_ready(job)
+    return f"Exported {job.total} records to {job.file.name}."
+
+@shared_task
+def purge_expired_exports_task():
+    """Deletes the bulk export archives past their expiry."""
+    purged = purge_expired_exports()
+    return f"Purged {purged} expired exports."
+
+@shared_task
+def pregenerate_publication_pdfs_task(publication_id, kinds):
+    """
+    Renders the given publication PDFs ('pub_initial', 'pub_final') and stores them
+    on the publication, so the download views serve a file instead of rendering.
+    """
+    # Imported here so the PDF libraries behind the views are only loaded when rendering
+    from .views import render_pub_pdf
+    if not Publication.objects.filter(pk=publication_id, deleted_at__isnull=True).exists():
+        return f"Publication {publication_id} not found."
+    for kind in kinds:
+        # Taken before rendering, so a change during the rendering leaves the file stale rather than wrong
+        etag = get_pdf_etag(kind, publication_id)
+        store_pregenerated_pdf(kind, publication_id, etag, render_pub_pdf(kind, publication_id))
+    return f"Rendered {', '.join(kinds)} for publication {publication_id}."
+
+@shared_task
+def build_bulletin_task(export_id):
+    """
+    Splits a bulletin (every publication of an e_number issue or date range) into
+    parts and queues one rendering task per part, so large issues are rendered by
+    the whole worker pool at once.
+    """
+    # Imported here so the PDF libraries are only loaded by the workers that render
+    from .bulletins import split_bulletin
+    job = ExportJob.objects.filter(pk=export_id, status=ExportStatus.PENDING).first()
+    if job is None:
+        return f"Bulletin {export_id} not found or already handled."
+    parts = split_bulletin(job)
+    if not parts:
+        ExportJob.objects.filter(pk=export_id).update(status=ExportStatus.FAILED, error="No publications in this bulletin.")
+        return f"Bulletin {export_id} has no publications."
+    for index, ids in enumerate(parts):
+        render_bulletin_part_task.delay(export_id, index, ids)
+    return f"Queued {len(parts)} parts for bulletin {export_id}."
+
+@shared_task
+def render_bulletin_part_task(export_id, index, ids):
+    """
+    Renders one part of a bulletin. The part that completes the bulletin joins
+    all the parts into the archive and emails its link to the user.
+    """
+    from .bulletins import render_bulletin_part, assemble_bulletin
+    try:
+        last = render_bulletin_part(export_id, index, ids)
+        if last:
+            job = ExportJob.objects.select_related('user').get(pk=export_id)
+            if assemble_bulletin(job):
+                notify_export_ready(job)
+    except Exception as e:
+        ExportJob.objects.filter(pk=export_id).update(status=ExportStatus.FAILED, error=str(e))
+        raise
+    return f"Rendered part {index} ({len(ids)} publications) of bulletin {export_id}."
+
+@shared_task
+def process_publication_image_task(publication_id):
+    """
+    Builds the list thumbnail and the PDF copy of a publication's uploaded image.
+    Queued whenever a publication's image is uploaded, replaced or removed.
+    """
+    if process_publication_image(publication_id):
+        return f"Processed the image of publication {publication_id}."
+    return f"Image of publication {publication_id} already processed."
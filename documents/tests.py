@@ -1,3 +1,584 @@
-from django.test import TestCase
+import datetime
+import io
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+from PIL import Image
+from django.contrib import messages
+from django.contrib.messages import get_messages
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from users.models import CustomUser
+from .exports import build_export, export_queryset
+from .similarity import arabic_phonetic_key, latin_phonetic_key, find_similar_brands, refresh_brand_matches, get_brand_matches
+from .pagination import CURSOR_SALT, CursorSerializer, get_ordering_keys
+from .genpdf import STATIC_LABELS, process_arabic_text, shape_arabic_text, shape_record_value, pub_batch_pdf
+from .bulletins import split_bulletin, render_bulletin_part, assemble_bulletin
+from .qr import publication_qr_data, get_qr_png, get_qr_matrix
+from .images import process_publication_image
+from .tables import publication_thumbnail
+from .pdfcache import get_pdf_etag
+from .bulletins import publication_record
+from .tasks import pregenerate_publication_pdfs_task
+from .models import Country, ComType, DocType, DecreeCategory, Decree, DecreeStatus, Publication, BrandMatch, Objection, FormPlus, ExportJob, ExportStatus
 
-# Create your tests here.
+# Upper bound of queries for rendering one page of a document list (session, user, filters, page, count)
+MAX_QUERIES_PER_PAGE = 15
+
+
+class TableQueryCountTests(TestCase):
+    """
+    The document lists must render a fixed number of queries per page, whatever
+    the number of rows and related objects shown on it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.country = Country.objects.create(ar_name='ليبيا', en_name='Libya')
+        cls.category = DecreeCategory.objects.create(number=1, name='فئة')
+        cls.doc_type = DocType.objects.create(name='نموذج')
+        cls.com_type = ComType.objects.create(name='تجارية')
+
+    def create_documents(self, count):
+        """Creates `count` decrees, publications, objections and forms, each with its related objects."""
+        start = Decree.objects.count() + 1
+        for number in range(start, start + count):
+            decree = Decree.objects.create(
+                number=number, date=datetime.date(2024, 1, 1), applicant='طالب', company='شركة',
+                country=self.country, category=self.category, ar_brand='علامة', en_brand='brand',
+            )
+            publication = Publication.objects.create(
+                year=2024, number=number, decree=decree, decree_number=number, applicant='طالب',
+                owner='مالك', country=self.country, date_applied=datetime.date(2024, 1, 1),
+                number_applied=number, ar_brand='علامة', en_brand='brand', category=self.category, e_number=1,
+            )
+            # Objection.save() saves twice, so it cannot go through objects.create() (force_insert)
+            Objection(
+                pub=publication, name='مقدم', job='مهنة', nationality=self.country, address='عنوان',
+                phone='0910000000', com_name='شركة', com_job=self.com_type, com_address='عنوان',
+                com_og_address='عنوان', com_mail_address='عنوان',
+            ).save()
+            FormPlus.objects.create(date=datetime.date(2024, 1, 1), type=self.doc_type, title='نموذج', pdf_file='form.pdf')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.user)
+        urls = [
+            reverse('decree_list'),
+            reverse('publication_list'),
+            reverse('objection_list'),
+            reverse('objection_pub_pick'),
+            reverse('formplus_list'),
+            reverse('manage_sections'),
+        ]
+
+        self.create_documents(2)
+        few_rows = {url: self.count_queries(url) for url in urls}
+
+        # A full page (20 rows) must cost the same as a page of 2
+        self.create_documents(18)
+        for url in urls:
+            with self.subTest(url=url):
+                queries = self.count_queries(url)
+                self.assertEqual(queries, few_rows[url])
+                self.assertLessEqual(queries, MAX_QUERIES_PER_PAGE)
+
+
+class DownloadTests(TestCase):
+    """Downloads are streamed from storage, with byte ranges and proxy hand-over."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.content = bytes(range(256)) * 1024
+        with override_settings(MEDIA_ROOT=cls.media_root):
+            cls.formplus = FormPlus(date=datetime.date(2024, 1, 1), type=DocType.objects.create(name='نموذج'), title='نموذج')
+            cls.formplus.pdf_file.save('form.pdf', ContentFile(cls.content))
+            cls.decree = Decree(number=1, date=datetime.date(2024, 1, 1), ar_brand='علامة')
+            cls.decree.pdf_file.save('decree.pdf', ContentFile(cls.content), save=False)
+            cls.decree.attach.save('attach.jpg', ContentFile(cls.content[::-1]))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def download(self, **headers):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            return self.client.get(reverse('download_formplus_pdf', args=[self.formplus.pk]), secure=True, **headers)
+
+    def test_whole_file_is_streamed(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_byte_range(self):
+        response = self.download(HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[1000:2000])
+
+        response = self.download(HTTP_RANGE='bytes=-100')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-100:])
+
+    def test_unsatisfiable_range(self):
+        response = self.download(HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_combined_download_is_a_streamed_zip(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            response = self.client.get(reverse('download_decree', args=[self.decree.pk]), secure=True)
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertEqual(archive.testzip(), None)
+        self.assertEqual(archive.read('decree_1_2024-01-01.pdf'), self.content)
+        self.assertEqual(archive.read('decree_attachment_1_2024-01-01.jpg'), self.content[::-1])
+
+    @override_settings(DOWNLOAD_ACCEL='x-accel-redirect', DOWNLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_proxy_hand_over(self):
+        response = self.download()
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.formplus.pdf_file.name}')
+        self.assertEqual(response.content, b'')
+
+
+class ExportTests(TestCase):
+    """Bulk exports archive the files of the filtered list with a manifest."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        with override_settings(MEDIA_ROOT=self.media_root):
+            for number in (1, 2, 3):
+                decree = Decree(number=number, date=datetime.date(2024, 1, 1), ar_brand='علامة', applicant=f'طالب {number}')
+                decree.pdf_file.save('decree.pdf', ContentFile(b'%PDF-' + bytes([number]) * 100))
+
+    def test_build_export(self):
+        job = ExportJob.objects.create(user=self.user, model_name='decree', params={'applicant': 'طالب 2'})
+        with override_settings(MEDIA_ROOT=self.media_root):
+            build_export(job)
+            job.refresh_from_db()
+            with job.file.open('rb') as archive_file:
+                archive = zipfile.ZipFile(archive_file)
+                names = archive.namelist()
+                manifest = archive.read('manifest.csv').decode('utf-8-sig')
+
+        self.assertEqual(job.status, ExportStatus.DONE)
+        self.assertEqual((job.processed, job.total), (1, 1))
+        self.assertIsNotNone(job.expires_at)
+        self.assertEqual(names, ['decree_2_2024-01-01.pdf', 'manifest.csv'])
+        self.assertEqual(len(manifest.splitlines()), 2)
+        self.assertIn('طالب 2', manifest)
+
+
+    def test_export_uses_the_list_filters(self):
+        query = 'applicant=%D8%B7%D8%A7%D9%84%D8%A8+1&applicant=%D8%B7%D8%A7%D9%84%D8%A8+3&status=1&cursor=abc'
+        self.client.force_login(self.user)
+        self.client.post(f"{reverse('start_export', args=['decree'])}?{query}", secure=True)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.params, {'applicant': ['طالب 1', 'طالب 3'], 'status': ['1']})
+
+        response = self.client.get(f"{reverse('decree_list')}?{query.replace('&cursor=abc', '')}", secure=True)
+        shown = sorted(row.record.pk for row in response.context['table'].page.object_list)
+        self.assertEqual(sorted(export_queryset('decree', job.params, self.user).values_list('pk', flat=True)), shown)
+        self.assertEqual(len(shown), 1)
+
+
+class GeneratedPdfCacheTests(TestCase):
+    """Generated PDFs are rendered once per change and revalidated with their ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(ar_name='ليبيا', en_name='Libya')
+        category = DecreeCategory.objects.create(number=1, name='فئة')
+        decree = Decree.objects.create(number=1, date=datetime.date(2024, 1, 1), country=country, category=category)
+        cls.publication = Publication.objects.create(
+            year=2024, number=1, decree=decree, decree_number=1, applicant='طالب', owner='مالك', country=country,
+            date_applied=datetime.date(2024, 1, 1), number_applied=1, ar_brand='علامة', en_brand='brand',
+            category=category, e_number=1,
+        )
+
+    def test_conditional_get_and_invalidation(self):
+        url = reverse('gen_pub_pdf', args=[self.publication.pk])
+        with mock.patch('documents.genpdf.pub_pdf', return_value=b'%PDF-1') as render:
+            response = self.client.get(url, secure=True)
+            etag = response['ETag']
+            self.assertEqual(response.content, b'%PDF-1')
+
+            # Same records: 304 without rendering, and the cached copy for plain requests
+            self.assertEqual(self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(url, secure=True).content, b'%PDF-1')
+            self.assertEqual(render.call_count, 1)
+
+            # A change of the publication gives a new ETag and a new rendering
+            self.publication.save()
+            render.return_value = b'%PDF-2'
+            response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertEqual(response.content, b'%PDF-2')
+
+    def test_pregenerated_pdf_is_served_until_stale(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        url = reverse('gen_pub_pdf', args=[self.publication.pk])
+        with override_settings(MEDIA_ROOT=media_root), \
+                mock.patch('documents.genpdf.pub_pdf', return_value=b'%PDF-pre') as render:
+            pregenerate_publication_pdfs_task(self.publication.pk, ['pub_initial'])
+            response = self.client.get(url, secure=True)
+            self.assertTrue(response.streaming)
+            self.assertEqual(b''.join(response.streaming_content), b'%PDF-pre')
+
+            # Once the publication changes, the stored file is stale and the PDF is rendered on demand
+            self.publication.save()
+            render.return_value = b'%PDF-live'
+            response = self.client.get(url, secure=True)
+            self.assertFalse(response.streaming)
+            self.assertEqual(response.content, b'%PDF-live')
+
+
+class BulletinTests(TestCase):
+    """A bulletin prints every publication of an e_number issue, in one PDF or in parts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        country = Country.objects.create(ar_name='ليبيا', en_name='Libya')
+        category = DecreeCategory.objects.create(number=1, name='فئة')
+        for number, e_number in ((1, 7), (2, 7), (3, 7), (4, 8)):
+            Publication.objects.create(
+                year=2024, number=number, decree_number=number, applicant='طالب', country=country,
+                date_applied=datetime.date(2024, 1, 1), number_applied=number, ar_brand='علامة', category=category,
+                e_number=e_number,
+            )
+
+    def count_pages(self, pdf_data):
+        return pdf_data.count(b'/Type /Page\n')
+
+    def test_small_bulletin_is_one_pdf(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('bulletin_pdf'), {'e_number': '7'}, secure=True)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(self.count_pages(response.content), 3)
+
+    def test_malformed_parameters_redirect_to_the_list(self):
+        self.client.force_login(self.user)
+        for params in ({'e_number': 'abc'}, {'e_number': '-7'}, {'date_from': '2024-13-01'}, {'date_to': 'yesterday'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('bulletin_pdf'), params, secure=True)
+                self.assertRedirects(response, reverse('publication_list'), fetch_redirect_response=False)
+                self.assertEqual(list(get_messages(response.wsgi_request))[-1].level, messages.ERROR)
+
+    @override_settings(BULLETIN_PART_SIZE=2)
+    def test_large_bulletin_is_rendered_in_parts(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        job = ExportJob.objects.create(user=self.user, model_name='bulletin', params={'e_number': '7', 'final': True})
+        with override_settings(MEDIA_ROOT=media_root):
+            parts = split_bulletin(job)
+            self.assertEqual([len(ids) for ids in parts], [2, 1])
+            finished = [render_bulletin_part(job.pk, index, ids) for index, ids in enumerate(parts)]
+            self.assertEqual(finished, [False, True])
+
+            job.refresh_from_db()
+            self.assertTrue(assemble_bulletin(job))
+            job.refresh_from_db()
+            with job.file.open('rb') as archive_file:
+                archive = zipfile.ZipFile(archive_file)
+                pages = [self.count_pages(archive.read(name)) for name in archive.namelist()]
+
+        self.assertEqual(job.status, ExportStatus.DONE)
+        self.assertEqual(pages, [2, 1])
+
+
+class ArabicShapingTests(TestCase):
+    """The shaping caches return exactly what shaping the text gives."""
+
+    def test_labels_and_values_match_uncached_shaping(self):
+        for text in (STATIC_LABELS[0], 'طرابلس - شارع عمر المختار', '2024-01-01'):
+            self.assertEqual(process_arabic_text(text), shape_arabic_text(text))
+
+        shape_record_value.cache_clear()
+        process_arabic_text(STATIC_LABELS[0])
+        process_arabic_text('ليبيا')
+        process_arabic_text('ليبيا')
+        info = shape_record_value.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+
+class PdfTemplateTests(TestCase):
+    """The static layer of a form is embedded once per document and reused by every page."""
+
+    def test_batch_pages_share_the_static_layer(self):
+        record = {
+            'pub_no': 1, 'number_applied': 1, 'date_applied': '2024-01-01', 'applicant': 'طالب', 'address': 'طرابلس',
+            'country': 'ليبيا', 'pub_date': '2024-01-01', 'category': 'فئة', 'e_number': 7, 'pub_img': '',
+        }
+        pdf_data = pub_batch_pdf([(record, None)] * 3, final=True)
+        self.assertEqual(pdf_data.count(b'/Type /Page\n'), 3)
+        self.assertEqual(pdf_data.count(b'/Subtype /Form'), 1)
+        self.assertEqual(pdf_data.count(b'/Subtype /Image'), 1)
+        # The logo JPEG is embedded as it is, not re-encoded as ASCII85 text
+        self.assertNotIn(b'ASCII85Decode', pdf_data)
+
+
+class QrCodeTests(TestCase):
+    """QR codes point at SITE_URL and are encoded once per data."""
+
+    @override_settings(SITE_URL='https://tm.example.ly/')
+    def test_publication_qr_uses_site_url(self):
+        self.assertEqual(publication_qr_data(5), 'https://tm.example.ly/publications/detail/5/')
+
+    def test_codes_are_cached(self):
+        data = 'https://tm.example.ly/publications/detail/6/'
+        png = get_qr_png('publication', data)
+        matrix = get_qr_matrix('publication', data)
+        with mock.patch('qrcode.make') as make, mock.patch('qrcode.QRCode') as encoder:
+            self.assertEqual(get_qr_png('publication', data), png)
+            self.assertEqual(get_qr_matrix('publication', data), matrix)
+        make.assert_not_called()
+        encoder.assert_not_called()
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertEqual(len(matrix), len(matrix[0]))
+
+
+class PublicationImageTests(TestCase):
+    """Uploaded images get an upright thumbnail and PDF copy, used instead of the upload."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        country = Country.objects.create(ar_name='ليبيا', en_name='Libya')
+        category = DecreeCategory.objects.create(number=1, name='فئة')
+        self.publication = Publication.objects.create(
+            year=2024, number=1, decree_number=1, applicant='طالب', country=country,
+            date_applied=datetime.date(2024, 1, 1), number_applied=1, ar_brand='علامة', category=category, e_number=1,
+        )
+
+    def upload(self, image, image_format, **options):
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, **options)
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.publication.img_file.save(f'brand.{image_format.lower()}', ContentFile(buffer.getvalue()))
+
+    def test_derived_images(self):
+        # A 1500x1000 photo taken sideways (EXIF orientation 6), shown upright as 1000x1500
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        self.upload(Image.new('RGB', (1500, 1000), 'red'), 'JPEG', exif=exif)
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.assertTrue(process_publication_image(self.publication.pk))
+            self.assertFalse(process_publication_image(self.publication.pk))
+            self.publication.refresh_from_db()
+            with self.publication.img_thumb.open('rb') as thumb_file, Image.open(thumb_file) as thumb:
+                self.assertEqual((thumb.format, thumb.height), ('WEBP', 160))
+            with self.publication.img_pdf.open('rb') as pdf_file, Image.open(pdf_file) as pdf_image:
+                self.assertEqual((pdf_image.format, pdf_image.size), ('JPEG', (427, 640)))
+
+            self.assertEqual((self.publication.img_width, self.publication.img_height), (1000, 1500))
+            self.assertIn(f'src="{self.publication.img_thumb.url}" height="80" width="53"', publication_thumbnail(self.publication))
+            record = publication_record(self.publication)
+            self.assertEqual(record['pub_img'], self.publication.img_pdf.url)
+            self.assertEqual(record['pub_img_size'], (1000, 1500))
+
+    def test_replaced_image_is_used_until_processed(self):
+        self.upload(Image.new('RGB', (100, 50), 'red'), 'JPEG')
+        with override_settings(MEDIA_ROOT=self.media_root):
+            process_publication_image(self.publication.pk)
+            etag = get_pdf_etag('pub_initial', self.publication.pk)
+            self.publication.refresh_from_db()
+            old_pdf_copy = self.publication.img_pdf.url
+
+            self.upload(Image.new('RGB', (60, 120), 'blue'), 'JPEG')
+            self.publication.refresh_from_db()
+            record = publication_record(self.publication)
+            self.assertEqual(record['pub_img'], self.publication.img_file.url)
+            self.assertIsNone(record['pub_img_size'])
+            self.assertIn(f'src="{self.publication.img_file.url}" height="80" loading', publication_thumbnail(self.publication))
+
+            self.assertTrue(process_publication_image(self.publication.pk))
+            self.publication.refresh_from_db()
+            record = publication_record(self.publication)
+            self.assertNotEqual(record['pub_img'], old_pdf_copy)
+            self.assertEqual(record['pub_img'], self.publication.img_pdf.url)
+            self.assertEqual(record['pub_img_size'], (60, 120))
+            # The PDFs rendered with the previous copy are not served again
+            self.assertNotEqual(get_pdf_etag('pub_initial', self.publication.pk), etag)
+
+    def test_transparent_image_is_flattened(self):
+        self.upload(Image.new('RGBA', (100, 50), (0, 0, 0, 0)), 'PNG')
+        with override_settings(MEDIA_ROOT=self.media_root):
+            process_publication_image(self.publication.pk)
+            self.publication.refresh_from_db()
+            with self.publication.img_pdf.open('rb') as pdf_file, Image.open(pdf_file) as pdf_image:
+                self.assertEqual(pdf_image.mode, 'RGB')
+                self.assertEqual(pdf_image.getpixel((10, 10)), (255, 255, 255))
+
+
+class BrandSimilarityTests(TestCase):
+    """Brands that look or sound alike are found, best first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        brands = [('كوكا كولا', 'Coca Cola'), ('قوقا كولا', 'Koka Kola'), ('بيبسي', 'Pepsi')]
+        cls.decrees = [
+            Decree.objects.create(number=number, date=datetime.date(2024, 1, 1), ar_brand=ar_brand, en_brand=en_brand)
+            for number, (ar_brand, en_brand) in enumerate(brands, 1)
+        ]
+        cls.publication = Publication.objects.create(
+            year=2024, number=1, decree_number=9, applicant='طالب', country=Country.objects.create(ar_name='ليبيا', en_name='Libya'),
+            date_applied=datetime.date(2024, 1, 1), number_applied=1, ar_brand='كوكاكولا', en_brand='Coca-Cola',
+            category=DecreeCategory.objects.create(number=1, name='فئة'), e_number=1,
+        )
+
+    def test_spelling_variants_share_a_phonetic_key(self):
+        self.assertEqual(len({latin_phonetic_key(brand) for brand in ('Koka Kola', 'Coca-Cola', 'cocacola')}), 1)
+        self.assertEqual(latin_phonetic_key('Phanta'), latin_phonetic_key('Fanta'))
+        self.assertNotEqual(latin_phonetic_key('Pepsi'), latin_phonetic_key('Coca-Cola'))
+        self.assertEqual(len({arabic_phonetic_key(brand) for brand in ('بيبسي', 'ببسي', 'البيبسى')}), 1)
+        self.assertEqual(arabic_phonetic_key('قوقا كولا'), arabic_phonetic_key('كوكا كولا'))
+        self.assertNotEqual(arabic_phonetic_key('بيبسي'), arabic_phonetic_key('كوكا كولا'))
+
+    def test_results_are_ranked(self):
+        results = find_similar_brands('كوكا كولا', 'Coca Cola', exclude_publication=self.publication.pk)
+        self.assertEqual([(result['type'], result['id']) for result in results[:2]], [
+            ('decree', self.decrees[0].pk), ('decree', self.decrees[1].pk),
+        ])
+        self.assertEqual([result['score'] for result in results], sorted((result['score'] for result in results), reverse=True))
+        self.assertNotIn(self.decrees[2].pk, [result['id'] for result in results if result['type'] == 'decree'])
+
+    def test_precomputed_matches(self):
+        count = refresh_brand_matches(self.publication)
+        self.assertEqual(BrandMatch.objects.filter(publication=self.publication).count(), count)
+        matches = get_brand_matches(self.publication)
+        self.assertEqual({(match['type'], match['id']) for match in matches}, {
+            ('decree', self.decrees[0].pk), ('decree', self.decrees[1].pk),
+        })
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('brand_similarity'), {'pub': self.publication.pk}, secure=True)
+        self.assertEqual(response.json(), matches)
+        self.assertEqual(self.client.get(reverse('brand_similarity'), {'pub': 'abc'}, secure=True).status_code, 400)
+
+
+class DecreeAutocompleteTests(TestCase):
+    """Decrees sharing a number are listed newest first, the one the publication form picks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        dates = [datetime.date(2021, 5, 1), datetime.date(2024, 3, 1), datetime.date(2022, 7, 1)]
+        cls.decrees = [
+            Decree.objects.create(number=12, date=date, ar_brand='علامة', status=DecreeStatus.ACCEPT) for date in dates
+        ]
+        Decree.objects.create(number=120, date=datetime.date(2020, 1, 1), ar_brand='علامة', status=DecreeStatus.ACCEPT)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_shared_number_newest_first(self):
+        response = self.client.get(reverse('decree-autocomplete'), {'q': '12'})
+        self.assertEqual(
+            [(row['number'], row['date']) for row in response.json()],
+            [(12, '2024-03-01'), (12, '2022-07-01'), (12, '2021-05-01'), (120, '2020-01-01')],
+        )
+
+    def test_cursor_pages_follow_the_order(self):
+        url = reverse('decree-autocomplete')
+        first = self.client.get(url, {'q': '12', 'limit': 2})
+        self.assertEqual([row['date'] for row in first.json()], ['2024-03-01', '2022-07-01'])
+        second = self.client.get(url, {'q': '12', 'limit': 2, 'after': first['X-Next-Cursor']})
+        self.assertEqual([(row['number'], row['date']) for row in second.json()], [(12, '2021-05-01'), (120, '2020-01-01')])
+        self.assertEqual(second['X-Next-Cursor'], '')
+        self.assertEqual(self.client.get(url, {'q': '12', 'after': '12_5'}).status_code, 400)
+
+
+class PublicationAutocompleteTests(TestCase):
+    """The objection form loads the initial publications a page at a time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(ar_name='ليبيا', en_name='Libya')
+        category = DecreeCategory.objects.create(number=1, name='فئة')
+        for number in range(1, 26):
+            Publication.objects.create(
+                year=2024, number=number, decree_number=number, applicant='طالب', country=country,
+                date_applied=datetime.date(2024, 1, 1), number_applied=number, ar_brand='علامة', category=category,
+                e_number=1,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_next_cursor_loads_the_remaining_rows(self):
+        url = reverse('pub-autocomplete')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([row['number'] for row in first.json()], list(range(1, 21)))
+        second = self.client.get(url, {'after': first['X-Next-Cursor']})
+        self.assertEqual([row['number'] for row in second.json()], list(range(21, 26)))
+        self.assertEqual(second['X-Next-Cursor'], '')
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursors walk the decree list without gaps, and any altered cursor shows the first page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        for number in range(1, 26):
+            Decree.objects.create(number=number, date=datetime.date(2024, 1, 1), ar_brand='علامة')
+
+    def get_page(self, cursor=None):
+        response = self.client.get(reverse('decree_list'), {'cursor': cursor} if cursor else {}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        page = response.context['table'].page
+        return [row.record.pk for row in page.object_list], page
+
+    def test_cursor_pages(self):
+        self.client.force_login(self.user)
+        first_ids, first_page = self.get_page()
+        second_ids, second_page = self.get_page(first_page.next_cursor)
+        self.assertEqual(len(first_ids), 20)
+        self.assertEqual(sorted(first_ids + second_ids), sorted(Decree.objects.values_list('pk', flat=True)))
+        self.assertIsNone(second_page.next_cursor)
+        self.assertEqual(self.get_page(second_page.previous_cursor)[0], first_ids)
+
+    def test_bad_cursors_show_the_first_page(self):
+        self.client.force_login(self.user)
+        first_ids, first_page = self.get_page()
+        payload = signing.loads(first_page.next_cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+        bad_cursors = [
+            'garbage',
+            first_page.next_cursor[:-2] + ('aa' if not first_page.next_cursor.endswith('aa') else 'bb'),
+            # Signed for something else
+            signing.dumps(payload, salt='other', serializer=CursorSerializer),
+            # Signed, but with values that do not fit the keys
+            signing.dumps({**payload, 'k': ['x'] * len(payload['k'])}, salt=CURSOR_SALT, serializer=CursorSerializer),
+            signing.dumps({**payload, 'd': None}, salt=CURSOR_SALT, serializer=CursorSerializer),
+            signing.dumps({**payload, 'k': payload['k'][:1]}, salt=CURSOR_SALT, serializer=CursorSerializer),
+        ]
+        for cursor in bad_cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get_page(cursor)[0], first_ids)
+
+    def test_annotation_ordering_uses_offsets(self):
+        queryset = Decree.objects.annotate(rank=Value(0.5, output_field=FloatField())).order_by('-rank', '-id')
+        self.assertIsNone(get_ordering_keys(queryset))
+        self.assertEqual(get_ordering_keys(Decree.objects.order_by('number')), [('number', False), ('id', False)])
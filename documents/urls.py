@@ -6,6 +6,7 @@ from . import views
 urlpatterns = [
     # Main URL Route for Index
     path('', views.index, name='index'),
+    path('chart-data/', views.dashboard_chart_data, name='dashboard_chart_data'),
 
     # About Us Page View
     path('aboutus', views.read_txt_file, name='aboutus'),
@@ -75,12 +76,21 @@ urlpatterns = [
     path('formplus/download_w/<int:document_id>/', views.download_formplus_word, name='download_formplus_word'),
     path('formplus/delete/<int:document_id>/', views.soft_delete_formplus, name='delete_formplus'),
 
+    # Bulk export routes for the Decree and Publication lists
+    path('exports/', views.export_list, name='export_list'),
+    path('exports/start/<str:model_name>/', views.start_export, name='start_export'),
+    path('exports/download/<int:export_id>/', views.download_export, name='download_export'),
+    path('publications/bulletin/', views.bulletin_pdf, name='bulletin_pdf'),
+
     # AJAX autocomplete function for Publication model
     path('decree-autocomplete/', views.DecreeAutocompleteView.as_view(), name='decree-autocomplete'),
     
     # AJAX autocomplete function for Objection model
     path('publication-autocomplete/', views.PublicationAutocompleteView.as_view(), name='pub-autocomplete'),
     
+    # AJAX similar brands lookup for examiners
+    path('brand-similarity/', views.brand_similarity, name='brand_similarity'),
+
     # AJAX Mark Complete functions
     path('update-status/<int:document_id>/', views.update_status, name='update_status'),
     path('confirm-objection-fee/<int:document_id>/', views.confirm_objection_fee, name='confirm_objection_fee'),
@@ -10,9 +10,9 @@ from django.core.cache import cache
 import importlib
 import datetime
 from django.utils.safestring import mark_safe
-import qrcode
-import base64
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.views.decorators.cache import cache_control
 from django.conf import settings
 
 # Helping imports
@@ -25,30 +25,36 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required, permission_required, user_passes_test
 from django.utils.module_loading import import_string
+from django.db import transaction
 
 # JSON imports
 ##############
 import json
 import mimetypes
-import zipfile
-from io import BytesIO
 
 # Project imports
 #################
-from .models import Decree, DecreeStatus, Publication, PublicationStatus, Objection, ObjectionStatus, FormPlus, Country, Government, ComType, DocType, DecreeCategory
-from .genpdf import pub_pdf, obj_pdf, pub_final_pdf
+from .models import Decree, DecreeStatus, Publication, PublicationStatus, Objection, ObjectionStatus, FormPlus, Country, Government, ComType, DocType, DecreeCategory, ExportJob, ExportStatus
+from .stats import get_dashboard_stats, count_per_status
+from .charts import get_dashboard_chart
+from .search import number_prefix_q
+from .pagination import paginate_table
+from .downloads import serve_file, serve_zip
+from .pdfcache import get_cached_pdf, get_pdf_etag, get_pregenerated_pdf
+from .exports import EXPORT_SOURCES, clean_export_params, get_export_settings, schedule_export
+from .similarity import find_similar_brands, get_brand_matches, DEFAULT_TOP_K
+from .qr import generate_obj_qr, buffer_to_base64, publication_qr_data, objection_qr_data
+from .bulletins import publication_record, clean_bulletin_params, bulletin_queryset, bulletin_name, render_bulletin, get_bulletin_settings, schedule_bulletin
 
 # Design imports
 ################
 from django_tables2 import RequestConfig
 from django.db.models import Q
-import pandas as pd
-import plotly.express as px
 
 #####################################################################
 # low-level Logging initialization
 logger = logging.getLogger('documents')
-from users.models import  UserActivityLog
+from users.activity import log_activity, record_view
 from users.signals import get_client_ip
 
 # low-level Logging Function
@@ -66,240 +72,248 @@ def get_class_from_string(class_path):
     """Dynamically imports and returns a class from a string path."""
     return import_string(class_path)
 
-# Function for generating a QR code for a 13 digit sequence
-def generate_obj_qr(sequence):
-    # Ensure the input is exactly 13 digits
-    if not sequence.isdigit() or len(sequence) != 13:
-        raise ValueError("Invalid sequence")
-
-    # Generate QR code
-    qr = qrcode.make(sequence)
-
-    # Save QR to an in-memory buffer
-    buffer = BytesIO()
-    qr.save(buffer, format="PNG")
-    buffer.seek(0)
-
-    return buffer
-
-# Function for generating a QR code for a publication url
-def generate_pub_qr(pub_id):
-    # Define the base URL (you can modify it to be dynamic later)
-    base_url = "https://localhost:9430/publications/detail/"
-
-    # Dynamically set the publication ID (for example, publication with ID 3)
-    publication_id = pub_id
-    full_url = f"{base_url}{publication_id}/"
-
-    # Generate QR code
-    qr = qrcode.make(full_url)
-
-    # Save QR to an in-memory buffer
-    buffer = BytesIO()
-    qr.save(buffer, format="PNG")
-    buffer.seek(0)
-
-    return buffer
-
-# Function for converting a buffer to base64 for PDF rendering
-def buffer_to_base64(buffer):
-    return base64.b64encode(buffer.getvalue()).decode('utf-8')
-
 
 #####################################################################
+# Autocomplete endpoints return at most this many rows per request
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Seconds an autocomplete response is cached per (year, prefix, cursor)
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
+# Function that parses a "<number>_<id>" autocomplete cursor
+def parse_autocomplete_cursor(cursor):
+    """Returns the (number, id) pair of a cursor, None when it is empty, raises ValueError when malformed."""
+    if not cursor:
+        return None
+    number, _, pk = cursor.partition('_')
+    return int(number), int(pk)
+
+
+# Function that parses a "<number>_<date>_<id>" decree autocomplete cursor
+def parse_decree_cursor(cursor):
+    """Returns the (number, date, id) of a cursor, None when it is empty, raises ValueError when malformed."""
+    if not cursor:
+        return None
+    number, date, pk = cursor.split('_')
+    return int(number), datetime.date.fromisoformat(date), int(pk)
+
 # Class Function for fetching related Decrees based on a year
 class DecreeAutocompleteView(View):
+    """
+    Decree lookups for the autocomplete widgets of the decree and publication forms.
+
+    With `id` it returns the fields of a single decree used to pre-fill the form.
+    Otherwise it returns at most `limit` accepted decrees of `year` whose number
+    starts with `q`, ordered by number then newest first, so the decree a typed
+    number resolves to is the latest one; the `X-Next-Cursor` header holds the
+    `after` value of the next page. Results are cached briefly per (year, prefix).
+    """
     def get(self, request, *args, **kwargs):
         decree_id = request.GET.get('id')  # Fetch using ID
-        query = request.GET.get('q', '')
-        year = request.GET.get('year', '')
+        query = request.GET.get('q', '').strip()
+        year = request.GET.get('year', '').strip()
+        after = request.GET.get('after', '').strip()
+        try:
+            limit = min(max(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
 
         if decree_id:  # Fetch single decree by ID
-            try:
-                decree = Decree.objects.get(id=decree_id)
-                return JsonResponse({
-                    'id': decree.id,
-                    'number': decree.number,
-                    'date': decree.date.strftime("%Y-%m-%d") if decree.date else "",
-                    'owner': decree.applicant,
-                    'country': decree.country.id,
-                    'date_applied': decree.date_applied.strftime("%Y-%m-%d") if decree.date_applied else "",
-                    'number_applied': decree.number_applied if decree.number_applied else "",
-                    'ar_brand': decree.ar_brand,
-                    'en_brand': decree.en_brand,
-                    'category': decree.category.id,
-                })
-            except Decree.DoesNotExist:
+            decree = Decree.objects.filter(id=decree_id).values(
+                'id', 'number', 'date', 'applicant', 'country_id', 'date_applied',
+                'number_applied', 'ar_brand', 'en_brand', 'category_id',
+            ).first()
+            if decree is None:
                 return JsonResponse({}, status=404)
+            return JsonResponse({
+                'id': decree['id'],
+                'number': decree['number'],
+                'date': decree['date'].strftime("%Y-%m-%d") if decree['date'] else "",
+                'owner': decree['applicant'],
+                'country': decree['country_id'],
+                'date_applied': decree['date_applied'].strftime("%Y-%m-%d") if decree['date_applied'] else "",
+                'number_applied': decree['number_applied'] if decree['number_applied'] else "",
+                'ar_brand': decree['ar_brand'],
+                'en_brand': decree['en_brand'],
+                'category': decree['category_id'],
+            })
+
+        try:
+            cursor = parse_decree_cursor(after)
+        except ValueError:
+            return HttpResponseBadRequest("Invalid cursor")
+        if year and not year.isdigit():
+            return HttpResponseBadRequest("Invalid year")
+
+        cache_key = f"decree_autocomplete:{year}:{query}:{after}:{limit}"
+        cached = cache.get(cache_key)
+        if cached is None:
+            qs = Decree.objects.filter(status=DecreeStatus.ACCEPT, deleted_at__isnull=True)
+            if year:
+                qs = qs.filter(date__year=int(year))
+            if query:
+                qs = qs.filter(number_prefix_q('number', query))
+            if cursor:
+                number, date, pk = cursor
+                qs = qs.filter(
+                    Q(number__gt=number) | Q(number=number, date__lt=date) | Q(number=number, date=date, id__lt=pk)
+                )
+
+            # One extra row tells whether there is a next page
+            rows = list(qs.order_by('number', '-date', '-id').values('id', 'number', 'date')[:limit + 1])
+            results = [
+                {
+                    'id': row['id'],
+                    'number': row['number'],
+                    'date': row['date'].strftime("%Y-%m-%d") if row['date'] else "",
+                }
+                for row in rows[:limit]
+            ]
+            next_cursor = (
+                f"{results[-1]['number']}_{results[-1]['date']}_{results[-1]['id']}" if len(rows) > limit else ""
+            )
+            cached = (results, next_cursor)
+            cache.set(cache_key, cached, AUTOCOMPLETE_CACHE_TIMEOUT)
+
+        results, next_cursor = cached
+        response = JsonResponse(results, safe=False)
+        response['X-Next-Cursor'] = next_cursor
+        return response
 
-        qs = Decree.objects.filter(status=1).exclude(deleted_at__isnull=False)
-        if year:
-            qs = qs.filter(date__year=year)
-        if query:
-            qs = qs.filter(number__startswith=query)
 
-        results = [
-            {
-                'id': decree.id,
-                'number': decree.number,
-                'date': decree.date.strftime("%Y-%m-%d") if decree.date else "",
-            }
-            for decree in qs
-        ]
-        return JsonResponse(results, safe=False)
+# Function returning the brands similar to a publication or to the typed brands
+@login_required
+@permission_required('documents.view_objection', raise_exception=True)
+def brand_similarity(request):
+    """
+    JSON list of the decrees and publications with similar brands, best first.
+    Takes either `pub` (a publication id, served from its precomputed list) or
+    `ar`/`en` brands to compare, and an optional `k` for the number of results.
+    """
+    pub_id = request.GET.get('pub', '').strip()
+    if pub_id:
+        if not pub_id.isdigit():
+            return HttpResponseBadRequest("Invalid publication")
+        publication = get_object_or_404(Publication, pk=pub_id)
+        return JsonResponse(get_brand_matches(publication), safe=False)
+
+    ar_brand = request.GET.get('ar', '').strip()
+    en_brand = request.GET.get('en', '').strip()
+    if not ar_brand and not en_brand:
+        return HttpResponseBadRequest("ar or en is required")
+    try:
+        top_k = min(max(int(request.GET.get('k', DEFAULT_TOP_K)), 1), 50)
+    except ValueError:
+        top_k = DEFAULT_TOP_K
+    return JsonResponse(find_similar_brands(ar_brand, en_brand, top_k=top_k), safe=False)
 
 
 # Class Function for fetching related Publications based on a year
 class PublicationAutocompleteView(View):
-    def get(self, request, *args, **kwargs):
-        query = request.GET.get('q', '')
-        year = request.GET.get('year', '')
-        qs = Publication.objects.filter(status=1, deleted_at__isnull=True)
-        if year:
-            qs = qs.filter(created_at__year=year)
-        if query:
-            qs = qs.filter(number__startswith=query)
-
-        # Build a list of dictionaries for each publication
-        results = [
-            {
-                'year': pub.year if pub.year else "",
-                'number': pub.number,
-                'id': pub.id,
-                'decree': pub.decree.number if pub.decree else "",
-                'created_at': pub.created_at.strftime("%Y-%m-%d") if pub.created_at else "",
-                'applicant': pub.applicant,
-                'owner': pub.owner,
-                'country': pub.country.ar_name,
-                'address': pub.address,
-                'date_applied': pub.date_applied.strftime("%Y-%m-%d") if pub.date_applied else "",
-                'number_applied': pub.number_applied if pub.number_applied else "",
-                'ar_brand': pub.ar_brand,
-                'en_brand': pub.en_brand,
-                'category': pub.category.number,
-                'img_file': pub.img_file.url if pub.img_file else "",
-            }
-            for pub in qs
-        ]
-
-        return JsonResponse(results, safe=False)
-
-
-# Function for Chart generation 
-def create_chart(models, start_year=2012, end_year=2025):
     """
-    Generates a Plotly bar chart for document counts per year across multiple models.
-    Uses caching to improve performance.
-        
-    :param models: List of Django models to include in the chart.
-    :param start_year: Start year for filtering (default: 2012).
-    :param end_year: End year for filtering (default: 2025).
-    :return: HTML representation of the Plotly chart.
+    Publication lookups for the public objection form.
+
+    Returns at most `limit` initial publications of `year` whose number starts with
+    `q`, ordered by number, in a single query joining the decree, country and
+    category. The `X-Next-Cursor` header holds the `after` value of the next page
+    ("load more"). Results are cached briefly per (year, prefix).
     """
-    
-    # Construct a unique cache key based on input parameters
-    cache_key = f"chart_{start_year}_{end_year}_" + "_".join([model.__name__ for model in models])
-    cached_chart = cache.get(cache_key)
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        year = request.GET.get('year', '').strip()
+        after = request.GET.get('after', '').strip()
+        try:
+            limit = min(max(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+            cursor = parse_autocomplete_cursor(after)
+        except ValueError:
+            return HttpResponseBadRequest("Invalid limit or cursor")
+        if year and not year.isdigit():
+            return HttpResponseBadRequest("Invalid year")
+
+        cache_key = f"pub_autocomplete:{year}:{query}:{after}:{limit}"
+        cached = cache.get(cache_key)
+        if cached is None:
+            qs = Publication.objects.filter(status=PublicationStatus.INITIAL, deleted_at__isnull=True)
+            if year:
+                qs = qs.filter(created_at__year=int(year))
+            if query:
+                qs = qs.filter(number_prefix_q('number', query))
+            if cursor:
+                qs = qs.filter(Q(number__gt=cursor[0]) | Q(number=cursor[0], id__gt=cursor[1]))
+
+            # Related columns are projected through joins, one extra row tells whether there is a next page
+            rows = list(qs.order_by('number', 'id').values(
+                'id', 'year', 'number', 'created_at', 'applicant', 'owner', 'address',
+                'date_applied', 'number_applied', 'ar_brand', 'en_brand', 'img_file',
+                'decree__number', 'country__ar_name', 'category__number',
+            )[:limit + 1])
+            storage = Publication._meta.get_field('img_file').storage
+
+            # Build a list of dictionaries for each publication
+            results = [
+                {
+                    'year': row['year'] if row['year'] else "",
+                    'number': row['number'],
+                    'id': row['id'],
+                    'decree': row['decree__number'] if row['decree__number'] else "",
+                    'created_at': row['created_at'].strftime("%Y-%m-%d") if row['created_at'] else "",
+                    'applicant': row['applicant'],
+                    'owner': row['owner'],
+                    'country': row['country__ar_name'],
+                    'address': row['address'],
+                    'date_applied': row['date_applied'].strftime("%Y-%m-%d") if row['date_applied'] else "",
+                    'number_applied': row['number_applied'] if row['number_applied'] else "",
+                    'ar_brand': row['ar_brand'],
+                    'en_brand': row['en_brand'],
+                    'category': row['category__number'],
+                    'img_file': storage.url(row['img_file']) if row['img_file'] else "",
+                }
+                for row in rows[:limit]
+            ]
+            next_cursor = f"{results[-1]['number']}_{results[-1]['id']}" if len(rows) > limit else ""
+            cached = (results, next_cursor)
+            cache.set(cache_key, cached, AUTOCOMPLETE_CACHE_TIMEOUT)
+
+        results, next_cursor = cached
+        response = JsonResponse(results, safe=False)
+        response['X-Next-Cursor'] = next_cursor
+        return response
 
-    # Return the cached chart if available
-    if cached_chart:
-        return cached_chart  
-    
-    years = range(start_year, end_year + 1)
-    data = []
-
-    # Collect data from each model
-    for model in models:
-        model_name = model._meta.verbose_name  # Use Django's verbose_name for readability
-        year_field = None
-
-        # Determine the correct field to filter by year
-        if hasattr(model, 'year'):  # Model with explicit 'year' field
-            year_field = 'year'
-        elif hasattr(model, 'created_at'):  # Model using 'created_at'
-            year_field = 'created_at__year'
-        elif hasattr(model, 'date'):  # Model using 'date'
-            year_field = 'date__year'
-
-        if year_field:
-            for year in years:
-                # Get the count of documents for the given year
-                count = model.objects.filter(**{year_field: year}, deleted_at__isnull=True).count() or 0
-                data.append({'Year': year, 'Count': count, 'Model': model_name})
-
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-
-    # Create the bar chart
-    fig = px.bar(
-        df, x='Year', y='Count', color='Model', barmode='group',
-        title='عدد الوثائق حسب السنة',
-        labels={'Model': 'النوع', 'Year': 'السنة', 'Count': 'عدد الوثائق'},
-        text='Count',
-        hover_data={'Model': False},
-    )
-    
-    # Update layout with hover label alignment for RTL
-    fig.update_layout(
-        height=340,
-        title_x=0.5,
-        xaxis_title='',
-        yaxis_title='عدد الوثائق',
-        showlegend=False,
-        autosize=True,
-        margin=dict(l=40, r=20, t=40, b=0),
-        font=dict(family='Shabwa, sans-serif', size=16),
-        hoverlabel=dict(
-            font=dict(
-                family="Shabwa, sans-serif",
-                size=14,
-                color="white"  # Text color
-            ),
-            bgcolor="rgba(11, 27, 99, 0.9)"  # Background color
-        )
-    )
 
-    # Convert figure to HTML representation
-    chart_html = fig.to_html(full_html=False)
-    # Store the chart in the cache for 1 hour (3600 seconds)
-    cache.set(cache_key, chart_html, timeout=3600)
-    return chart_html
+# Functions feeding the conditional GET checks of the chart data endpoint
+def dashboard_chart_etag(request):
+    chart = get_dashboard_chart()
+    return chart['etag'] if chart else None
 
+def dashboard_chart_last_modified(request):
+    chart = get_dashboard_chart()
+    return datetime.datetime.fromtimestamp(chart['last_modified'], tz=datetime.timezone.utc) if chart else None
 
-# Html & Chart Rendering Functions on index page
-def index(request):
-    # Generate the chart HTML
-    chart_html = create_chart([Publication, Decree, Objection])
 
-    decree = Decree.objects.filter(deleted_at__isnull=True)
-    decree_accept = decree.filter(status=1).count()
-    decree_reject = decree.filter(status=2).count()
+# JSON data Function for the index page chart
+@cache_control(no_cache=True)
+@condition(etag_func=dashboard_chart_etag, last_modified_func=dashboard_chart_last_modified)
+def dashboard_chart_data(request):
+    """
+    Returns the per-model/per-year document counts drawn by the homepage chart.
+    Browsers revalidate with If-None-Match/If-Modified-Since and get a 304 while
+    the data is unchanged.
+    """
+    chart = get_dashboard_chart()
+    if chart is None:
+        return JsonResponse({'years': [], 'series': []})
+    return JsonResponse(chart['data'], json_dumps_params={'ensure_ascii': False})
+
 
-    
-    # Get the total number of publications with status 'final'
-    publications = Publication.objects.filter(deleted_at__isnull=True)
-    pub_initial = publications.filter(status=1).count()
-    pub_conflict = publications.filter(status=2).count()
-    pub_final = publications.filter(status=3).count()
-
-    # Get the total number of objections with status 'pending'
-    objections = Objection.objects.filter(deleted_at__isnull=True)
-    obj_pending = objections.filter(Q(status=1) | Q(status=2)).count()
-    obj_paid = objections.filter(status=3).count()
-    obj_accept = objections.filter(status=4).count()
+# Html Rendering Function on index page
+def index(request):
+    # Get the status counters (cached, three aggregate queries on a miss)
+    stats = get_dashboard_stats()
 
     # Pass the values to the template context
     context = {
-        'chart_html': chart_html,
-        'decree_accept': decree_accept,
-        'decree_reject': decree_reject,
-        'decree_total': decree.count(),
-        'pub_initial': pub_initial,
-        'pub_conflict': pub_conflict,
-        'pub_final': pub_final,
-        'obj_pending': obj_pending,
-        'obj_paid': obj_paid,
-        'obj_accept': obj_accept,
+        **stats,
         'version': settings.VERSION,
     }
 
@@ -370,15 +384,13 @@ def core_models_view(request):
     if request.method == 'POST':
         if form.is_valid():
             form.save()
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="UPDATE",
                 model_name='ادارة الاقسام',
                 object_id=instance.pk,
                 number=selected_model._meta.verbose_name,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
             print("Form is valid and saved.")
             return redirect('manage_sections')  # Change this to your desired redirect
@@ -451,8 +463,8 @@ def decree_list(request):
     table_class = get_class_from_string(table_class_path)
     table = table_class(decree_filter.qs)
     
-    # Configure pagination (10 decrees per page)
-    RequestConfig(request, paginate={'per_page': 20}).configure(table)
+    # Configure cursor pagination (20 rows per page)
+    paginate_table(request, table, keyset=True)
     
     return render(request, 'decrees/decree_list.html', {
         'table': table,
@@ -519,15 +531,13 @@ def add_decree(request):
         instance = form.save()
 
         # Log the action
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="CREATE",
             model_name='قرار',
             object_id=instance.pk,
             number=instance.number,
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return redirect(reverse('decree_list'))
 
@@ -556,15 +566,13 @@ def edit_decree(request, document_id):
         instance = form.save()
 
         # Log the action
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="UPDATE",
             model_name='قرار',
             object_id=instance.pk,
             number=instance.number,
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return redirect(reverse('decree_list'))
 
@@ -594,48 +602,22 @@ def download_decree(request, document_id):
     identifier = decree.number if decree.number else 'unknown'
 
     if pdf_exists and attach_exists:
-        # Create ZIP file
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-            # Add PDF to ZIP
-            pdf_filename = f"decree_{identifier}_{date_str}.pdf"
-            with decree.pdf_file.open('rb') as pdf_file:
-                zip_file.writestr(pdf_filename, pdf_file.read())
-
-            # Add attachment to ZIP
-            attach_ext = decree.attach.name.split('.')[-1]
-            attach_filename = f"decree_attachment_{identifier}_{date_str}.{attach_ext}"
-            with decree.attach.open('rb') as attach_file:
-                zip_file.writestr(attach_filename, attach_file.read())
-
-        zip_buffer.seek(0)
-        response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="decree_{identifier}_{date_str}.zip"'
-        return response
+        # Stream a ZIP of the PDF and the attachment
+        attach_ext = decree.attach.name.split('.')[-1]
+        return serve_zip([
+            (f"decree_{identifier}_{date_str}.pdf", decree.pdf_file),
+            (f"decree_attachment_{identifier}_{date_str}.{attach_ext}", decree.attach),
+        ], f"decree_{identifier}_{date_str}.zip")
 
     elif pdf_exists:
         # Download only PDF
-        content_type, _ = mimetypes.guess_type(decree.pdf_file.name) or ('application/pdf',)
-        response = HttpResponse(content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="decree_{identifier}_{date_str}.pdf"'
-
-        with decree.pdf_file.open('rb') as pdf_file:
-            response.write(pdf_file.read())
-
-        return response
+        return serve_file(request, decree.pdf_file, f"decree_{identifier}_{date_str}.pdf")
 
     elif attach_exists:
         # Download only attachment
-        content_type, _ = mimetypes.guess_type(decree.attach.name) or ('application/octet-stream',)
         attach_ext = decree.attach.name.split('.')[-1]
         attach_filename = f"decree_attachment_{identifier}_{date_str}.{attach_ext}"
-        response = HttpResponse(content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="{attach_filename}"'
-
-        with decree.attach.open('rb') as attach_file:
-            response.write(attach_file.read())
-
-        return response
+        return serve_file(request, decree.attach, attach_filename)
 
     return HttpResponseNotFound('No document or attachment available for download.')
 
@@ -652,15 +634,13 @@ def soft_delete_decree(request, document_id):
         document.deleted_at = timezone.now()  # Set the deletion timestamp
         document.save()
         # Log the action
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="DELETE",
             model_name='قرار',
             object_id=document.pk,
             number=document.number,  # Save the relevant number
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),  # Assuming you have this function
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return JsonResponse({'success': True})
 
@@ -680,16 +660,13 @@ def decree_detail(request, document_id):
     else:
         user = None
     decree = get_object_or_404(Decree, pk=document_id)
-    # Log the action
-    UserActivityLog.objects.create(
+    # Count the view (logged according to ACTIVITY_LOG_VIEWS)
+    record_view(
+        request,
+        decree,
         user=user,
-        action="VIEW",
         model_name='قرار',
-        object_id=decree.pk,
         number=decree.number,  # Save the relevant number
-        timestamp=timezone.now(),
-        ip_address=get_client_ip(request),  # Assuming you have this function
-        user_agent=request.META.get("HTTP_USER_AGENT", ""),
     )
     return render(request, 'decrees/decree_detail.html', {'decree': decree})
 
@@ -723,7 +700,7 @@ def publication_list(request):
     table_class = get_class_from_string(table_class_path)
     table = table_class(publication_filter.qs)
 
-    RequestConfig(request, paginate={'per_page': 20}).configure(table)
+    paginate_table(request, table, keyset=True)
 
     return render(request, "publications/pub_list.html", {
         "table": table,
@@ -769,29 +746,25 @@ def add_publication(request):
                 en_brand=decree_en_brand,
                 is_placeholder=True,
             )
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="CREATE",
                 model_name='قرار مؤقت',
                 object_id=decree.pk,
                 number=decree.number,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
 
         publication.decree = decree
         publication.save()
         
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="CREATE",
             model_name='اشهار',
             object_id=publication.pk,
             number=publication.number,
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return redirect(reverse('publication_list'))
 
@@ -810,15 +783,13 @@ def edit_publication(request, document_id):
     if request.method == 'POST' and form.is_valid():
         publication = form.save()
 
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="UPDATE",
             model_name='اشهار',
             object_id=publication.pk,
             number=publication.number,
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return redirect(reverse('publication_list'))
 
@@ -844,48 +815,22 @@ def download_publication(request, document_id):
     identifier = publication.number if publication.number else 'unknown'
 
     if img_exists and attach_exists:
-        # Create ZIP file
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-            # Add Image to ZIP
-            img_filename = f"publication_{identifier}_{date_str}.jpg"
-            with publication.img_file.open('rb') as img_file:
-                zip_file.writestr(img_filename, img_file.read())
-
-            # Add attachment to ZIP
-            attach_ext = publication.attach.name.split('.')[-1]
-            attach_filename = f"publication_attachment_{identifier}_{date_str}.{attach_ext}"
-            with publication.attach.open('rb') as attach_file:
-                zip_file.writestr(attach_filename, attach_file.read())
-
-        zip_buffer.seek(0)
-        response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="publication_{identifier}_{date_str}.zip"'
-        return response
+        # Stream a ZIP of the image and the attachment
+        attach_ext = publication.attach.name.split('.')[-1]
+        return serve_zip([
+            (f"publication_{identifier}_{date_str}.jpg", publication.img_file),
+            (f"publication_attachment_{identifier}_{date_str}.{attach_ext}", publication.attach),
+        ], f"publication_{identifier}_{date_str}.zip")
 
     elif img_exists:
         # Download only image
-        content_type, _ = mimetypes.guess_type(publication.img_file.name) or ('image/jpeg',)
-        response = HttpResponse(content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="publication_{identifier}_{date_str}.jpg"'
-
-        with publication.img_file.open('rb') as img_file:
-            response.write(img_file.read())
-
-        return response
+        return serve_file(request, publication.img_file, f"publication_{identifier}_{date_str}.jpg")
 
     elif attach_exists:
         # Download only attachment
-        content_type, _ = mimetypes.guess_type(publication.attach.name) or ('application/octet-stream',)
         attach_ext = publication.attach.name.split('.')[-1]
         attach_filename = f"publication_attachment_{identifier}_{date_str}.{attach_ext}"
-        response = HttpResponse(content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="{attach_filename}"'
-
-        with publication.attach.open('rb') as attach_file:
-            response.write(attach_file.read())
-
-        return response
+        return serve_file(request, publication.attach, attach_filename)
 
     return HttpResponseNotFound('No document or attachment available for download.')
 
@@ -902,15 +847,13 @@ def soft_delete_publication(request, document_id):
         document.deleted_at = timezone.now()  # Set the deletion timestamp
         document.save()
         # Log the action
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="DELETE",
             model_name='اشهار',
             object_id=document.pk,
             number=document.number,  # Save the relevant number
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),  # Assuming you have this function
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return JsonResponse({'success': True})
 
@@ -929,20 +872,22 @@ def publication_detail(request, document_id):
         user = None
     # Fetch the decree if it exists
     decree = publication.decree
-    # Log the action
-    UserActivityLog.objects.create(
+    # Count the view (logged according to ACTIVITY_LOG_VIEWS)
+    record_view(
+        request,
+        publication,
         user=user,
-        action="VIEW",
         model_name='اشهار',
-        object_id=publication.pk,
         number=publication.number,  # Save the relevant number
-        timestamp=timezone.now(),
-        ip_address=get_client_ip(request),  # Assuming you have this function
-        user_agent=request.META.get("HTTP_USER_AGENT", ""),
     )
+    # Similar brands are only shown to the examiners handling objections
+    similar_brands = None
+    if request.user.has_perm('documents.view_objection'):
+        similar_brands = get_brand_matches(publication)
     return render(request, 'publications/pub_detail.html', {
         'publication': publication,
-        'decree': decree  # Pass the decree object
+        'decree': decree,  # Pass the decree object
+        'similar_brands': similar_brands,
     })
 
 
@@ -973,56 +918,99 @@ def update_status(request, document_id):
 # Function for fetching publication data for PDF generation:
 def fetch_pub_data(pub_id):
     # Fetch the import record based on trans_id
-    pub_record = get_object_or_404(Publication, id=pub_id)
+    publication = get_object_or_404(Publication.objects.select_related('decree', 'country', 'category'), id=pub_id)
     # Prepare the record details
-    pub_record = {
-        'pub_id': pub_record.id,
-        'pub_year': pub_record.year,
-        'pub_date': pub_record.created_at.strftime("%Y-%m-%d"),
-        'pub_no': pub_record.number,
-        'dec_no': pub_record.decree.number if pub_record.decree else "N/A",
-        'applicant': pub_record.applicant if pub_record.applicant else "N/A",
-        'owner': pub_record.owner if pub_record.owner else "N/A",
-        'country': pub_record.country.ar_name if pub_record.country else "N/A",
-        'address': pub_record.address if pub_record.address else "N/A",
-        'date_applied': pub_record.date_applied.strftime("%Y-%m-%d") if pub_record.date_applied else "N/A",
-        'number_applied': pub_record.number_applied if pub_record.number_applied else "N/A",
-        'ar_brand': pub_record.ar_brand if pub_record.ar_brand else "N/A",
-        'en_brand': pub_record.en_brand if pub_record.en_brand else "N/A",
-        'category': pub_record.category if pub_record.category else "N/A",
-        'pub_img': pub_record.img_file.url if pub_record.img_file else "N/A",
-        'e_number': pub_record.e_number if pub_record.e_number else "N/A",
-        'status': pub_record.status if pub_record.status else "N/A",
-        'notes': pub_record.notes or "N/A",
-    }
+    pub_record = publication_record(publication)
 
     print(f'fetched record info for Import Record No {pub_id} successfully')
     return pub_record
 
 
-# Function for generating INITIAL PDF for Publication Model
-def gen_pub_pdf(request, pub_id):
+# ETag functions of the generated PDFs, computed from the records' update stamps
+def pub_pdf_etag(request, pub_id):
+    return get_pdf_etag('pub_initial', pub_id)
+
+def final_pub_pdf_etag(request, pub_id):
+    return get_pdf_etag('pub_final', pub_id)
+
+def obj_pdf_etag(request, obj_id):
+    return get_pdf_etag('objection', obj_id)
+
+
+# Function rendering the INITIAL or FINAL PDF of a publication, used by the views and the pre-rendering task
+def render_pub_pdf(kind, pub_id):
+    # Imported on the first rendering so the processes that never render a PDF skip ReportLab and the fonts
+    from .genpdf import pub_pdf, pub_final_pdf
     record_info = fetch_pub_data(pub_id)
-    pub_qr = generate_pub_qr(pub_id)
-    pdf_data = pub_pdf(pub_id, record_info, pub_qr)
+    if kind == 'pub_final':
+        return pub_final_pdf(pub_id, record_info)
+    return pub_pdf(pub_id, record_info, publication_qr_data(pub_id))
+
+
+def publication_pdf_response(request, kind, pub_id):
+    """
+    Serves the PDF pre-rendered by the Celery task when it is up to date, and
+    renders it on demand (through the PDF cache) otherwise.
+    """
+    pregenerated = get_pregenerated_pdf(kind, pub_id)
+    if pregenerated:
+        return serve_file(request, pregenerated, f"{pub_id}.pdf", content_type='application/pdf')
 
+    pdf_data = get_cached_pdf(kind, pub_id, lambda: render_pub_pdf(kind, pub_id))
     response = HttpResponse(pdf_data, content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{pub_id}.pdf"'
-
     return response
 
 
+# Function for generating INITIAL PDF for Publication Model
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=pub_pdf_etag)
+def gen_pub_pdf(request, pub_id):
+    return publication_pdf_response(request, 'pub_initial', pub_id)
+
+
 # Function for generating FINAL PDF for Publication Model
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=final_pub_pdf_etag)
 def gen_final_pub_pdf(request, pub_id):
-    # if model == 'publication':
-    record_info = fetch_pub_data(pub_id)
-    pdf_data = pub_final_pdf(pub_id, record_info)
-    # else:
-    #     return HttpResponse("Invalid model type", status=400)
-    response = HttpResponse(pdf_data, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{pub_id}.pdf"'
+    return publication_pdf_response(request, 'pub_final', pub_id)
 
-    return response
+
+# Function for generating the bulletin of a whole e_number issue (or a date range) as one PDF
+@login_required
+def bulletin_pdf(request):
+    """
+    Renders every publication of a bulletin as the pages of one PDF. Bulletins
+    larger than BULLETIN_INLINE_LIMIT are rendered in parts by the Celery workers
+    and offered as a ZIP in the user's exports.
+    """
+    try:
+        params = clean_bulletin_params(request.GET)
+    except ValueError:
+        messages.error(request, "رقم النشرية أو التاريخ غير صحيح.")
+        return redirect('publication_list')
+    publications = bulletin_queryset(params)
+    count = publications.count()
+    if not count:
+        messages.warning(request, "لا توجد اشهارات في هذه النشرية.")
+        return redirect('publication_list')
+
+    inline_limit, _ = get_bulletin_settings()
+    if count <= inline_limit:
+        response = HttpResponse(render_bulletin(publications, params['final']), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{bulletin_name(params)}.pdf"'
+        return response
+
+    _, max_active, _ = get_export_settings()
+    active = ExportJob.objects.filter(user=request.user, status__in=[ExportStatus.PENDING, ExportStatus.RUNNING])
+    if active.count() >= max_active:
+        messages.warning(request, "لديك عملية تصدير قيد التجهيز، يرجى الانتظار حتى تنتهي.")
+        return redirect('export_list')
+
+    job = ExportJob.objects.create(user=request.user, model_name='bulletin', params=params)
+    transaction.on_commit(lambda: schedule_bulletin(job))
+    messages.success(request, "تم طلب تجهيز النشرية، سيتم ارسال رابط التحميل عند الانتهاء.")
+    return redirect('export_list')
 
 
 # Views for Objection Model
@@ -1061,8 +1049,8 @@ def objection_list(request):
     table_class = get_class_from_string(table_class_path)
     table = table_class(objection_filter.qs)
     
-    # Configure pagination (10 objections per page)
-    RequestConfig(request, paginate={'per_page': 20}).configure(table)
+    # Configure cursor pagination (20 objections per page)
+    paginate_table(request, table, keyset=True)
     
     return render(request, 'objections/objection_list.html', {
         'table': table,
@@ -1088,15 +1076,13 @@ def add_objection(request):
             objection.pub = publication  # Assign the publication object, not just the ID
             objection.save()
             # Log the action
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="CREATE",
                 model_name='اعتراض من مستخدم',
                 object_id=objection.pk,
                 number=objection.number,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),  # Assuming you have this function
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
             messages.success(request, "Objection added successfully!")
             return redirect("objection_list")
@@ -1129,15 +1115,13 @@ def edit_objection(request, document_id):
                     objection.status = 2
             objection.save()
             # Log the action
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="UPDATE",
                 model_name='اعتراض من عضو',
                 object_id=objection.pk,
                 number=objection.number,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),  # Assuming you have this function
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
             messages.success(request, "Objection updated successfully!")
             return redirect("objection_list")
@@ -1194,7 +1178,8 @@ def add_pub_objection(request, document_id=None):
             objection.save()
             
             # Log the objection creation
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=None,
                 action="CREATE",
                 model_name='اعتراض من شخص',
@@ -1202,7 +1187,6 @@ def add_pub_objection(request, document_id=None):
                 ip_address = get_client_ip(request),
                 user_agent = request.META.get("HTTP_USER_AGENT", ""),
                 number=objection.number,
-                timestamp=timezone.now(),
             )
             
             qr_buffer = generate_obj_qr(objection.unique_code)
@@ -1274,15 +1258,21 @@ def fetch_objection_data(obj_id):
 
 
 # Function for generating PDF for Objection Model
+def render_obj_pdf(obj_id):
+    from .genpdf import obj_pdf
+    obj_record = fetch_objection_data(obj_id)
+    obj_qr = objection_qr_data(obj_record['unique_code'])
+    return obj_pdf(obj_id, obj_record, obj_qr)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=obj_pdf_etag)
 def gen_obj_pdf(request, obj_id):
     """
-    Generates and returns a PDF for the specified objection.
+    Returns the PDF of the specified objection, rendered once per change of the
+    objection or its publication and then served from the cache.
     """
-    # Fetch objection data
-    obj_record = fetch_objection_data(obj_id)
-    obj_qr = generate_obj_qr(obj_record['unique_code'])
-    # Generate the PDF (assuming a `obj_pdf` function exists similar to `pub_pdf`)
-    pdf_data = obj_pdf(obj_id, obj_record, obj_qr)
+    pdf_data = get_cached_pdf('objection', obj_id, lambda: render_obj_pdf(obj_id))
 
     # Return the PDF as a response
     response = HttpResponse(pdf_data, content_type='application/pdf')
@@ -1310,14 +1300,7 @@ def download_objection(request, document_id):
     identifier = objection.number if objection.number else 'unknown'
 
     # Download only PDF
-    content_type, _ = mimetypes.guess_type(objection.pdf_file.name) or ('application/pdf',)
-    response = HttpResponse(content_type=content_type)
-    response['Content-Disposition'] = f'attachment; filename="objection_{identifier}_{date_str}.pdf"'
-
-    with objection.pdf_file.open('rb') as pdf_file:
-        response.write(pdf_file.read())
-
-    return response
+    return serve_file(request, objection.pdf_file, f"objection_{identifier}_{date_str}.pdf")
 
 
 # PDF download Function for Objection Receipt
@@ -1339,14 +1322,7 @@ def download_objection_receipt(request, document_id):
     identifier = objection.number if objection.number else 'unknown'
 
     # Download only PDF
-    content_type, _ = mimetypes.guess_type(objection.receipt_file.name) or ('application/pdf',)
-    response = HttpResponse(content_type=content_type)
-    response['Content-Disposition'] = f'attachment; filename="objection_{identifier}_{date_str}.pdf"'
-
-    with objection.receipt_file.open('rb') as pdf_file:
-        response.write(pdf_file.read())
-
-    return response
+    return serve_file(request, objection.receipt_file, f"objection_{identifier}_{date_str}.pdf")
 
 
 # Soft delete Function for Objection Model
@@ -1361,15 +1337,13 @@ def soft_delete_objection(request, document_id):
         document.deleted_at = timezone.now()  # Set the deletion timestamp
         document.save()
         # Log the action
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="DELETE",
             model_name='معارضة',
             object_id=document.pk,
             number=document.number,  # Save the relevant number
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),  # Assuming you have this function
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return JsonResponse({'success': True})
 
@@ -1383,16 +1357,13 @@ def objection_detail(request, document_id):
     Displays details of an objection with a PDF preview.
     """
     objection = get_object_or_404(Objection, pk=document_id)
-    # Log the action
-    UserActivityLog.objects.create(
+    # Count the view (logged according to ACTIVITY_LOG_VIEWS)
+    record_view(
+        request,
+        objection,
         user=request.user,
-        action="VIEW",
         model_name='اعتراض',
-        object_id=objection.pk,
         number=objection.number,
-        timestamp=timezone.now(),
-        ip_address=get_client_ip(request),  # Assuming you have this function
-        user_agent=request.META.get("HTTP_USER_AGENT", ""),
     )
     return render(request, 'objections/objection_detail.html', {'objection': objection})
 
@@ -1444,15 +1415,13 @@ def confirm_objection_fee(request, document_id):
             objection.pub.save()
             objection.save()
             # Log the action
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="CONFIRM",
                 model_name='رسوم اعتراض',
                 object_id=objection.pk,
                 number=objection.number,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),  # Assuming you have this function
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
             messages.success(request, f"تم تغيير حالة المعارضة رقم {objection.number} إلى 'تم الدفع'.")
         else:
@@ -1483,15 +1452,13 @@ def decline_objection_fee(request, document_id):
             objection.pub.save()
             objection.save()
             # Log the action
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="REJECT",
                 model_name='رسوم اعتراض',
                 object_id=objection.pk,
                 number=objection.number,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),  # Assuming you have this function
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
             messages.success(request, f"تم تغيير حالة المعارضة رقم {objection.number} إلى 'رفض'.")
         else:
@@ -1518,15 +1485,13 @@ def confirm_objection_status(request, document_id):
             objection.pub.save()
             objection.save()
             # Log the action
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="CONFIRM",
                 model_name='اعتراض',
                 object_id=objection.pk,
                 number=objection.number,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),  # Assuming you have this function
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
             messages.success(request, f"تم تغيير حالة المعارضة رقم {objection.number} إلى 'قبول'.")
         else:
@@ -1556,15 +1521,13 @@ def decline_objection_status(request, document_id):
             objection.pub.save()
             objection.save()
             # Log the action
-            UserActivityLog.objects.create(
+            log_activity(
+                request,
                 user=request.user,
                 action="REJECT",
                 model_name='اعتراض',
                 object_id=objection.pk,
                 number=objection.number,
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),  # Assuming you have this function
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
             messages.success(request, f"تم تغيير حالة المعارضة رقم {objection.number} إلى 'رفض'.")
         else:
@@ -1591,8 +1554,8 @@ def formplus_list(request):
     table_class = get_class_from_string(table_class_path)
     table = table_class(formplus_filter.qs)
     
-    # Configure pagination (10 decrees per page)
-    RequestConfig(request, paginate={'per_page': 20}).configure(table)
+    # Configure cursor pagination (20 rows per page)
+    paginate_table(request, table, keyset=True)
     
     return render(request, 'formplus/formplus_list.html', {
         'table': table,
@@ -1617,15 +1580,13 @@ def add_edit_formplus(request, document_id=None):
     if request.method == 'POST' and form.is_valid():
         instance = form.save()
         # Log the action
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="CREATE" if not document_id else "UPDATE",
             model_name='تشريع او نموذج',
             object_id=instance.pk,
             number=instance.number,
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),  # Assuming you have this function
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return redirect(reverse('formplus_list'))  # Adjust URL name as needed
 
@@ -1648,16 +1609,8 @@ def download_formplus_pdf(request, document_id):
     identifier = formplus.number if formplus.number else 'unknown'
     pdf_filename = f"formplus_{identifier}_{date_str}.pdf"
 
-    # Set content type and response
-    content_type, _ = mimetypes.guess_type(formplus.pdf_file.name) or ('application/pdf',)
-    response = HttpResponse(content_type=content_type)
-    response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-
     # Serve the PDF file
-    with formplus.pdf_file.open('rb') as pdf_file:
-        response.write(pdf_file.read())
-
-    return response
+    return serve_file(request, formplus.pdf_file, pdf_filename)
 
 
 # PDF download Function for FormPlus Model
@@ -1680,14 +1633,8 @@ def download_formplus_word(request, document_id):
     content_type, _ = mimetypes.guess_type(formplus.word_file.name)
     content_type = content_type or 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 
-    response = HttpResponse(content_type=content_type)
-    response['Content-Disposition'] = f'attachment; filename="{word_filename}"'
-
     # Serve the Word file
-    with formplus.word_file.open('rb') as word_file:
-        response.write(word_file.read())
-
-    return response
+    return serve_file(request, formplus.word_file, word_filename, content_type=content_type)
 
 
 # Soft delete Function for FormPlus Model
@@ -1702,15 +1649,13 @@ def soft_delete_formplus(request, document_id):
         document.deleted_at = timezone.now()  # Set the deletion timestamp
         document.save()
         # Log the action
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="DELETE",
             model_name='تشريع او نموذج',
             object_id=document.pk,
             number=document.number,  # Save the relevant number
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),  # Assuming you have this function
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return JsonResponse({'success': True})
 
@@ -1728,16 +1673,13 @@ def formplus_detail(request, document_id):
         user = request.user
     else:
         user = None
-    # Log the action
-    UserActivityLog.objects.create(
+    # Count the view (logged according to ACTIVITY_LOG_VIEWS)
+    record_view(
+        request,
+        formplus,
         user=user,
-        action="VIEW",
         model_name='تشريع او نموذج',
-        object_id=formplus.pk,
         number=formplus.number,  # Save the relevant number
-        timestamp=timezone.now(),
-        ip_address=get_client_ip(request),  # Assuming you have this function
-        user_agent=request.META.get("HTTP_USER_AGENT", ""),
     )
     return render(request, 'formplus/formplus_detail.html', {'formplus': formplus})
 
@@ -1817,10 +1759,11 @@ def decree_report(request):
         report_data['total_without_data'] = decrees.filter(
             Q(ar_brand__isnull=True) | Q(ar_brand='') | Q(en_brand__isnull=True) | Q(en_brand='')
         ).count()
-        report_data['status_1_count'] = decrees.filter(status=1).count()
-        report_data['status_2_count'] = decrees.filter(status=2).count()
-        report_data['status_3_count'] = decrees.filter(status=3).count()
-        report_data['status_4_count'] = decrees.filter(status=4).count()
+        status_counts = count_per_status(decrees)
+        report_data['status_1_count'] = status_counts.get(1, 0)
+        report_data['status_2_count'] = status_counts.get(2, 0)
+        report_data['status_3_count'] = status_counts.get(3, 0)
+        report_data['status_4_count'] = status_counts.get(4, 0)
 
     return render(request, 'decrees/decree_report.html', {
         'years': years,
@@ -1872,10 +1815,11 @@ def publication_report(request):
         report_data['total_without_data'] = publications.filter(
             Q(ar_brand__isnull=True) | Q(ar_brand='') | Q(en_brand__isnull=True) | Q(en_brand='')
         ).count()
-        report_data['status_1_count'] = publications.filter(status=1).count()
-        report_data['status_2_count'] = publications.filter(status=2).count()
-        report_data['status_3_count'] = publications.filter(status=3).count()
-        report_data['status_4_count'] = publications.filter(status=4).count()
+        status_counts = count_per_status(publications)
+        report_data['status_1_count'] = status_counts.get(1, 0)
+        report_data['status_2_count'] = status_counts.get(2, 0)
+        report_data['status_3_count'] = status_counts.get(3, 0)
+        report_data['status_4_count'] = status_counts.get(4, 0)
 
     return render(request, 'publications/pub_report.html', {
         'years': years,
@@ -1928,11 +1872,12 @@ def objection_report(request):
         report_data['total_without_data'] = objections.filter(
             Q(name__isnull=True) | Q(name='') | Q(job__isnull=True) | Q(job='')
         ).count()
-        report_data['status_pending_count'] = objections.filter(status=ObjectionStatus.PENDING).count()
-        report_data['status_unconfirm_count'] = objections.filter(status=ObjectionStatus.UNCONFIRM).count()
-        report_data['status_paid_count'] = objections.filter(status=ObjectionStatus.PAID).count()
-        report_data['status_accept_count'] = objections.filter(status=ObjectionStatus.ACCEPT).count()
-        report_data['status_reject_count'] = objections.filter(status=ObjectionStatus.REJECT).count()
+        status_counts = count_per_status(objections)
+        report_data['status_pending_count'] = status_counts.get(ObjectionStatus.PENDING, 0)
+        report_data['status_unconfirm_count'] = status_counts.get(ObjectionStatus.UNCONFIRM, 0)
+        report_data['status_paid_count'] = status_counts.get(ObjectionStatus.PAID, 0)
+        report_data['status_accept_count'] = status_counts.get(ObjectionStatus.ACCEPT, 0)
+        report_data['status_reject_count'] = status_counts.get(ObjectionStatus.REJECT, 0)
 
     return render(request, 'objections/objection_report.html', {
         'years': years,
@@ -1940,3 +1885,50 @@ def objection_report(request):
         'report_data': report_data,
     })
 
+
+
+# Bulk export of a decree or publication list filter
+@login_required
+def start_export(request, model_name):
+    """
+    Queues the export (ZIP of every file plus a CSV manifest) of the decree or
+    publication list as currently filtered, then shows the user's exports.
+    """
+    if request.method != 'POST' or model_name not in EXPORT_SOURCES:
+        return HttpResponseBadRequest("Invalid export request")
+
+    _, max_active, _ = get_export_settings()
+    active = ExportJob.objects.filter(user=request.user, status__in=[ExportStatus.PENDING, ExportStatus.RUNNING])
+    if active.count() >= max_active:
+        messages.warning(request, "لديك عملية تصدير قيد التجهيز، يرجى الانتظار حتى تنتهي.")
+        return redirect('export_list')
+
+    job = ExportJob.objects.create(user=request.user, model_name=model_name, params=clean_export_params(request.GET))
+    transaction.on_commit(lambda: schedule_export(job))
+    messages.success(request, "تم طلب التصدير، سيتم ارسال رابط التحميل عند الانتهاء.")
+    return redirect('export_list')
+
+
+# List of the user's exports with their progress
+@login_required
+def export_list(request):
+    exports = ExportJob.objects.filter(user=request.user)[:20]
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'exports': [
+            {'id': job.pk, 'status': job.status, 'status_display': job.get_status_display(), 'progress': job.progress}
+            for job in exports
+        ]})
+    return render(request, 'exports/export_list.html', {
+        'exports': exports,
+        'has_active': any(job.is_active for job in exports),
+    })
+
+
+# Download Function for a finished export
+@login_required
+def download_export(request, export_id):
+    job = get_object_or_404(ExportJob, pk=export_id, user=request.user)
+    if not job.is_ready:
+        return JsonResponse({'error': 'The export is not available.'}, status=404)
+    extension = os.path.splitext(job.file.name)[1]
+    return serve_file(request, job.file, f"{job.model_name}_export_{job.created_at:%Y-%m-%d}{extension}")
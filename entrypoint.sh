@@ -33,6 +33,10 @@ echo "Executing Routine Database Migrations..."
 python manage.py makemigrations --noinput
 python manage.py migrate --noinput
 
+# Fill in search vectors of records saved before the search index existed
+echo "Updating Search Index..."
+python manage.py rebuild_search_index --missing
+
 # Start Django server in the background
 echo "Launching WSGI server..."
 # PRODUCTION
@@ -45,5 +49,9 @@ gunicorn -c gunicorn.py &
 echo "Launching Celery server..."
 python -m celery -A core worker --loglevel=info &
 
+# Start Celery beat in the background (periodic tasks such as the homepage chart refresh)
+echo "Launching Celery beat..."
+python -m celery -A core beat --loglevel=info --scheduler django_celery_beat.schedulers:DatabaseScheduler &
+
 # Keep container running
 wait
\ No newline at end of file
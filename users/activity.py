@@ -0,0 +1,337 @@
+# Imports of the required python modules and libraries
+######################################################
+import json
+import logging
+import random
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, InterfaceError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import CustomUser, UserActivityLog, DailyViewCount
+
+logger = logging.getLogger('users')
+
+# Redis list holding the activity events waiting to be written
+ACTIVITY_LOG_QUEUE_KEY = 'activity_log:queue'
+
+# Redis list keeping the queued events the database rejected, for inspection
+ACTIVITY_LOG_DEAD_LETTER_KEY = 'activity_log:dead_letter'
+
+# Set when a flush task is already queued, so a burst of events queues a single one
+ACTIVITY_LOG_FLUSH_LOCK_KEY = 'activity_log:flush_scheduled'
+
+# Redis counters of document views, one per view_count_key()
+VIEW_COUNT_KEY_PREFIX = 'views:'
+
+# Set while a rollup runs, so two workers never move the same counters
+VIEW_COUNT_ROLLUP_LOCK_KEY = 'view_counts:rollup_running'
+
+# Counters outlive their day so views are not lost while the beat is stopped
+VIEW_COUNT_TTL = 60 * 60 * 24 * 7
+
+
+def get_activity_log_settings():
+    """Returns (async enabled, batch size, flush interval in seconds) from the settings."""
+    return (
+        getattr(settings, 'ACTIVITY_LOG_ASYNC', True),
+        getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 500),
+        getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 10),
+    )
+
+
+def get_view_log_settings():
+    """Returns (VIEW logging mode, anonymous sample rate) from the settings."""
+    return (
+        getattr(settings, 'ACTIVITY_LOG_VIEWS', 'authenticated'),
+        getattr(settings, 'ACTIVITY_LOG_VIEW_SAMPLE_RATE', 0.01),
+    )
+
+
+def get_client_ip(request):
+    """Extract client IP address from request."""
+    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(",")[0]
+    else:
+        ip = request.META.get("REMOTE_ADDR")
+    return ip
+
+
+def get_queue_connection():
+    """Raw Redis connection behind the default cache, None when the cache is not Redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+# Function that records a user action without writing to the database in the request
+def log_activity(request, action, user=None, model_name=None, object_id=None, number=None):
+    """
+    Queues an activity event on the Redis list; the flush_activity_log task writes
+    the queued events in batches. If the queue is disabled or Redis cannot be
+    reached, the row is written right away so no event is lost.
+
+    :param request: The current request, used for the IP address and user agent (may be None).
+    :param action: One of UserActivityLog.ACTION_TYPES.
+    :param user: The acting user, None for anonymous visitors.
+    """
+    event = {
+        'user_id': user.pk if user is not None and user.is_authenticated else None,
+        'action': action,
+        'model_name': model_name,
+        'object_id': object_id,
+        'number': str(number) if number is not None else None,
+        'ip_address': get_client_ip(request) if request is not None else None,
+        'user_agent': request.META.get("HTTP_USER_AGENT", "") if request is not None else "",
+        'timestamp': timezone.now().isoformat(),
+    }
+
+    use_queue, batch_size, _ = get_activity_log_settings()
+    connection = get_queue_connection() if use_queue else None
+    if connection is not None:
+        try:
+            queued = connection.rpush(ACTIVITY_LOG_QUEUE_KEY, json.dumps(event))
+        except Exception as e:
+            logger.warning(f"Activity log queue unavailable, writing directly: {e}")
+        else:
+            # A full batch is flushed right away instead of waiting for the beat schedule
+            if queued >= batch_size:
+                schedule_activity_flush()
+            return
+    UserActivityLog.objects.create(**build_log_kwargs(event))
+
+
+def build_log_kwargs(event):
+    return {
+        'user_id': event['user_id'],
+        'action': event['action'],
+        'model_name': event['model_name'],
+        'object_id': event['object_id'],
+        'number': event['number'],
+        'ip_address': event['ip_address'],
+        'user_agent': event['user_agent'],
+        'timestamp': parse_datetime(event['timestamp']),
+    }
+
+
+def schedule_activity_flush():
+    """Queues the flush task unless one is already pending."""
+    _, _, flush_interval = get_activity_log_settings()
+    if not cache.add(ACTIVITY_LOG_FLUSH_LOCK_KEY, True, timeout=flush_interval):
+        return
+    from .tasks import flush_activity_log
+    try:
+        flush_activity_log.delay()
+    except Exception as e:
+        cache.delete(ACTIVITY_LOG_FLUSH_LOCK_KEY)
+        logger.error(f"Could not queue the activity log flush: {e}")
+
+
+# Function that writes the queued activity events to the database
+def flush_activity_queue(max_batches=20):
+    """
+    Pops up to max_batches batches of queued events and writes each batch with a
+    single bulk_create. Events of users deleted meanwhile are written without a
+    user, and events the database rejects go to the dead letter list, so one bad
+    event never blocks the queue. Returns the number of rows written.
+    """
+    connection = get_queue_connection()
+    if connection is None:
+        return 0
+    _, batch_size, _ = get_activity_log_settings()
+
+    written = 0
+    for _ in range(max_batches):
+        # Read and trim in one transaction so concurrent flushes never write an event twice
+        with connection.pipeline() as pipe:
+            pipe.lrange(ACTIVITY_LOG_QUEUE_KEY, 0, batch_size - 1)
+            pipe.ltrim(ACTIVITY_LOG_QUEUE_KEY, batch_size, -1)
+            raw_events, _ = pipe.execute()
+        if not raw_events:
+            break
+
+        events = []
+        for raw_event in raw_events:
+            try:
+                events.append((raw_event, UserActivityLog(**build_log_kwargs(json.loads(raw_event)))))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error(f"Dropping malformed activity event {raw_event!r}: {e}")
+        logs = [log for _, log in events]
+        clear_deleted_users(logs)
+        try:
+            with transaction.atomic():
+                UserActivityLog.objects.bulk_create(logs, batch_size=batch_size)
+        except (OperationalError, InterfaceError):
+            # The database is unreachable: put the batch back so it is retried on the next flush
+            connection.lpush(ACTIVITY_LOG_QUEUE_KEY, *reversed(raw_events))
+            raise
+        except DatabaseError as e:
+            # Some rows were rejected: write the others one by one and set the rejected ones aside
+            logger.error(f"Activity log batch rejected, writing it row by row: {e}")
+            logs = write_logs_one_by_one(connection, events)
+        written += len(logs)
+
+        if len(raw_events) < batch_size:
+            break
+    return written
+
+
+def clear_deleted_users(logs):
+    """
+    Sets the user of the logs whose user was deleted while they were queued to None,
+    as on_delete=SET_NULL would have done for a written row.
+    """
+    user_ids = {log.user_id for log in logs if log.user_id is not None}
+    if not user_ids:
+        return
+    existing = set(CustomUser.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    for log in logs:
+        if log.user_id is not None and log.user_id not in existing:
+            log.user_id = None
+
+
+def write_logs_one_by_one(connection, events):
+    """Saves each (raw event, log) pair on its own; the rejected raw events go to the dead letter list."""
+    written = []
+    for raw_event, log in events:
+        try:
+            with transaction.atomic():
+                log.save(force_insert=True)
+        except DatabaseError as e:
+            logger.error(f"Moving rejected activity event {raw_event!r} to the dead letter list: {e}")
+            connection.rpush(ACTIVITY_LOG_DEAD_LETTER_KEY, raw_event)
+        else:
+            written.append(log)
+    return written
+
+
+# View counters
+###############
+def view_count_key(model_label, object_id, day):
+    return f"{VIEW_COUNT_KEY_PREFIX}{model_label}:{object_id}:{day.isoformat()}"
+
+
+def should_log_view(user):
+    """
+    Whether a view gets its own UserActivityLog row, per ACTIVITY_LOG_VIEWS:
+    'all', 'authenticated' (the default), 'sampled' (authenticated users plus
+    ACTIVITY_LOG_VIEW_SAMPLE_RATE of the anonymous views) or 'none'.
+    """
+    mode, sample_rate = get_view_log_settings()
+    authenticated = user is not None and user.is_authenticated
+    if mode == 'all':
+        return True
+    if mode == 'authenticated':
+        return authenticated
+    if mode == 'sampled':
+        return authenticated or random.random() < sample_rate
+    return False
+
+
+# Function that records the view of a document detail page
+def record_view(request, instance, model_name, user=None, number=None):
+    """
+    Counts a view of a document in the daily view counters, and logs it as a VIEW
+    activity only when should_log_view() says so. The counters answer "how many
+    times was this viewed" without a log row per hit.
+
+    :param instance: The document viewed.
+    :param model_name: Section name shown in the activity log.
+    """
+    count_view(instance._meta.label_lower, instance.pk)
+    if should_log_view(user):
+        log_activity(request, user=user, action="VIEW", model_name=model_name, object_id=instance.pk, number=number)
+
+
+def count_view(model_label, object_id):
+    """Increments the Redis counter of today's views of an object, or the table when Redis is unavailable."""
+    day = timezone.localdate()
+    connection = get_queue_connection()
+    if connection is not None:
+        key = view_count_key(model_label, object_id, day)
+        try:
+            with connection.pipeline() as pipe:
+                pipe.incr(key)
+                pipe.expire(key, VIEW_COUNT_TTL)
+                pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"View counter unavailable, writing directly: {e}")
+    add_view_counts({(model_label, object_id, day): 1})
+
+
+def add_view_counts(counts):
+    """Adds {(model label, object id, day): views} to the DailyViewCount rows."""
+    for (model_label, object_id, day), views in counts.items():
+        rows = DailyViewCount.objects.filter(model_name=model_label, object_id=object_id, day=day)
+        if rows.update(count=F('count') + views):
+            continue
+        try:
+            with transaction.atomic():
+                DailyViewCount.objects.create(model_name=model_label, object_id=object_id, day=day, count=views)
+        except IntegrityError:
+            # Created by a concurrent request since the update
+            rows.update(count=F('count') + views)
+
+
+# Function that moves the Redis view counters into the daily aggregate table
+def rollup_view_counts(batch_size=1000):
+    """
+    Reads and resets the Redis view counters a batch at a time and adds them to
+    DailyViewCount. Returns the number of views rolled up.
+    """
+    connection = get_queue_connection()
+    if connection is None:
+        return 0
+    if not cache.add(VIEW_COUNT_ROLLUP_LOCK_KEY, True, timeout=60 * 5):
+        return 0
+
+    rolled_up = 0
+    try:
+        keys = []
+        for key in connection.scan_iter(match=f"{VIEW_COUNT_KEY_PREFIX}*", count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                rolled_up += rollup_view_keys(connection, keys)
+                keys = []
+        if keys:
+            rolled_up += rollup_view_keys(connection, keys)
+    finally:
+        cache.delete(VIEW_COUNT_ROLLUP_LOCK_KEY)
+    return rolled_up
+
+
+def rollup_view_keys(connection, keys):
+    # Read and delete in one transaction, views counted meanwhile start a new counter
+    with connection.pipeline() as pipe:
+        for key in keys:
+            pipe.get(key)
+            pipe.delete(key)
+        results = pipe.execute()
+
+    counts = {}
+    for key, value in zip(keys, results[::2]):
+        if not value:
+            continue
+        try:
+            model_label, object_id, day = key.decode()[len(VIEW_COUNT_KEY_PREFIX):].split(':')
+            counts[(model_label, int(object_id), date.fromisoformat(day))] = int(value)
+        except ValueError as e:
+            logger.error(f"Dropping malformed view counter {key!r}: {e}")
+
+    try:
+        with transaction.atomic():
+            add_view_counts(counts)
+    except Exception:
+        # Put the views back so the next rollup retries them
+        with connection.pipeline() as pipe:
+            for (model_label, object_id, day), views in counts.items():
+                pipe.incrby(view_count_key(model_label, object_id, day), views)
+            pipe.execute()
+        raise
+    return sum(counts.values())
@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from .models import DailyViewCount
 
 User = get_user_model()
 
@@ -16,3 +17,9 @@ class CustomUserAdmin(UserAdmin):
 
 admin.site.register(User, CustomUserAdmin)
 admin.site.unregister(Group)
+
+@admin.register(DailyViewCount)
+class DailyViewCountAdmin(admin.ModelAdmin):
+    list_display = ['model_name', 'object_id', 'day', 'count']
+    list_filter = ['model_name', 'day']
+    ordering = ['-day', '-count']
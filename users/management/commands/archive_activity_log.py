@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from users.retention import archive_activity_log, get_retention_settings
+
+class Command(BaseCommand):
+    help = 'Moves the user activity log rows older than the retention period to monthly gzip archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention period in days (defaults to ACTIVITY_LOG_RETENTION_DAYS)')
+        parser.add_argument('--dir', help='Archive directory (defaults to ACTIVITY_LOG_ARCHIVE_DIR)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the rows that would be archived')
+
+    def handle(self, *args, **kwargs):
+        retention_days, archive_dir = get_retention_settings()
+        retention_days = kwargs['days'] if kwargs['days'] is not None else retention_days
+        archived = archive_activity_log(
+            retention_days=retention_days, archive_dir=kwargs['dir'] or archive_dir, dry_run=kwargs['dry_run'],
+        )
+        if not archived:
+            self.stdout.write(self.style.SUCCESS(f'No activity log rows older than {retention_days} days'))
+            return
+        verb = 'Would archive' if kwargs['dry_run'] else 'Archived'
+        for path, count in archived:
+            self.stdout.write(self.style.SUCCESS(f'{verb} {count} rows to {path}'))
@@ -3,6 +3,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings  # Use this to reference the custom user model
+from django.utils import timezone
 
 
 class CustomUser(AbstractUser):
@@ -34,9 +35,35 @@ class UserActivityLog(models.Model):
     number = models.CharField(max_length=50, null=True, blank=True, verbose_name="المستند")
     ip_address = models.GenericIPAddressField(blank=True, null=True, verbose_name="عنوان IP")
     user_agent = models.TextField(blank=True, null=True, verbose_name="agent")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="الوقت")
+    # Set when the event happens, not when the queued event is written (see users.activity)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="الوقت")
+
+    class Meta:
+        indexes = [
+            # The log viewer and the retention archiver read by time, the user filter by user then time
+            models.Index(fields=['timestamp'], name='activity_timestamp_idx'),
+            models.Index(fields=['user', 'timestamp'], name='activity_user_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} {self.action} {self.model_name or 'General'} at {self.timestamp}"
 
 
+
+class DailyViewCount(models.Model):
+    # Views per document and day, rolled up from the Redis counters (see users.activity.record_view)
+    model_name = models.CharField(max_length=100, verbose_name="القسم")
+    object_id = models.IntegerField(verbose_name="ID")
+    day = models.DateField(verbose_name="اليوم")
+    count = models.PositiveIntegerField(default=0, verbose_name="عدد المشاهدات")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'object_id', 'day'], name='unique_daily_view_count'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='view_count_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id} on {self.day}: {self.count}"
@@ -0,0 +1,118 @@
+# Imports of the required python modules and libraries
+######################################################
+import gzip
+import itertools
+import json
+import logging
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .models import UserActivityLog
+
+logger = logging.getLogger('users')
+
+
+def get_retention_settings():
+    """Returns (retention in days, archive directory) from the settings."""
+    return (
+        getattr(settings, 'ACTIVITY_LOG_RETENTION_DAYS', 365),
+        getattr(settings, 'ACTIVITY_LOG_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archives', 'activity_log')),
+    )
+
+
+def month_bounds(moment):
+    """Returns the first instant of the month of `moment` and of the following month."""
+    start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+# Function that moves the activity rows older than the retention period into compressed monthly files
+def archive_activity_log(retention_days=None, archive_dir=None, batch_size=5000, dry_run=False):
+    """
+    Archives the activity log rows older than the retention period, one gzip JSON
+    lines file per month (activity_log_YYYY_MM.jsonl.gz, added to if it exists),
+    then deletes them from the table in batches. A month is only deleted once its
+    file is fully written, and a run interrupted before the deletion can be run
+    again: rows already in the file are not written twice.
+
+    Returns a list of (file path, number of rows) for each month archived.
+    """
+    default_days, default_dir = get_retention_settings()
+    retention_days = default_days if retention_days is None else retention_days
+    archive_dir = archive_dir or default_dir
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    expired = UserActivityLog.objects.filter(timestamp__lt=cutoff)
+    oldest = expired.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return []
+    if not dry_run:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    archived = []
+    month_start, month_end = month_bounds(timezone.localtime(oldest))
+    while month_start < cutoff:
+        month_rows = expired.filter(timestamp__gte=month_start, timestamp__lt=min(month_end, cutoff))
+        path = os.path.join(archive_dir, f"activity_log_{month_start:%Y_%m}.jsonl.gz")
+
+        if dry_run:
+            count = month_rows.count()
+        else:
+            count, last_id = write_archive(month_rows, path, batch_size)
+            if last_id is not None:
+                delete_in_batches(month_rows.filter(id__lte=last_id), batch_size)
+        if count:
+            archived.append((path, count))
+            logger.info(f"Archived {count} activity log rows to {path}")
+        month_start, month_end = month_bounds(month_end)
+    return archived
+
+
+def write_archive(queryset, path, batch_size):
+    """
+    Adds the rows of a queryset to a gzip JSON lines file. The file is rebuilt next
+    to the existing one, with the rows it already holds, and renamed into place, so
+    it is never left half written; rows whose id it already holds are skipped.
+    Returns (rows written, id of the last row now in the file or None when the
+    queryset is empty).
+    """
+    fields = [field.attname for field in UserActivityLog._meta.concrete_fields]
+    rows = queryset.order_by('id').values(*fields).iterator(chunk_size=batch_size)
+    first_row = next(rows, None)
+    # Months without rows leave no file
+    if first_row is None:
+        return 0, None
+
+    count, last_id = 0, None
+    archived_ids = set()
+    temp_path = f"{path}.tmp"
+    try:
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as archive:
+            if os.path.exists(path):
+                with gzip.open(path, 'rt', encoding='utf-8') as previous:
+                    for line in previous:
+                        archive.write(line)
+                        archived_ids.add(json.loads(line)['id'])
+            for row in itertools.chain([first_row], rows):
+                last_id = row['id']
+                if last_id in archived_ids:
+                    continue
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                count += 1
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return count, last_id
+
+
+def delete_in_batches(queryset, batch_size):
+    """Deletes the rows of a queryset a batch at a time, keeping each transaction and lock short."""
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        UserActivityLog.objects.filter(id__in=ids).delete()
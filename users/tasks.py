@@ -0,0 +1,28 @@
+from celery import shared_task
+from django.core.cache import cache
+from .activity import flush_activity_queue, rollup_view_counts, ACTIVITY_LOG_FLUSH_LOCK_KEY
+from .retention import archive_activity_log
+
+@shared_task
+def flush_activity_log():
+    """
+    Writes the queued user activity events to the database in batches.
+    Runs on the beat schedule and whenever a full batch is waiting.
+    """
+    cache.delete(ACTIVITY_LOG_FLUSH_LOCK_KEY)
+    written = flush_activity_queue()
+    return f"Wrote {written} activity log rows."
+
+
+@shared_task
+def rollup_view_counts_task():
+    """Adds the Redis view counters to the daily view counts table."""
+    rolled_up = rollup_view_counts()
+    return f"Rolled up {rolled_up} views."
+
+
+@shared_task
+def archive_activity_log_task():
+    """Moves the activity log rows older than the retention period to the monthly archives."""
+    archived = archive_activity_log()
+    return f"Archived {sum(count for _, count in archived)} activity log rows in {len(archived)} files."
@@ -1,3 +1,142 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .activity import ACTIVITY_LOG_QUEUE_KEY, ACTIVITY_LOG_DEAD_LETTER_KEY, flush_activity_queue, log_activity
+from .models import CustomUser, UserActivityLog
+from .retention import archive_activity_log
 
-# Create your tests here.
+
+class FakeQueueConnection:
+    """The Redis list commands used by the activity queue, kept in memory."""
+
+    def __init__(self):
+        self.lists = {}
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(value.encode() if isinstance(value, str) else value for value in values)
+        return len(self.lists[key])
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.lists.setdefault(key, []).insert(0, value)
+        return len(self.lists[key])
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, connection):
+        self.connection = connection
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def lrange(self, key, start, end):
+        self.commands.append(lambda: list(self.connection.lists.get(key, [])[start:end + 1]))
+
+    def ltrim(self, key, start, end):
+        def trim():
+            self.connection.lists[key] = self.connection.lists.get(key, [])[start:]
+            return True
+        self.commands.append(trim)
+
+    def execute(self):
+        return [command() for command in self.commands]
+
+
+@override_settings(ACTIVITY_LOG_ASYNC=True, ACTIVITY_LOG_BATCH_SIZE=500)
+class ActivityQueueTests(TestCase):
+    """Queued activity events are written by the flush, even when some of them cannot be."""
+
+    def setUp(self):
+        self.queue = FakeQueueConnection()
+        patcher = mock.patch('users.activity.get_queue_connection', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create_user(username='clerk', password='secret')
+
+    def test_events_are_queued_then_flushed(self):
+        log_activity(None, 'LOGIN', user=self.user)
+        log_activity(None, 'VIEW', model_name='Decree', object_id=7, number=12)
+        self.assertFalse(UserActivityLog.objects.exists())
+        self.assertEqual(len(self.queue.lists[ACTIVITY_LOG_QUEUE_KEY]), 2)
+
+        self.assertEqual(flush_activity_queue(), 2)
+        self.assertEqual(self.queue.lists[ACTIVITY_LOG_QUEUE_KEY], [])
+        self.assertEqual(
+            list(UserActivityLog.objects.order_by('pk').values_list('user_id', 'action', 'number')),
+            [(self.user.pk, 'LOGIN', None), (None, 'VIEW', '12')],
+        )
+
+    def test_events_of_deleted_users_are_kept_without_user(self):
+        log_activity(None, 'LOGOUT', user=self.user)
+        self.user.delete()
+
+        self.assertEqual(flush_activity_queue(), 1)
+        self.assertIsNone(UserActivityLog.objects.get().user_id)
+
+    def test_rejected_events_go_to_the_dead_letter_list(self):
+        log_activity(None, 'LOGIN', user=self.user)
+        rejected = json.dumps({**json.loads(self.queue.lists[ACTIVITY_LOG_QUEUE_KEY][0]), 'action': None})
+        self.queue.rpush(ACTIVITY_LOG_QUEUE_KEY, rejected)
+        log_activity(None, 'LOGOUT', user=self.user)
+
+        self.assertEqual(flush_activity_queue(), 2)
+        self.assertEqual(list(UserActivityLog.objects.order_by('pk').values_list('action', flat=True)), ['LOGIN', 'LOGOUT'])
+        self.assertEqual(self.queue.lists[ACTIVITY_LOG_DEAD_LETTER_KEY], [rejected.encode()])
+        self.assertEqual(self.queue.lists[ACTIVITY_LOG_QUEUE_KEY], [])
+        # The next flush has nothing left to retry
+        self.assertEqual(flush_activity_queue(), 0)
+
+
+class ActivityArchiveTests(TestCase):
+    """Expired activity rows end up in their month's archive exactly once, then leave the table."""
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.month = timezone.now().replace(year=timezone.now().year - 2, month=3, day=10)
+
+    def add_rows(self, count, day=10):
+        for _ in range(count):
+            UserActivityLog.objects.create(action='LOGIN', timestamp=self.month.replace(day=day))
+
+    def archived_ids(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            return [json.loads(line)['id'] for line in archive]
+
+    def test_archive_delete_and_rerun(self):
+        self.add_rows(3)
+        UserActivityLog.objects.create(action='LOGIN')
+        expected = list(UserActivityLog.objects.filter(timestamp__lt=self.month.replace(day=28)).values_list('id', flat=True))
+
+        # A run stopped after writing the file and before deleting the rows
+        with mock.patch('users.retention.delete_in_batches', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                archive_activity_log(retention_days=30, archive_dir=self.archive_dir)
+        self.assertEqual(UserActivityLog.objects.count(), 4)
+
+        # The rerun finds the rows already archived: it only deletes them
+        self.assertEqual(archive_activity_log(retention_days=30, archive_dir=self.archive_dir), [])
+        path = os.path.join(self.archive_dir, f"activity_log_{self.month:%Y_%m}.jsonl.gz")
+        self.assertEqual(self.archived_ids(path), expected)
+        self.assertEqual(UserActivityLog.objects.count(), 1)
+
+        # Rows of the month written late are added to its file, and nothing is left behind
+        self.add_rows(2, day=20)
+        self.assertEqual(archive_activity_log(retention_days=30, archive_dir=self.archive_dir), [(path, 2)])
+        self.assertEqual(len(self.archived_ids(path)), 5)
+        self.assertEqual(len(set(self.archived_ids(path))), 5)
+        self.assertEqual(archive_activity_log(retention_days=30, archive_dir=self.archive_dir), [])
+        self.assertEqual(os.listdir(self.archive_dir), [os.path.basename(path)])
@@ -8,6 +8,8 @@ from .tables import UserTable, UserActivityLogTable
 from .forms import CustomUserCreationForm, CustomUserChangeForm, ArabicPasswordChangeForm, ResetPasswordForm, UserProfileEditForm
 from .filters import UserFilter
 from .models import UserActivityLog
+from .activity import log_activity
+from documents.pagination import paginate_table
 from django_filters.views import FilterView
 from django.contrib import messages
 from django.urls import reverse
@@ -123,15 +125,13 @@ def delete_user(request, user_id):
     user = get_object_or_404(User, id=user_id)
     if request.method == "POST":
         user.delete()
-        UserActivityLog.objects.create(
+        log_activity(
+            request,
             user=request.user,
             action="DELETE",
             model_name='مستخدم',
             object_id=user.pk,
             number=user.username,  # Save the relevant number
-            timestamp=timezone.now(),
-            ip_address=get_client_ip(request),  # Assuming you have this function
-            user_agent=request.META.get("HTTP_USER_AGENT", ""),
         )
         return redirect("manage_users")
     return redirect("manage_users")  # Redirect instead of rendering a separate page
@@ -148,7 +148,12 @@ class UserActivityLogView(LoginRequiredMixin, UserPassesTestMixin, SingleTableVi
     
     def get_queryset(self):
         # Order by timestamp descending by default
-        return super().get_queryset().order_by('-timestamp')
+        return super().get_queryset().select_related('user').order_by('-timestamp')
+
+    def get_table(self, **kwargs):
+        # Cursor pagination with an estimated count, the log grows too big for OFFSET and COUNT(*)
+        table = self.get_table_class()(data=self.get_table_data(), **kwargs)
+        return paginate_table(self.request, table, per_page=50, keyset=True)
 
 # Function that resets a user password
 @user_passes_test(is_staff)